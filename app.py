@@ -9,12 +9,18 @@ from starlette.exceptions import HTTPException as StarletteHTTPException
 from starlette.responses import JSONResponse
 
 from back.api import router as api
+from back.crud.async_tag_autocomplete import tag_autocomplete
 from back.init.async_elasticsearch import init_indices
 from back.init.async_storage import init_storage
 from back.init.check import ping
 from back.init.database import init_table
 from back.init.route import router as init
 from back.route import router as views
+from back.session.async_elasticsearch import (
+    close_async_elasticsearch,
+    open_async_elasticsearch,
+)
+from back.session.storage import async_s3_session_registry
 from back.settings import setting
 from cli import app as cli_app  # noqa
 from lib.zetsubou.exceptions import RequiresLoginException
@@ -49,15 +55,21 @@ async def startup():
         app.include_router(init)
         return
 
+    await open_async_elasticsearch()
+
     app.add_event_handler("startup", init_table)
     app.add_event_handler("startup", init_indices)
     app.add_event_handler("startup", init_storage)
+    app.add_event_handler("startup", tag_autocomplete.start)
 
     app.include_router(views)
     app.include_router(api, prefix="/api")
 
 
 app.add_event_handler("startup", startup)
+app.add_event_handler("shutdown", close_async_elasticsearch)
+app.add_event_handler("shutdown", async_s3_session_registry.close)
+app.add_event_handler("shutdown", tag_autocomplete.close)
 
 
 @app.exception_handler(StarletteHTTPException)
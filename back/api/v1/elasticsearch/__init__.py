@@ -8,8 +8,12 @@ from back.api.model.elasticsearch import (
     query_examples,
 )
 from back.crud.async_elasticsearch import CrudAsyncElasticsearchBase
+from back.crud.async_search_cache import search_result_cache
 from back.dependency.security import api_security
-from back.model.elasticsearch import ElasticsearchAnalyzerEnum
+from back.model.elasticsearch import (
+    ElasticsearchAnalyzerEnum,
+    ElasticsearchResultCacheStats,
+)
 from back.model.scope import ScopeEnum
 from back.settings import setting
 
@@ -63,3 +67,15 @@ async def get_video_field_names() -> List[str]:
         field_names = list(await crud.get_field_names())
         field_names.sort()
     return field_names
+
+
+@router.get(
+    "/result-cache",
+    response_model=ElasticsearchResultCacheStats,
+    dependencies=[api_security([ScopeEnum.elasticsearch_result_cache_get.value])],
+)
+def get_result_cache_stats() -> ElasticsearchResultCacheStats:
+    """
+    The hits and misses of the search result cache of this process.
+    """
+    return search_result_cache.stats
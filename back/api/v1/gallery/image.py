@@ -1,10 +1,16 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Query
 from fastapi.responses import FileResponse, RedirectResponse
 
-from back.crud.async_gallery import CrudAsyncGallery
+from back.crud.async_gallery import (
+    CrudAsyncGallery,
+    get_gallery_cover_url,
+    get_gallery_image_url,
+    get_gallery_image_urls,
+)
 from back.dependency.security import api_security, view_security
+from back.model.gallery import GalleryImageUrl
 from back.model.scope import ScopeEnum
 
 router = APIRouter(tags=["Gallery Image"])
@@ -21,13 +27,25 @@ async def get_imgages(gallery_id: str) -> List[str]:
     return filenames
 
 
+@router.get(
+    "/{gallery_id}/image-urls",
+    response_model=List[GalleryImageUrl],
+    dependencies=[api_security([ScopeEnum.gallery_image_urls_get.value])],
+)
+async def get_image_urls(
+    gallery_id: str,
+    start: int = Query(default=0, ge=0),
+    end: Optional[int] = Query(default=None, ge=0),
+) -> List[GalleryImageUrl]:
+    return await get_gallery_image_urls(gallery_id, start=start, end=end)
+
+
 @router.get(
     "/{gallery_id}/cover",
     dependencies=[view_security([ScopeEnum.gallery_cover_get.value])],
 )
 async def get_cover(gallery_id: str) -> FileResponse:
-    async with CrudAsyncGallery(gallery_id, is_from_setting_if_none=True) as crud:
-        cover = await crud.get_cover()
+    cover = await get_gallery_cover_url(gallery_id)
     return RedirectResponse(url=cover)
 
 
@@ -36,6 +54,5 @@ async def get_cover(gallery_id: str) -> FileResponse:
     dependencies=[view_security([ScopeEnum.gallery_image_get.value])],
 )
 async def get_image(gallery_id: str, img: str) -> FileResponse:
-    async with CrudAsyncGallery(gallery_id, is_from_setting_if_none=True) as crud:
-        img_url = await crud.get_image(img)
+    img_url = await get_gallery_image_url(gallery_id, img)
     return RedirectResponse(url=img_url)
@@ -4,7 +4,11 @@ from urllib.parse import unquote
 from fastapi import APIRouter, Body, Depends, Request
 
 from back.api.model.elasticsearch import ElasticsearchBody, query_examples
-from back.api.v1.utils import get_tags_and_labels_by_query_params
+from back.api.v1.utils import (
+    get_tags_and_labels_by_query_params,
+    get_view_fields,
+    get_view_response,
+)
 from back.crud.async_gallery import CrudAsyncElasticsearchGallery
 from back.db.crud import CrudUserElasticSearchQuery
 from back.dependency.security import Token, api_security, extract_token
@@ -12,8 +16,14 @@ from back.model.elasticsearch import (
     ElasticsearchAnalyzerEnum,
     ElasticsearchCountResult,
     ElasticsearchQueryBooleanEnum,
+    ElasticsearchViewEnum,
+)
+from back.model.gallery import (
+    GALLERY_CARD_FIELDS,
+    Galleries,
+    GalleryCards,
+    GalleryOrderedFieldEnum,
 )
-from back.model.gallery import Galleries, GalleryOrderedFieldEnum
 from back.model.scope import ScopeEnum
 from back.settings import setting
 
@@ -68,6 +78,8 @@ async def get_random(
     fuzziness: int = 0,
     size: int = ELASTIC_SIZE,
     boolean: ElasticsearchQueryBooleanEnum = ElasticsearchQueryBooleanEnum.SHOULD,
+    cursor: str = None,
+    view: ElasticsearchViewEnum = ElasticsearchViewEnum.FULL,
 ) -> Galleries:
     keywords = unquote(keywords)
     async with CrudAsyncElasticsearchGallery(is_from_setting_if_none=True) as crud:
@@ -79,8 +91,10 @@ async def get_random(
             fuzziness=fuzziness,
             boolean=boolean,
             seed=seed,
+            cursor=cursor,
+            fields=get_view_fields(view, GALLERY_CARD_FIELDS),
         )
-    return docs
+    return get_view_response(docs, view, GalleryCards)
 
 
 @router.post(
@@ -135,6 +149,8 @@ async def get_advanced_search(
     label_1: str = None,
     order_by: GalleryOrderedFieldEnum = None,
     is_desc: bool = True,
+    cursor: str = None,
+    view: ElasticsearchViewEnum = ElasticsearchViewEnum.FULL,
 ) -> Galleries:
     tags, labels = get_tags_and_labels_by_query_params(request)
 
@@ -176,8 +192,10 @@ async def get_advanced_search(
             is_desc=is_desc,
             labels=labels,
             tags=tags,
+            cursor=cursor,
+            fields=get_view_fields(view, GALLERY_CARD_FIELDS),
         )
-    return docs
+    return get_view_response(docs, view, GalleryCards)
 
 
 @router.get(
@@ -194,6 +212,8 @@ async def get_search(
     fuzziness: int = 0,
     size: int = ELASTIC_SIZE,
     boolean: ElasticsearchQueryBooleanEnum = ElasticsearchQueryBooleanEnum.SHOULD,
+    cursor: str = None,
+    view: ElasticsearchViewEnum = ElasticsearchViewEnum.FULL,
 ) -> Galleries:
     user_id = token.sub
     keywords = unquote(keywords)
@@ -209,7 +229,13 @@ async def get_search(
             body = query.get("body", None)
             if body is None:
                 return Galleries()
-            docs = await crud.match_by_query(body, page, size=size)
+            docs = await crud.match_by_query(
+                body,
+                page,
+                size=size,
+                cursor=cursor,
+                fields=get_view_fields(view, GALLERY_CARD_FIELDS),
+            )
         else:
             docs = await crud.match(
                 page,
@@ -218,6 +244,8 @@ async def get_search(
                 keyword_analyzer=analyzer,
                 fuzziness=fuzziness,
                 boolean=boolean,
+                cursor=cursor,
+                fields=get_view_fields(view, GALLERY_CARD_FIELDS),
             )
 
-    return docs
+    return get_view_response(docs, view, GalleryCards)
@@ -14,7 +14,7 @@ from back.dependency.security import api_security
 from back.model.base import Pagination
 from back.model.scope import ScopeEnum
 from back.model.storage import StorageCategoryEnum, StorageStat
-from back.session.storage import AsyncS3Session
+from back.session.storage import AsyncS3Session, async_s3_session_registry
 from back.session.storage.async_s3 import get_source
 
 router = APIRouter(tags=["Minio Storage"])
@@ -83,7 +83,9 @@ async def post_storage(directory: StorageMinioCreate) -> StorageMinioCreated:
     dependencies=[api_security([ScopeEnum.storage_minio_storage_put.value])],
 )
 async def put_storage(directory: StorageMinioUpdate) -> bool:
-    return await CrudStorageMinio.update_by_id(directory)
+    is_updated = await CrudStorageMinio.update_by_id(directory)
+    await async_s3_session_registry.invalidate(directory.id)
+    return is_updated
 
 
 @router.delete(
@@ -92,4 +94,6 @@ async def put_storage(directory: StorageMinioUpdate) -> bool:
     dependencies=[api_security([ScopeEnum.storage_minio_storage_delete.value])],
 )
 async def delete_directory(directory_id: int) -> bool:
-    return await CrudStorageMinio.delete_by_id(directory_id)
+    is_deleted = await CrudStorageMinio.delete_by_id(directory_id)
+    await async_s3_session_registry.invalidate(directory_id)
+    return is_deleted
@@ -1,14 +1,21 @@
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Body, Depends
+from typing_extensions import Annotated
 
-from back.crud.async_tag import CrudAsyncElasticsearchTag, CrudTag
+from back.crud.async_tag import (
+    CrudAsyncElasticsearchTag,
+    CrudTag,
+    get_delete_tag_progress_id,
+)
 from back.db.crud import CrudTagToken
 from back.dependency.base import get_pagination
 from back.dependency.security import api_security
 from back.model.base import Pagination
 from back.model.scope import ScopeEnum
 from back.model.tag import Tag, TagCreate, TagInserted, TagToken, TagUpdate
+from back.model.task import ZetsuBouTask
+from back.session.async_redis import async_redis
 
 from .attribute import router as _attribute
 from .token import router as _token
@@ -17,6 +24,8 @@ router = APIRouter(tags=["Tag"])
 router.include_router(_attribute)
 router.include_router(_token)
 
+MAX_TAG_INTERPRETATIONS = 100
+
 
 @router.get(
     "/search-for-tag-attributes",
@@ -53,6 +62,25 @@ async def get_interpretation_of_tag(tag_id: int) -> Tag:
     return tag
 
 
+@router.post(
+    "/tag/interpretations",
+    response_model=List[Optional[Tag]],
+    dependencies=[api_security([ScopeEnum.tag_interpretations_post.value])],
+)
+async def post_tag_interpretations(
+    tag_ids: Annotated[
+        List[int],
+        Body(
+            max_length=MAX_TAG_INTERPRETATIONS,
+            examples=[[1, 2, 3]],
+            description="The ids of the tags.",
+        ),
+    ],
+) -> List[Optional[Tag]]:
+    crud = CrudTag()
+    return await crud.get_interpretations_by_ids(tag_ids)
+
+
 @router.get(
     "/tag/{tag_id}",
     response_model=TagInserted,
@@ -73,6 +101,19 @@ async def delete_tag(tag_id: int) -> bool:
     return await crud.delete_by_id(tag_id)
 
 
+@router.get(
+    "/tag/{tag_id}/delete-progress",
+    response_model=ZetsuBouTask,
+    dependencies=[api_security([ScopeEnum.tag_delete_progress_get.value])],
+)
+async def get_delete_progress(tag_id: int) -> ZetsuBouTask:
+    progress_id = get_delete_tag_progress_id(tag_id)
+    progress = await async_redis.get(progress_id)
+    if progress is None:
+        return ZetsuBouTask()
+    return ZetsuBouTask(progress_id=progress_id, progress=float(progress))
+
+
 @router.post("/tag", dependencies=[api_security([ScopeEnum.tag_post.value])])
 async def post_tag(tag: TagCreate):
     crud = CrudTag()
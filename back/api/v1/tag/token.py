@@ -1,17 +1,36 @@
 from typing import List
 from urllib.parse import unquote
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 
+from back.crud.async_tag_autocomplete import tag_autocomplete
 from back.db.crud import CrudTagToken
 from back.db.model import TagToken, TagTokenCreate, TagTokenCreated, TagTokenUpdate
 from back.dependency.base import get_pagination
 from back.dependency.security import api_security
 from back.model.base import Pagination
 from back.model.scope import ScopeEnum
+from back.model.tag import TagAutocompletion
 
 router = APIRouter(prefix="/tag", tags=["Tag Token"])
 
+MAX_AUTOCOMPLETE_SIZE = 100
+
+
+@router.get(
+    "/autocomplete",
+    response_model=List[TagAutocompletion],
+    dependencies=[api_security([ScopeEnum.tag_autocomplete_get.value])],
+)
+async def autocomplete(
+    s: str = "",
+    size: int = Query(default=10, ge=1, le=MAX_AUTOCOMPLETE_SIZE),
+    category_id: int = None,
+) -> List[TagAutocompletion]:
+    return await tag_autocomplete.autocomplete(
+        unquote(s), size=size, category_id=category_id
+    )
+
 
 @router.get(
     "/token-startswith",
@@ -96,7 +115,9 @@ async def get_tokens(
     dependencies=[api_security([ScopeEnum.tag_token_post.value])],
 )
 async def post_token(token: TagTokenCreate) -> TagTokenCreated:
-    return await CrudTagToken.create(token)
+    created = await CrudTagToken.create(token)
+    await tag_autocomplete.set_token(created)
+    return created
 
 
 @router.put(
@@ -105,7 +126,10 @@ async def post_token(token: TagTokenCreate) -> TagTokenCreated:
     dependencies=[api_security([ScopeEnum.tag_token_put.value])],
 )
 async def put_token(token: TagTokenUpdate) -> bool:
-    return await CrudTagToken.update_by_id(token)
+    is_updated = await CrudTagToken.update_by_id(token)
+    if is_updated:
+        await tag_autocomplete.set_token(token)
+    return is_updated
 
 
 @router.delete(
@@ -113,4 +137,6 @@ async def put_token(token: TagTokenUpdate) -> bool:
 )
 async def delete_token(token_id: int) -> bool:
     # TODO: Delete token in elasticsearch
-    return await CrudTagToken.delete_by_id(token_id)
+    is_deleted = await CrudTagToken.delete_by_id(token_id)
+    await tag_autocomplete.delete(token_id)
+    return is_deleted
@@ -1,7 +1,9 @@
-from typing import List
+from typing import Dict, List
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Body, Depends
+from typing_extensions import Annotated
 
+from back.crud.user_quest import CrudElasticCount
 from back.db.crud import CrudUserElasticCountQuery
 from back.db.model import (
     UserElasticCountQuery,
@@ -18,6 +20,8 @@ from .dep import verify_user_id
 
 router = APIRouter()
 
+MAX_ELASTIC_COUNTS = 100
+
 
 @router.get(
     "/{user_id}/elastic/total-count-queries",
@@ -83,3 +87,22 @@ async def put_user_elastic_count_query(
 )
 async def delete_user_elastic_count_query_by_id(user_id: int, query_id: int) -> bool:
     return await CrudUserElasticCountQuery.delete_by_id_and_user_id(query_id, user_id)
+
+
+@router.post(
+    "/{user_id}/elastic/counts",
+    response_model=Dict[int, int],
+    dependencies=[api_security([ScopeEnum.user_elastic_counts_post.value])],
+)
+async def post_user_elastic_counts(
+    user_id: int,
+    query_ids: Annotated[
+        List[int],
+        Body(
+            max_length=MAX_ELASTIC_COUNTS,
+            examples=[[1, 2, 3]],
+            description="The ids of the count queries of the user.",
+        ),
+    ],
+) -> Dict[int, int]:
+    return await CrudElasticCount.count_many(query_ids, user_id)
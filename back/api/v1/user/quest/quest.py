@@ -55,11 +55,13 @@ async def get_elastic_count_quest_progress(quest_id: int) -> CurrentQuestProgres
     if not quest:
         raise HTTPException(status_code=404, detail=f"Quest Id: {quest_id} not found")
 
-    numerator_count = await CrudElasticCount.count(quest.numerator_id)
-    denominator_count = await CrudElasticCount.count(quest.denominator_id)
+    counts = await CrudElasticCount.count_many(
+        [quest.numerator_id, quest.denominator_id]
+    )
 
     return CurrentQuestProgress(
-        numerator=numerator_count, denominator=denominator_count
+        numerator=counts[quest.numerator_id],
+        denominator=counts[quest.denominator_id],
     )
 
 
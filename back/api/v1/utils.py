@@ -1,7 +1,12 @@
 from collections import defaultdict
+from typing import List, Optional, Type, Union
 from urllib.parse import unquote
 
 from fastapi import Request
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from back.model.elasticsearch import ElasticsearchViewEnum
 
 
 def get_tags_and_labels_by_query_params(request: Request):
@@ -23,3 +28,23 @@ def get_tags_and_labels_by_query_params(request: Request):
             v = unquote(v)
             tags[v].append(tag_value)
     return tags, labels
+
+
+def get_view_fields(
+    view: ElasticsearchViewEnum, card_fields: List[str]
+) -> Optional[List[str]]:
+    if view == ElasticsearchViewEnum.CARD:
+        return card_fields
+    return None
+
+
+def get_view_response(
+    docs: dict, view: ElasticsearchViewEnum, card_model: Type[BaseModel]
+) -> Union[dict, JSONResponse]:
+    """The cards are validated by `card_model` and returned directly, so they are not
+    validated again as the full sources of the `response_model`.
+    """
+    if view == ElasticsearchViewEnum.CARD:
+        cards = card_model(**docs)
+        return JSONResponse(content=cards.model_dump(mode="json", by_alias=True))
+    return docs
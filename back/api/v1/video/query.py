@@ -9,12 +9,22 @@ from back.dependency.security import Token, api_security, extract_token
 from back.model.elasticsearch import (
     ElasticsearchAnalyzerEnum,
     ElasticsearchQueryBooleanEnum,
+    ElasticsearchViewEnum,
 )
 from back.model.scope import ScopeEnum
-from back.model.video import VideoOrderedFieldEnum, Videos
+from back.model.video import (
+    VIDEO_CARD_FIELDS,
+    VideoCards,
+    VideoOrderedFieldEnum,
+    Videos,
+)
 from back.settings import setting
 
-from ..utils import get_tags_and_labels_by_query_params
+from ..utils import (
+    get_tags_and_labels_by_query_params,
+    get_view_fields,
+    get_view_response,
+)
 
 router = APIRouter()
 
@@ -34,6 +44,8 @@ async def get_random(
     fuzziness: int = 0,
     size: int = ELASTIC_SIZE,
     boolean: ElasticsearchQueryBooleanEnum = ElasticsearchQueryBooleanEnum.SHOULD,
+    cursor: str = None,
+    view: ElasticsearchViewEnum = ElasticsearchViewEnum.FULL,
 ) -> Videos:
     keywords = unquote(keywords)
     async with CrudAsyncElasticsearchVideo(is_from_setting_if_none=True) as crud:
@@ -45,8 +57,10 @@ async def get_random(
             fuzziness=fuzziness,
             boolean=boolean,
             seed=seed,
+            cursor=cursor,
+            fields=get_view_fields(view, VIDEO_CARD_FIELDS),
         )
-    return docs
+    return get_view_response(docs, view, VideoCards)
 
 
 @router.get(
@@ -93,6 +107,8 @@ async def get_advanced_search(
     label_1: str = None,
     order_by: VideoOrderedFieldEnum = None,
     is_desc: bool = True,
+    cursor: str = None,
+    view: ElasticsearchViewEnum = ElasticsearchViewEnum.FULL,
 ) -> Videos:
     tags, labels = get_tags_and_labels_by_query_params(request)
 
@@ -141,8 +157,10 @@ async def get_advanced_search(
             is_desc=is_desc,
             labels=labels,
             tags=tags,
+            cursor=cursor,
+            fields=get_view_fields(view, VIDEO_CARD_FIELDS),
         )
-    return docs
+    return get_view_response(docs, view, VideoCards)
 
 
 @router.get(
@@ -159,6 +177,8 @@ async def get_search(
     fuzziness: int = 0,
     size: int = ELASTIC_SIZE,
     boolean: ElasticsearchQueryBooleanEnum = ElasticsearchQueryBooleanEnum.SHOULD,
+    cursor: str = None,
+    view: ElasticsearchViewEnum = ElasticsearchViewEnum.FULL,
 ) -> Videos:
     user_id = token.sub
     keywords = unquote(keywords)
@@ -172,7 +192,13 @@ async def get_search(
             body = query.get("body", None)
             if body is None:
                 return []
-            docs = await crud.match_by_query(body, page, size=size)
+            docs = await crud.match_by_query(
+                body,
+                page,
+                size=size,
+                cursor=cursor,
+                fields=get_view_fields(view, VIDEO_CARD_FIELDS),
+            )
         else:
             docs = await crud.match(
                 page,
@@ -181,5 +207,7 @@ async def get_search(
                 keyword_analyzer=analyzer,
                 fuzziness=fuzziness,
                 boolean=boolean,
+                cursor=cursor,
+                fields=get_view_fields(view, VIDEO_CARD_FIELDS),
             )
-    return docs
+    return get_view_response(docs, view, VideoCards)
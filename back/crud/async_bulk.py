@@ -0,0 +1,427 @@
+import asyncio
+import json
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from elasticsearch import AsyncElasticsearch
+from elasticsearch.exceptions import TransportError
+from elasticsearch.helpers import BulkIndexError
+from elasticsearch.helpers.actions import expand_action
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from back.crud.async_elasticsearch import invalidate_index
+from back.logging import logger_zetsubou
+from back.model.elasticsearch import ElasticsearchBulkError, ElasticsearchBulkResult
+from back.session.async_redis import async_redis as _async_redis
+from back.settings import setting
+from back.utils.session import AsyncSession
+
+ELASTIC_BULK_CONCURRENCY = setting.elastic_bulk_concurrency
+ELASTIC_BULK_QUEUE_SIZE = setting.elastic_bulk_queue_size
+ELASTIC_BULK_MAX_ACTIONS = setting.elastic_bulk_max_actions
+ELASTIC_BULK_MAX_BYTES = setting.elastic_bulk_max_bytes
+ELASTIC_BULK_MAX_RETRIES = setting.elastic_bulk_max_retries
+ELASTIC_BULK_INITIAL_BACKOFF = setting.elastic_bulk_initial_backoff
+ELASTIC_BULK_MAX_BACKOFF = setting.elastic_bulk_max_backoff
+ELASTIC_BULK_DISABLE_REFRESH = setting.elastic_bulk_disable_refresh
+
+MAX_ERRORS = 100
+
+REFRESH_KEY_PREFIX = "zetsubou.elasticsearch.refresh"
+DISABLED_REFRESH_INTERVAL = "-1"
+# the seconds the refresh is held by an indexer without renewing it
+REFRESH_LEASE_SECONDS = 60
+
+# an action and its lines in the body of a bulk request
+_BulkItem = Tuple[dict, str]
+
+
+def get_refresh_interval_key(index: str) -> str:
+    return f"{REFRESH_KEY_PREFIX}.{index}.interval"
+
+
+def get_refresh_holders_key(index: str) -> str:
+    return f"{REFRESH_KEY_PREFIX}.{index}.holders"
+
+
+def get_refresh_interval(resp: dict, index: str) -> Optional[str]:
+    return (
+        resp.get(index, {})
+        .get("settings", {})
+        .get("index", {})
+        .get("refresh_interval", None)
+    )
+
+
+async def reset_refresh(
+    async_elasticsearch: AsyncElasticsearch,
+    indices: List[str],
+    async_redis: Optional[Redis] = _async_redis,
+):
+    """Reset the refresh of the indices to the default, e.g. on startup, in case an
+    indexer which disabled it was killed before restoring it.
+
+    Only the refresh which is still disabled without any running indexer holding it is
+    reset, so the refresh disabled by a running indexer and the interval set on purpose
+    are kept. The holders of a killed indexer expire with its lease.
+    """
+
+    for index in indices:
+        resp = await async_elasticsearch.indices.get_settings(
+            index=index, name="index.refresh_interval"
+        )
+        if get_refresh_interval(resp, index) != DISABLED_REFRESH_INTERVAL:
+            continue
+        if async_redis is not None:
+            try:
+                holders = await async_redis.get(get_refresh_holders_key(index))
+            except RedisError as e:
+                logger_zetsubou.warning(
+                    f"Can't get the refresh holders of {index}: {e}"
+                )
+                continue
+            if holders is not None and int(holders) > 0:
+                continue
+        await async_elasticsearch.indices.put_settings(
+            index=index, body={"index": {"refresh_interval": None}}
+        )
+
+
+def is_retryable(status: Union[int, str]) -> bool:
+    # The status of a connection error is "N/A".
+    if type(status) is not int:
+        return True
+    return status == 429 or status >= 500
+
+
+class AsyncBulkIndexer(AsyncSession):
+    """
+    Send the actions of `async_bulk` to Elasticsearch with concurrent bulk requests.
+
+    The actions are batched by their number and their bytes, and the batches are put
+    into a bounded queue consumed by `concurrency` workers, so the producers only wait
+    while the queue is full. The actions rejected with 429 or 5xx are retried with an
+    exponential backoff, the other failures are collected into `result` and raised as
+    `BulkIndexError` on closing if `raise_on_error`. The written indices are
+    invalidated after each bulk request.
+
+    The refresh of `refresh_indices` is disabled until the indexer is closed if
+    `disable_refresh`. The original refresh interval and the number of the indexers
+    which disabled the refresh are kept in Redis, so the overlapping indexers of all the
+    processes restore the original interval once the last of them is closed. The keys
+    are renewed while the indexer is open, so they expire if it is killed.
+    """
+
+    def __init__(
+        self,
+        async_elasticsearch: AsyncElasticsearch,
+        concurrency: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        max_actions: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        initial_backoff: Optional[float] = None,
+        max_backoff: Optional[float] = None,
+        disable_refresh: Optional[bool] = None,
+        refresh_indices: List[str] = [],
+        raise_on_error: bool = True,
+        async_redis: Optional[Redis] = None,
+        is_from_setting_if_none: bool = False,
+    ):
+        self.async_elasticsearch = async_elasticsearch
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.max_actions = max_actions
+        self.max_bytes = max_bytes
+        self.max_retries = max_retries
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.disable_refresh = disable_refresh
+        self.refresh_indices = refresh_indices
+        self.raise_on_error = raise_on_error
+        self.async_redis = async_redis
+
+        if is_from_setting_if_none:
+            if self.concurrency is None:
+                self.concurrency = ELASTIC_BULK_CONCURRENCY
+            if self.queue_size is None:
+                self.queue_size = ELASTIC_BULK_QUEUE_SIZE
+            if self.max_actions is None:
+                self.max_actions = ELASTIC_BULK_MAX_ACTIONS
+            if self.max_bytes is None:
+                self.max_bytes = ELASTIC_BULK_MAX_BYTES
+            if self.max_retries is None:
+                self.max_retries = ELASTIC_BULK_MAX_RETRIES
+            if self.initial_backoff is None:
+                self.initial_backoff = ELASTIC_BULK_INITIAL_BACKOFF
+            if self.max_backoff is None:
+                self.max_backoff = ELASTIC_BULK_MAX_BACKOFF
+            if self.disable_refresh is None:
+                self.disable_refresh = ELASTIC_BULK_DISABLE_REFRESH
+            if self.async_redis is None:
+                self.async_redis = _async_redis
+
+        if self.concurrency is None:
+            self.concurrency = 1
+        if self.queue_size is None:
+            self.queue_size = self.concurrency
+        if self.max_actions is None:
+            self.max_actions = ELASTIC_BULK_MAX_ACTIONS
+        if self.max_bytes is None:
+            self.max_bytes = ELASTIC_BULK_MAX_BYTES
+        if self.max_retries is None:
+            self.max_retries = 0
+        if self.initial_backoff is None:
+            self.initial_backoff = ELASTIC_BULK_INITIAL_BACKOFF
+        if self.max_backoff is None:
+            self.max_backoff = ELASTIC_BULK_MAX_BACKOFF
+
+        self.result = ElasticsearchBulkResult()
+
+        self._batch: List[_BulkItem] = []
+        self._batch_bytes = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._refresh_intervals: Dict[str, Optional[str]] = {}
+        self._refresh_renewal: Optional[asyncio.Task] = None
+
+    @property
+    def pending_actions(self) -> List[dict]:
+        """The actions which are not put into the queue yet."""
+        return [action for action, _ in self._batch]
+
+    async def open(self):
+        self.result = ElasticsearchBulkResult()
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._workers = [
+            asyncio.create_task(self._work()) for _ in range(self.concurrency)
+        ]
+        if self.disable_refresh:
+            await self._disable_refresh()
+            if self.async_redis is not None and self._refresh_intervals:
+                self._refresh_renewal = asyncio.create_task(self._renew_refresh())
+
+    async def close(self):
+        try:
+            await self.join()
+        finally:
+            for worker in self._workers:
+                worker.cancel()
+            await asyncio.gather(*self._workers, return_exceptions=True)
+            self._workers = []
+            self._queue = None
+            if self._refresh_renewal is not None:
+                self._refresh_renewal.cancel()
+                await asyncio.gather(self._refresh_renewal, return_exceptions=True)
+                self._refresh_renewal = None
+            await self._restore_refresh()
+
+        if self.raise_on_error and self.result.failed > 0:
+            raise BulkIndexError(
+                f"{self.result.failed} document(s) failed to index.",
+                [error.model_dump() for error in self.result.errors],
+            )
+
+    async def _disable_refresh(self):
+        for index in self.refresh_indices:
+            resp = await self.async_elasticsearch.indices.get_settings(
+                index=index, name="index.refresh_interval"
+            )
+            refresh_interval = get_refresh_interval(resp, index)
+            # The refresh was disabled by another indexer or was not restored.
+            if refresh_interval == DISABLED_REFRESH_INTERVAL:
+                refresh_interval = None
+            await self._hold_refresh(index, refresh_interval)
+            await self.async_elasticsearch.indices.put_settings(
+                index=index,
+                body={"index": {"refresh_interval": DISABLED_REFRESH_INTERVAL}},
+            )
+            self._refresh_intervals[index] = refresh_interval
+
+    async def _hold_refresh(self, index: str, refresh_interval: Optional[str]):
+        """Keep the original refresh interval unless another indexer kept it first."""
+
+        if self.async_redis is None:
+            return
+        try:
+            await self.async_redis.set(
+                get_refresh_interval_key(index),
+                json.dumps(refresh_interval),
+                ex=REFRESH_LEASE_SECONDS,
+                nx=True,
+            )
+            holders_key = get_refresh_holders_key(index)
+            await self.async_redis.incr(holders_key)
+            await self.async_redis.expire(holders_key, REFRESH_LEASE_SECONDS)
+        except RedisError as e:
+            logger_zetsubou.warning(f"Can't keep the refresh interval of {index}: {e}")
+
+    async def _renew_refresh(self):
+        """Renew the lease of the held refresh until the indexer is closed."""
+
+        while True:
+            await asyncio.sleep(REFRESH_LEASE_SECONDS / 3)
+            for index in self._refresh_intervals:
+                try:
+                    for key in [
+                        get_refresh_interval_key(index),
+                        get_refresh_holders_key(index),
+                    ]:
+                        await self.async_redis.expire(key, REFRESH_LEASE_SECONDS)
+                except RedisError as e:
+                    logger_zetsubou.warning(
+                        f"Can't renew the refresh interval of {index}: {e}"
+                    )
+
+    async def _release_refresh(
+        self, index: str, refresh_interval: Optional[str]
+    ) -> Tuple[bool, Optional[str]]:
+        """Return whether the refresh should be restored and the original interval."""
+
+        if self.async_redis is None:
+            return True, refresh_interval
+        try:
+            holders_key = get_refresh_holders_key(index)
+            holders = await self.async_redis.decr(holders_key)
+            if holders > 0:
+                return False, refresh_interval
+            key = get_refresh_interval_key(index)
+            value = await self.async_redis.get(key)
+            # The holders are deleted too, so the count left below 0 after the lease of
+            # a killed indexer expired doesn't offset the next indexers.
+            await self.async_redis.delete(key, holders_key)
+        except RedisError as e:
+            logger_zetsubou.warning(f"Can't get the refresh interval of {index}: {e}")
+            return True, refresh_interval
+        if value is not None:
+            refresh_interval = json.loads(value)
+        return True, refresh_interval
+
+    async def _restore_refresh(self):
+        for index, refresh_interval in self._refresh_intervals.items():
+            is_last, refresh_interval = await self._release_refresh(
+                index, refresh_interval
+            )
+            if not is_last:
+                continue
+            await self.async_elasticsearch.indices.put_settings(
+                index=index, body={"index": {"refresh_interval": refresh_interval}}
+            )
+            await self.async_elasticsearch.indices.refresh(index=index)
+        self._refresh_intervals = {}
+
+    def _serialize(self, action: dict) -> str:
+        serializer = self.async_elasticsearch.transport.serializer
+        meta, data = expand_action(action)
+        lines = serializer.dumps(meta) + "\n"
+        if data is not None:
+            lines += serializer.dumps(data) + "\n"
+        return lines
+
+    async def add(self, action: dict):
+        lines = self._serialize(action)
+        size = len(lines.encode("utf-8"))
+        if self._batch and self._batch_bytes + size > self.max_bytes:
+            await self.flush()
+
+        self._batch.append((action, lines))
+        self._batch_bytes += size
+        if len(self._batch) >= self.max_actions or self._batch_bytes >= self.max_bytes:
+            await self.flush()
+
+    async def add_many(self, actions: Iterable[dict]):
+        for action in actions:
+            await self.add(action)
+
+    async def flush(self):
+        """Put the pending actions into the queue. It waits while the queue is full."""
+
+        if not self._batch:
+            return
+        batch = self._batch
+        self._batch = []
+        self._batch_bytes = 0
+        await self._queue.put(batch)
+
+    async def join(self):
+        """Wait until all the added actions are sent."""
+
+        await self.flush()
+        await self._queue.join()
+
+    async def _work(self):
+        while True:
+            batch = await self._queue.get()
+            try:
+                await self._send(batch)
+            except Exception as e:
+                logger_zetsubou.exception(e)
+                for action, _ in batch:
+                    self._add_error(action, None, "N/A", str(e))
+            finally:
+                self._queue.task_done()
+
+    def _add_error(
+        self,
+        action: dict,
+        op_type: Optional[str],
+        status: Union[int, str],
+        error: Any,
+    ):
+        self.result.failed += 1
+        if len(self.result.errors) >= MAX_ERRORS:
+            return
+        if op_type is None:
+            op_type = action.get("_op_type", "index")
+        id = action.get("_id", None)
+        self.result.errors.append(
+            ElasticsearchBulkError(
+                index=action.get("_index", None),
+                id=None if id is None else str(id),
+                op_type=op_type,
+                status=status,
+                error=error,
+            )
+        )
+
+    async def _send(self, batch: List[_BulkItem]):
+        indices = {action.get("_index", None) for action, _ in batch}
+        indices.discard(None)
+
+        for retry in range(self.max_retries + 1):
+            if retry > 0:
+                self.result.retries += 1
+                backoff = self.initial_backoff * 2 ** (retry - 1)
+                await asyncio.sleep(min(backoff, self.max_backoff))
+
+            is_last = retry == self.max_retries
+            self.result.requests += 1
+            try:
+                resp = await self.async_elasticsearch.bulk(
+                    body="".join(lines for _, lines in batch)
+                )
+            except TransportError as e:
+                if is_last or not is_retryable(e.status_code):
+                    for action, _ in batch:
+                        self._add_error(action, None, e.status_code, e.error)
+                    break
+                logger_zetsubou.warning(f"Retry the bulk request: {e}")
+                continue
+
+            rejected = []
+            for (action, lines), item in zip(batch, resp["items"]):
+                op_type, info = next(iter(item.items()))
+                status = info.get("status", 500)
+                # The document was deleted already.
+                if 200 <= status < 300 or (op_type == "delete" and status == 404):
+                    self.result.succeeded += 1
+                elif is_retryable(status) and not is_last:
+                    rejected.append((action, lines))
+                else:
+                    self._add_error(action, op_type, status, info.get("error", None))
+            batch = rejected
+            if not batch:
+                break
+
+        for index in sorted(indices):
+            await invalidate_index(index)
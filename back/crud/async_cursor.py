@@ -0,0 +1,141 @@
+import base64
+import hashlib
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+from redis.asyncio import Redis
+
+from back.model.elasticsearch import ElasticsearchSearchCursor
+from back.session.async_redis import async_redis as _async_redis
+from back.settings import setting
+
+ELASTIC_CHECKPOINT_EXPIRES_IN_SECONDS = setting.elastic_checkpoint_expires_in_seconds
+
+CHECKPOINTS_KEY_PREFIX = "zetsubou.elasticsearch.checkpoints"
+PIT_KEY_PREFIX = "zetsubou.elasticsearch.pit"
+
+# The keys of a DSL which do not change the order of the hits.
+_PAGINATION_KEYS = {"size", "from_", "search_after", "pit", "_source"}
+
+
+def get_query_key(index: str, dsl: dict) -> str:
+    """Hash the index and the DSL without the pagination so that the pages of the same
+    query share the cursors and the checkpoints.
+    """
+
+    normalized = {k: v for k, v in dsl.items() if k not in _PAGINATION_KEYS}
+    data = json.dumps([index, normalized], sort_keys=True, default=str)
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+
+def get_checkpoints_key(query_key: str, pit_id: str) -> str:
+    pit_key = hashlib.sha1(pit_id.encode("utf-8")).hexdigest()
+    return f"{CHECKPOINTS_KEY_PREFIX}.{query_key}.{pit_key}"
+
+
+def get_pit_key(query_key: str) -> str:
+    return f"{PIT_KEY_PREFIX}.{query_key}"
+
+
+def encode_cursor(cursor: ElasticsearchSearchCursor) -> str:
+    data = cursor.model_dump_json(exclude_none=True).encode("utf-8")
+    return base64.urlsafe_b64encode(data).decode("utf-8").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Optional[ElasticsearchSearchCursor]:
+    """Return `None` if the cursor is malformed."""
+
+    try:
+        padding = "=" * (-len(cursor) % 4)
+        data = base64.urlsafe_b64decode(cursor + padding)
+        return ElasticsearchSearchCursor.model_validate_json(data)
+    except (ValueError, ValidationError):
+        return None
+
+
+class SearchCheckpoints:
+    """
+    Cache the sort values of the hits at some offsets of a query in a Redis hash, so
+    that a deep page can `search_after` the nearest checkpoint instead of skipping all
+    the hits before it.
+
+    The checkpoints come from the searches with a point in time, so their sort values
+    end with the implicit `_shard_doc` tiebreaker, which only applies to that point in
+    time. The checkpoints are kept per point in time, and the ID of the point in time
+    of a query is kept as well, so that the deep pages of the query share one point in
+    time instead of opening one per page. The checkpoints of the replaced point in time
+    are deleted.
+    """
+
+    def __init__(
+        self,
+        expires_in_seconds: Optional[int] = None,
+        async_redis: Optional[Redis] = None,
+        is_from_setting_if_none: bool = False,
+    ):
+        self.expires_in_seconds = expires_in_seconds
+        self.async_redis = async_redis
+
+        if is_from_setting_if_none:
+            if self.expires_in_seconds is None:
+                self.expires_in_seconds = ELASTIC_CHECKPOINT_EXPIRES_IN_SECONDS
+            if self.async_redis is None:
+                self.async_redis = _async_redis
+
+    @property
+    def is_available(self) -> bool:
+        return self.async_redis is not None and self.expires_in_seconds > 0
+
+    async def get_nearest(
+        self, query_key: str, pit_id: str, offset: int
+    ) -> Tuple[int, Optional[List[Any]]]:
+        """Get the checkpoint with the largest offset not after `offset`. The offset is
+        0 without the sort values if there is no such checkpoint.
+        """
+
+        nearest_offset, nearest_sort = 0, None
+        if not self.is_available:
+            return nearest_offset, nearest_sort
+
+        async for field, value in self.async_redis.hscan_iter(
+            get_checkpoints_key(query_key, pit_id)
+        ):
+            checkpoint_offset = int(field)
+            if nearest_offset < checkpoint_offset <= offset:
+                nearest_offset, nearest_sort = checkpoint_offset, json.loads(value)
+        return nearest_offset, nearest_sort
+
+    async def set(self, query_key: str, pit_id: str, checkpoints: Dict[int, List[Any]]):
+        if not self.is_available or len(checkpoints) == 0:
+            return
+
+        key = get_checkpoints_key(query_key, pit_id)
+        await self.async_redis.hset(
+            key,
+            mapping={
+                str(offset): json.dumps(sort) for offset, sort in checkpoints.items()
+            },
+        )
+        await self.async_redis.expire(key, self.expires_in_seconds)
+
+    async def get_pit_id(self, query_key: str) -> Optional[str]:
+        if not self.is_available:
+            return None
+        value = await self.async_redis.get(get_pit_key(query_key))
+        if value is None:
+            return None
+        return value.decode("utf-8")
+
+    async def set_pit_id(self, query_key: str, pit_id: str):
+        if not self.is_available:
+            return
+        old_pit_id = await self.get_pit_id(query_key)
+        await self.async_redis.set(
+            get_pit_key(query_key), pit_id, ex=self.expires_in_seconds
+        )
+        if old_pit_id is not None and old_pit_id != pit_id:
+            await self.async_redis.delete(get_checkpoints_key(query_key, old_pit_id))
+
+
+search_checkpoints = SearchCheckpoints(is_from_setting_if_none=True)
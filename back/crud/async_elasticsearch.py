@@ -1,24 +1,69 @@
-from collections import deque
-from typing import Any, AsyncGenerator, Dict, Generic, List, Optional, Set, Tuple
+import asyncio
+from typing import (
+    Any,
+    AsyncGenerator,
+    Awaitable,
+    Callable,
+    Dict,
+    Generic,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
 
 from elasticsearch import AsyncElasticsearch
 from elasticsearch.exceptions import NotFoundError
 from elasticsearch.helpers import async_scan
 from fastapi import HTTPException
 
+from back.crud.async_cursor import (
+    SearchCheckpoints,
+    decode_cursor,
+    encode_cursor,
+    get_query_key,
+    search_checkpoints,
+)
+from back.crud.async_random import (
+    RandomOrders,
+    get_random_key,
+    random_orders,
+    shuffle_ids,
+)
+from back.crud.async_search_cache import (
+    SearchResultCache,
+    get_result_key,
+    search_result_cache,
+)
 from back.model.elasticsearch import (
     ElasticsearchAnalyzerEnum,
     ElasticsearchCountResult,
     ElasticsearchQueryBooleanEnum,
+    ElasticsearchSearchCursor,
     SourceT,
 )
-from back.session.async_elasticsearch import get_async_elasticsearch
+from back.session.async_elasticsearch import (
+    ElasticsearchMappingRegistry,
+    elasticsearch_mapping_registry,
+    get_field_names_from_mappings,
+    get_shared_async_elasticsearch,
+)
 from back.settings import setting
 from back.utils.keyword import KeywordParser
+from back.utils.query import get_ngram_query
 from back.utils.session import AsyncSession, check_session, session
 
 ELASTICSEARCH_SIZE = setting.elastic_size
 ELASTICSEARCH_INDEX_MAX_RESULT_WINDOW = 10000
+ELASTICSEARCH_PIT_KEEP_ALIVE = setting.elastic_pit_keep_alive
+
+
+async def invalidate_index(index: str):
+    """Invalidate the cached field names and search results of the index. It should be
+    called after the index is written.
+    """
+    elasticsearch_mapping_registry.invalidate(index)
+    await search_result_cache.invalidate(index)
 
 
 class CrudAsyncElasticsearchBase(Generic[SourceT], AsyncSession):
@@ -31,6 +76,10 @@ class CrudAsyncElasticsearchBase(Generic[SourceT], AsyncSession):
             "_score",
             {"last_updated": {"order": "desc", "unmapped_type": "long"}},
         ],
+        mapping_registry: Optional[ElasticsearchMappingRegistry] = None,
+        checkpoints: Optional[SearchCheckpoints] = None,
+        result_cache: Optional[SearchResultCache] = None,
+        random_orders: Optional[RandomOrders] = None,
         is_from_setting_if_none: bool = False,
     ):
         for analyzer in keyword_analyzers.keys():
@@ -42,19 +91,38 @@ class CrudAsyncElasticsearchBase(Generic[SourceT], AsyncSession):
 
         self.hosts = hosts
         self.index = index
-        self.async_elasticsearch = AsyncElasticsearch(hosts=hosts)
+        self.async_elasticsearch: Optional[AsyncElasticsearch] = None
+        # the shared client is borrowed and must not be closed
+        self.is_shared_async_elasticsearch = False
+        self.mapping_registry = mapping_registry
+        self.checkpoints = checkpoints
+        self.result_cache = result_cache
+        self.random_orders = random_orders
 
         self.sorting = sorting
 
         if is_from_setting_if_none:
             self.init_from_setting()
 
+        if self.async_elasticsearch is None:
+            self.async_elasticsearch = AsyncElasticsearch(hosts=hosts)
+
     def init_from_setting(self):
         if self.hosts is None:
-            self.async_elasticsearch = get_async_elasticsearch()
+            self.async_elasticsearch = get_shared_async_elasticsearch()
+            self.is_shared_async_elasticsearch = True
+        if self.mapping_registry is None:
+            self.mapping_registry = elasticsearch_mapping_registry
+        if self.checkpoints is None:
+            self.checkpoints = search_checkpoints
+        if self.result_cache is None:
+            self.result_cache = search_result_cache
+        if self.random_orders is None:
+            self.random_orders = random_orders
 
     async def close(self):
-        await self.async_elasticsearch.close()
+        if not self.is_shared_async_elasticsearch:
+            await self.async_elasticsearch.close()
 
     async def get_by_id(self, id: str) -> SourceT:
         raise NotImplementedError()
@@ -90,27 +158,13 @@ class CrudAsyncElasticsearchBase(Generic[SourceT], AsyncSession):
 
     @session
     async def get_field_names(self) -> Set[str]:
+        if self.mapping_registry is not None:
+            return await self.mapping_registry.get_field_names(
+                self.async_elasticsearch, self.index
+            )
         resp = await self.async_elasticsearch.indices.get_mapping(index=self.index)
         mappings = resp.get(self.index, {}).get("mappings", None)
-        if mappings is None:
-            return set()
-        field_names = set()
-        stack = deque([(mappings, "")])
-        while stack:
-            current_mappings, parent_field_name = stack.popleft()
-            properties = current_mappings.get("properties", None)
-
-            if properties is None:
-                field_names.add(parent_field_name)
-                continue
-
-            for field_name, next_mappings in properties.items():
-                if parent_field_name:
-                    stack.append((next_mappings, f"{parent_field_name}.{field_name}"))
-                else:
-                    stack.append((next_mappings, field_name))
-
-        return field_names
+        return get_field_names_from_mappings(mappings)
 
     def get_basic_dsl(self, size: int = ELASTICSEARCH_SIZE) -> dict:
         return {
@@ -150,8 +204,15 @@ class CrudAsyncElasticsearchBase(Generic[SourceT], AsyncSession):
         return new_pairs, remaining_keywords
 
     def _get_ngram_constant_score_query(
-        self, keywords: List[str], fuzziness: int = 0
+        self,
+        keywords: List[str],
+        fuzziness: int = 0,
+        boolean: ElasticsearchQueryBooleanEnum = ElasticsearchQueryBooleanEnum.SHOULD,
     ) -> List[Any]:
+        """The characters of the keywords are matched with the n-gram subfields by one
+        `get_ngram_query` instead of one clause per character.
+        """
+
         _keywords_ngram = "".join(keywords)
 
         ngram_fields = []
@@ -163,20 +224,11 @@ class CrudAsyncElasticsearchBase(Generic[SourceT], AsyncSession):
             else:
                 non_ngram_fields.append(field)
 
-        ngram_constant_score_query = [
-            {
-                "constant_score": {
-                    "filter": {
-                        "multi_match": {
-                            "query": keyword,
-                            "fuzziness": fuzziness,
-                            "fields": ngram_fields,
-                        }
-                    }
-                }
-            }
-            for keyword in _keywords_ngram
-        ]
+        ngram_constant_score_query = []
+        if _keywords_ngram and ngram_fields:
+            ngram_constant_score_query.append(
+                get_ngram_query(_keywords_ngram, ngram_fields, boolean)
+            )
 
         non_ngram_constant_score_query = [
             {
@@ -243,7 +295,7 @@ class CrudAsyncElasticsearchBase(Generic[SourceT], AsyncSession):
 
         if keyword_analyzer == ElasticsearchAnalyzerEnum.NGRAM.value:
             constant_score_query = self._get_ngram_constant_score_query(
-                new_remaining_keywords, fuzziness
+                new_remaining_keywords, fuzziness, boolean
             )
         else:
             constant_score_query = self._get_constant_score_query(
@@ -304,10 +356,13 @@ class CrudAsyncElasticsearchBase(Generic[SourceT], AsyncSession):
 
         if analyzer == ElasticsearchAnalyzerEnum.NGRAM:
             _keywords = keywords.replace(" ", "")
-        else:
-            _keywords = keywords.split()
+            if _keywords:
+                dsl["query"]["bool"][_boolean].append(
+                    get_ngram_query(_keywords, [_field_name], _boolean)
+                )
+            return
 
-        for k in _keywords:
+        for k in keywords.split():
             dsl["query"]["bool"][_boolean].append(
                 {
                     "constant_score": {
@@ -322,68 +377,350 @@ class CrudAsyncElasticsearchBase(Generic[SourceT], AsyncSession):
                 }
             )
 
-    @session
-    async def query(self, page: int, dsl: dict) -> dict:
-        size = dsl.get("size", None)
-        if size is None:
-            raise ValueError("key `size` not found")
+    async def open_point_in_time(self) -> str:
+        resp = await self.async_elasticsearch.open_point_in_time(
+            index=self.index, keep_alive=ELASTICSEARCH_PIT_KEEP_ALIVE
+        )
+        return resp["id"]
 
-        target_idx = page * size
-        max_page = ELASTICSEARCH_INDEX_MAX_RESULT_WINDOW // size
+    async def search_with_point_in_time(self, dsl: dict, pit_id: str) -> dict:
+        """The response has the `pit_id` which should be used by the next search."""
+        return await self.async_elasticsearch.search(
+            pit={"id": pit_id, "keep_alive": ELASTICSEARCH_PIT_KEEP_ALIVE}, **dsl
+        )
 
-        if target_idx > ELASTICSEARCH_INDEX_MAX_RESULT_WINDOW:
-            current_page = max_page
+    @property
+    def is_point_in_time_shared(self) -> bool:
+        return self.checkpoints is not None and self.checkpoints.is_available
 
-            dsl["from_"] = self.get_from(current_page, size)
+    async def close_point_in_time(self, pit_id: str):
+        try:
+            await self.async_elasticsearch.close_point_in_time(body={"id": pit_id})
+        except NotFoundError:
+            pass
 
-            _resp = await self.async_elasticsearch.search(index=self.index, **dsl)
-            total = _resp["hits"]["total"]["value"]
+    async def _search_after(
+        self,
+        page: int,
+        dsl: dict,
+        search_after: List[Any],
+        pit_id: Optional[str],
+        query_key: str,
+    ) -> dict:
+        if pit_id is None:
+            dsl["from_"] = 0
+            dsl["search_after"] = search_after
+            return await self.async_elasticsearch.search(index=self.index, **dsl)
+        try:
+            return await self.search_with_point_in_time(
+                {**dsl, "from_": 0, "search_after": search_after}, pit_id
+            )
+        except NotFoundError:
+            # The sort values of the expired point in time end with its `_shard_doc`,
+            # which does not apply to another one, so the page is searched again.
+            return await self._search_deep(page, dsl, query_key)
+
+    async def _search_deep(self, page: int, dsl: dict, query_key: str) -> dict:
+        """Skip the hits before the page with `search_after` from the nearest
+        checkpoint. The skipping searches do not fetch `_source` and all the searches
+        share a point in time.
+
+        The point in time is kept with the checkpoints and reused by the next deep page
+        of the query. Once it has expired, the hits are skipped from the start with a
+        new one, because the checkpoints only apply to their point in time. It is closed
+        after the search if it cannot be kept, and the response does not have the
+        cursor then.
+        """
+
+        if not self.is_point_in_time_shared:
+            pit_id = await self.open_point_in_time()
+            resp = {}
+            try:
+                resp = await self._search_deep_with_point_in_time(
+                    page, dsl, query_key, pit_id
+                )
+            finally:
+                await self.close_point_in_time(resp.pop("pit_id", pit_id))
+            return resp
+
+        pit_id = await self.checkpoints.get_pit_id(query_key)
+        if pit_id is not None:
+            try:
+                return await self._search_deep_with_point_in_time(
+                    page, dsl, query_key, pit_id
+                )
+            except NotFoundError:
+                pass
+        pit_id = await self.open_point_in_time()
+        return await self._search_deep_with_point_in_time(page, dsl, query_key, pit_id)
 
-            if page > (total // size + 1):
-                _resp = {"hits": {}}
-                # sources = ElasticsearchSearchResult[SourceT](**{"hits": {}})
-            else:
-                page -= max_page
+    async def _search_deep_with_point_in_time(
+        self, page: int, dsl: dict, query_key: str, pit_id: str
+    ) -> dict:
+        size = dsl["size"]
+        target_offset = self.get_from(page, size)
 
-                dsl["from_"] = 0
+        offset, search_after = 0, None
+        if self.is_point_in_time_shared:
+            offset, search_after = await self.checkpoints.get_nearest(
+                query_key, pit_id, target_offset
+            )
 
-                while page > 1:
-                    if page > max_page:
-                        p = max_page
-                    else:
-                        p = page - 1
+        skip_dsl = {
+            k: v
+            for k, v in dsl.items()
+            if k not in ("size", "from_", "search_after", "track_total_hits")
+        }
+        skip_dsl["_source"] = False
+        skip_dsl["track_total_hits"] = False
 
-                    dsl["size"] = size * p
-                    dsl["search_after"] = _resp["hits"]["hits"][-1]["sort"]
+        checkpoints = {}
+        while offset < target_offset:
+            skip_size = min(
+                target_offset - offset, ELASTICSEARCH_INDEX_MAX_RESULT_WINDOW
+            )
+            skip_dsl["size"] = skip_size
+            if search_after is not None:
+                skip_dsl["search_after"] = search_after
+
+            _resp = await self.search_with_point_in_time(skip_dsl, pit_id)
+            pit_id = _resp.get("pit_id", pit_id)
+            hits = _resp["hits"]["hits"]
+            if len(hits) == 0:
+                break
+
+            offset += len(hits)
+            search_after = hits[-1]["sort"]
+            checkpoints[offset] = search_after
+            if len(hits) < skip_size:
+                break
+
+        resp = {"hits": {}}
+        if offset >= target_offset:
+            page_dsl = {
+                k: v for k, v in dsl.items() if k not in ("from_", "search_after")
+            }
+            page_dsl["from_"] = 0
+            if search_after is not None:
+                page_dsl["search_after"] = search_after
+            resp = await self.search_with_point_in_time(page_dsl, pit_id)
+            pit_id = resp.get("pit_id", pit_id)
+
+        if self.is_point_in_time_shared:
+            await self.checkpoints.set_pit_id(query_key, pit_id)
+            await self.checkpoints.set(query_key, pit_id, checkpoints)
+        return resp
+
+    def _set_cursor(self, resp: dict, page: int, size: int, query_key: str):
+        """The cursor is only set for the searches with a point in time, whose sort
+        values end with the unique `_shard_doc` tiebreaker, so that no hit is skipped or
+        repeated by `search_after`.
+        """
+
+        pit_id = resp.get("pit_id", None)
+        hits = resp.get("hits", {}).get("hits", [])
+        if pit_id is None or len(hits) < size or not hits[-1].get("sort", None):
+            return
+        cursor = ElasticsearchSearchCursor(
+            key=query_key,
+            page=page + 1,
+            size=size,
+            search_after=hits[-1]["sort"],
+            pit_id=pit_id,
+        )
+        resp["cursor"] = encode_cursor(cursor)
 
-                    _resp = await self.async_elasticsearch.search(
-                        index=self.index, **dsl
-                    )
+    async def _get_or_search(
+        self, search: Callable[[], Awaitable[dict]], *args: Any
+    ) -> dict:
+        """Get the response from the result cache keyed by `args` if it is available."""
+        if self.result_cache is None:
+            return await search()
+        key = get_result_key(self.index, *args)
+        return await self.result_cache.get_or_search(self.index, key, search)
 
-                    page -= p
+    @session
+    async def query(
+        self,
+        page: int,
+        dsl: dict,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+    ) -> dict:
+        """`fields` are the `_source` includes of the hits. The whole `_source` is
+        returned if it is `None`.
+        """
+        if fields is not None:
+            dsl["_source"] = {"includes": fields}
+        return await self._get_or_search(
+            lambda: self._query(page, dsl, cursor), "query", page, dsl, cursor
+        )
 
-                dsl["size"] = size
-                dsl["search_after"] = _resp["hits"]["hits"][-1]["sort"]
+    async def _query(self, page: int, dsl: dict, cursor: Optional[str] = None) -> dict:
+        """Get the page of the hits. The page after the result window is reached by the
+        point in time and `search_after`. The result of a search with a point in time
+        has the opaque `cursor` of the next page, which makes the next page as cheap as
+        the first one.
+        """
 
-                _resp = await self.async_elasticsearch.search(index=self.index, **dsl)
-                # sources = ElasticsearchSearchResult[SourceT](**_resp)
+        size = dsl.get("size", None)
+        if size is None:
+            raise ValueError("key `size` not found")
 
+        query_key = get_query_key(self.index, dsl)
+
+        _cursor = None
+        if cursor is not None:
+            _cursor = decode_cursor(cursor)
+            # The cursor of another query or another page size is ignored.
+            if _cursor is not None and (
+                _cursor.key != query_key or _cursor.size != size
+            ):
+                _cursor = None
+
+        if _cursor is not None:
+            page = _cursor.page
+            _resp = await self._search_after(
+                page, dsl, _cursor.search_after, _cursor.pit_id, query_key
+            )
+        elif page * size > ELASTICSEARCH_INDEX_MAX_RESULT_WINDOW:
+            _resp = await self._search_deep(page, dsl, query_key)
         else:
             dsl["from_"] = self.get_from(page, size)
             _resp = await self.async_elasticsearch.search(index=self.index, **dsl)
             # sources = ElasticsearchSearchResult[SourceT](**_resp)
 
+        self._set_cursor(_resp, page, size, query_key)
         return _resp
 
     @session
     async def custom(self, body: dict) -> dict:
-        return await self.async_elasticsearch.search(index=self.index, **body)
+        return await self._get_or_search(
+            lambda: self.async_elasticsearch.search(index=self.index, **body),
+            "custom",
+            body,
+        )
 
     @session
     async def count(self, body: dict) -> ElasticsearchCountResult:
-        _resp = await self.async_elasticsearch.count(index=self.index, body=body)
+        _resp = await self._get_or_search(
+            lambda: self.async_elasticsearch.count(index=self.index, body=body),
+            "count",
+            body,
+        )
         return ElasticsearchCountResult(**_resp)
 
+    @session
+    async def count_many(self, bodies: List[dict]) -> List[ElasticsearchCountResult]:
+        """Count the hits of all the bodies with one `_msearch` without fetching any
+        hit. The results are in the order of the bodies.
+        """
+
+        if len(bodies) == 0:
+            return []
+
+        searches = []
+        for body in bodies:
+            searches.append({"index": self.index})
+            searches.append({**body, "size": 0, "track_total_hits": True})
+
+        _resp = await self._get_or_search(
+            lambda: self.async_elasticsearch.msearch(body=searches),
+            "count_many",
+            bodies,
+        )
+
+        results = []
+        for resp in _resp["responses"]:
+            if "error" in resp:
+                raise HTTPException(
+                    status_code=resp.get("status", 400), detail=resp["error"]
+                )
+            total = resp["hits"]["total"]["value"]
+            results.append(ElasticsearchCountResult(count=total))
+        return results
+
+    async def get_ids(self, query: dict) -> List[str]:
+        """Collect the IDs of the documents of the query with a sliced scroll."""
+
+        slices = 1
+        if self.random_orders is not None:
+            slices = self.random_orders.scroll_slices
+
+        async def _scan(slice_id: int) -> List[str]:
+            dsl = {"query": query, "_source": False, "sort": ["_doc"]}
+            if slices > 1:
+                dsl["slice"] = {"id": slice_id, "max": slices}
+            return [
+                doc["_id"]
+                async for doc in async_scan(
+                    client=self.async_elasticsearch, query=dsl, index=self.index
+                )
+            ]
+
+        ids = []
+        for slice_ids in await asyncio.gather(*[_scan(i) for i in range(slices)]):
+            ids += slice_ids
+        return ids
+
+    async def _shuffle_ids(
+        self, key: str, query: dict, seed: int, offset: int, size: int
+    ) -> Optional[Tuple[List[str], int]]:
+        generation = await self.random_orders.get_generation(self.index)
+        if generation is None:
+            return None
+        resp = await self.async_elasticsearch.count(
+            index=self.index, body={"query": query}
+        )
+        if resp["count"] > self.random_orders.max_ids:
+            return None
+
+        ids = await self.get_ids(query)
+        shuffle_ids(ids, seed)
+        await self.random_orders.set(self.index, key, generation, ids)
+        return ids[offset : offset + size], len(ids)
+
+    async def _random_by_ids(
+        self,
+        page: int,
+        size: int,
+        query: dict,
+        seed: int,
+        fields: Optional[List[str]] = None,
+    ) -> Optional[dict]:
+        """Get the page from the IDs shuffled by the seed. The IDs are collected and
+        shuffled on the first request of the seed and the query, and every page after
+        that is one lookup of its IDs. Return `None` if there are too many documents
+        to shuffle or the IDs can't be cached.
+        """
+
+        key = get_random_key(self.index, seed, query)
+        offset = self.get_from(page, size)
+
+        cached = await self.random_orders.get_page(self.index, key, offset, size)
+        if cached is None:
+            async with self.random_orders.lock(key):
+                # the IDs may have been shuffled while waiting for the lock
+                cached = await self.random_orders.get_page(
+                    self.index, key, offset, size
+                )
+                if cached is None:
+                    cached = await self._shuffle_ids(key, query, seed, offset, size)
+        if cached is None:
+            return None
+
+        ids, total = cached
+        hits = []
+        if len(ids) > 0:
+            dsl = {"query": {"ids": {"values": ids}}, "size": len(ids)}
+            if fields is not None:
+                dsl["_source"] = {"includes": fields}
+            resp = await self.async_elasticsearch.search(index=self.index, **dsl)
+            docs = {hit["_id"]: hit for hit in resp["hits"]["hits"]}
+            hits = [docs[id] for id in ids if id in docs]
+
+        return {"hits": {"total": {"value": total, "relation": "eq"}, "hits": hits}}
+
     @session
     async def random(
         self,
@@ -394,26 +731,31 @@ class CrudAsyncElasticsearchBase(Generic[SourceT], AsyncSession):
         fuzziness: int = 0,
         boolean: ElasticsearchQueryBooleanEnum = ElasticsearchQueryBooleanEnum.SHOULD,
         seed: int = 1048596,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
     ) -> dict:
+        query = {"match_all": {}}
+        if keywords:
+            query = await self.get_match_query(
+                keywords,
+                keyword_analyzer=keyword_analyzer,
+                fuzziness=fuzziness,
+                boolean=boolean,
+            )
+
+        if self.random_orders is not None and self.random_orders.is_available:
+            resp = await self._random_by_ids(page, size, query, seed, fields=fields)
+            if resp is not None:
+                return resp
+
         dsl = self.get_basic_dsl(size=size)
         dsl["query"] = {
             "function_score": {
-                "query": {"match_all": {}},
+                "query": query,
                 "random_score": {"seed": seed, "field": "id.keyword"},
             }
         }
-
-        if keywords:
-            dsl["query"]["function_score"]["query"] = dsl["query"] = (
-                await self.get_match_query(
-                    keywords,
-                    keyword_analyzer=keyword_analyzer,
-                    fuzziness=fuzziness,
-                    boolean=boolean,
-                )
-            )
-
-        return await self.query(page, dsl)
+        return await self.query(page, dsl, cursor=cursor, fields=fields)
 
     @session
     async def match(
@@ -424,9 +766,11 @@ class CrudAsyncElasticsearchBase(Generic[SourceT], AsyncSession):
         keyword_analyzer: ElasticsearchAnalyzerEnum = ElasticsearchAnalyzerEnum.DEFAULT,
         fuzziness: int = 0,
         boolean: ElasticsearchQueryBooleanEnum = ElasticsearchQueryBooleanEnum.SHOULD,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
     ) -> dict:
         if keywords is None or keywords == "":
-            return await self.match_all(page, size=size)
+            return await self.match_all(page, size=size, cursor=cursor, fields=fields)
 
         dsl = self.get_basic_dsl(size=size)
 
@@ -437,21 +781,32 @@ class CrudAsyncElasticsearchBase(Generic[SourceT], AsyncSession):
             boolean=boolean,
         )
 
-        source = await self.query(page, dsl)
+        source = await self.query(page, dsl, cursor=cursor, fields=fields)
         return source
 
     @session
     async def match_by_query(
-        self, dsl: dict, page: int, size: int = ELASTICSEARCH_SIZE
+        self,
+        dsl: dict,
+        page: int,
+        size: int = ELASTICSEARCH_SIZE,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
     ) -> dict:
         dsl = self.update_dsl(dsl=dsl, size=size)
-        return await self.query(page, dsl)
+        return await self.query(page, dsl, cursor=cursor, fields=fields)
 
     @session
-    async def match_all(self, page: int, size: int = ELASTICSEARCH_SIZE) -> dict:
+    async def match_all(
+        self,
+        page: int,
+        size: int = ELASTICSEARCH_SIZE,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+    ) -> dict:
         dsl = self.get_basic_dsl(size=size)
         dsl["query"] = {"match_all": {}}
-        return await self.query(page, dsl)
+        return await self.query(page, dsl, cursor=cursor, fields=fields)
 
     @session
     async def get_total(self) -> Optional[int]:
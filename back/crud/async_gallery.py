@@ -1,12 +1,16 @@
+import asyncio
 from pathlib import Path
-from typing import Any, Callable, Dict, List, Optional
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set
 from uuid import uuid4
 
 from elasticsearch import AsyncElasticsearch
-from elasticsearch.helpers import async_bulk, async_scan
+from elasticsearch.helpers import async_scan
 from fastapi import HTTPException
 
-from back.crud.async_elasticsearch import CrudAsyncElasticsearchBase
+from back.crud.async_bulk import AsyncBulkIndexer
+from back.crud.async_elasticsearch import CrudAsyncElasticsearchBase, invalidate_index
+from back.crud.async_image_cache import GalleryImageCache, gallery_image_cache
+from back.crud.async_manifest import GalleryManifest
 from back.crud.async_progress import Progress
 from back.db.crud import CrudStorageMinio
 from back.init.check import ping_elasticsearch, ping_storage
@@ -18,9 +22,18 @@ from back.model.elasticsearch import (
     ElasticsearchKeywordAnalyzers,
     ElasticsearchQueryBooleanEnum,
 )
-from back.model.gallery import Galleries, Gallery, GalleryOrderedFieldEnum
+from back.model.gallery import (
+    Galleries,
+    Gallery,
+    GalleryImageUrl,
+    GalleryOrderedFieldEnum,
+)
+from back.model.storage import StorageGalleryManifestEntry, StorageGallerySummary
 from back.model.task import ZetsuBouTaskProgressEnum
-from back.session.async_elasticsearch import get_async_elasticsearch
+from back.session.async_elasticsearch import (
+    get_async_elasticsearch,
+    get_shared_async_elasticsearch,
+)
 from back.session.storage import get_storage_session_by_source
 from back.session.storage.async_s3 import AsyncS3Session
 from back.settings import setting
@@ -29,6 +42,8 @@ from back.utils.dt import (
     get_now,
     is_isoformat_with_timezone,
 )
+from back.utils.pool import run_in_pool
+from back.utils.query import QueryCompiler
 from back.utils.session import AsyncSession, session
 
 ELASTICSEARCH_INDEX_MAX_RESULT_WINDOW = 10000
@@ -42,6 +57,9 @@ DIR_FNAME = setting.gallery_dir_fname
 TAG_FNAME = setting.gallery_tag_fname
 
 APP_GALLERY_SYNC_PAGES = setting.app_gallery_sync_pages
+APP_GALLERY_SYNC_CONCURRENCY = setting.app_gallery_sync_concurrency
+APP_GALLERY_SYNC_FLAT_LISTING = setting.app_gallery_sync_flat_listing
+APP_GALLERY_SYNC_INCREMENTAL = setting.app_gallery_sync_incremental
 
 elasticsearch_gallery_analyzer: ElasticsearchKeywordAnalyzers = {
     ElasticsearchAnalyzerEnum.DEFAULT.value: [
@@ -159,13 +177,9 @@ class CrudAsyncElasticsearchGallery(CrudAsyncElasticsearchBase[Gallery]):
         is_desc: bool = True,
         labels: List[str] = [],
         tags: Dict[str, List[str]] = {},
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
     ):
-        dsl = {
-            "query": {"bool": {"must": [], "should": []}},
-            "size": size,
-            "track_total_hits": True,
-        }
-
         sorting = ["_score"]
         if order_by is None:
             sorting.append({"last_updated": {"order": "desc", "unmapped_type": "long"}})
@@ -175,140 +189,57 @@ class CrudAsyncElasticsearchGallery(CrudAsyncElasticsearchBase[Gallery]):
         else:
             sorting.append({order_by: {"order": "asc"}})
 
-        dsl["sort"] = sorting
+        compiler = QueryCompiler()
 
         if keywords is not None:
-            if type(keywords_bool) is not str:
-                keywords_bool = keywords_bool.value
-
-            keywords = keywords.split()
-            keyword_fields = self.get_keyword_fields(keywords_analyzer)
-            for keyword in keywords:
-                dsl["query"]["bool"][keywords_bool].append(
-                    {
-                        "constant_score": {
-                            "filter": {
-                                "multi_match": {
-                                    "query": keyword,
-                                    "fuzziness": keywords_fuzziness,
-                                    "fields": keyword_fields,
-                                }
-                            }
-                        }
-                    }
-                )
-        if name is not None:
-            self.add_advanced_query(
-                dsl, name, "name", name_analyzer, name_fuzziness, name_bool
+            compiler.add_multi_match(
+                keywords.split(),
+                self.get_keyword_fields(keywords_analyzer),
+                fuzziness=keywords_fuzziness,
+                boolean=keywords_bool,
             )
 
+        if name is not None:
+            compiler.add_text(name, "name", name_analyzer, name_fuzziness, name_bool)
         if raw_name is not None:
-            self.add_advanced_query(
-                dsl,
+            compiler.add_text(
                 raw_name,
                 "raw_name",
                 raw_name_analyzer,
                 raw_name_fuzziness,
                 raw_name_bool,
             )
-
         if other_names is not None:
-            self.add_advanced_query(
-                dsl,
+            compiler.add_text(
                 other_names,
                 "other_names",
                 other_names_analyzer,
                 other_names_fuzziness,
                 other_names_bool,
             )
-
         if src is not None:
-            self.add_advanced_query(
-                dsl,
-                src,
-                "src",
-                src_analyzer,
-                src_fuzziness,
-                src_bool,
-            )
-
+            compiler.add_text(src, "src", src_analyzer, src_fuzziness, src_bool)
         if path is not None:
-            self.add_advanced_query(
-                dsl,
-                path,
-                "path",
-                path_analyzer,
-                path_fuzziness,
-                path_bool,
-            )
+            compiler.add_text(path, "path", path_analyzer, path_fuzziness, path_bool)
 
         if category is not None:
-            dsl["query"]["bool"]["must"].append(
-                {
-                    "constant_score": {
-                        "filter": {
-                            "multi_match": {
-                                "query": category,
-                                "fields": ["attributes.category"],
-                            }
-                        }
-                    }
-                }
-            )
-
+            compiler.add_term("attributes.category.keyword", category)
         if uploader is not None:
-            dsl["query"]["bool"]["must"].append(
-                {
-                    "constant_score": {
-                        "filter": {
-                            "multi_match": {
-                                "query": uploader,
-                                "fields": ["attributes.uploader"],
-                            }
-                        }
-                    }
-                }
-            )
-
-        if rating_gte is not None:
-            dsl["query"]["bool"]["must"].append(
-                {"range": {"attributes.rating": {"gte": rating_gte}}}
-            )
-        if rating_lte is not None:
-            dsl["query"]["bool"]["must"].append(
-                {"range": {"attributes.rating": {"lte": rating_lte}}}
-            )
-
-        for label in labels:
-            dsl["query"]["bool"]["must"].append(
-                {
-                    "constant_score": {
-                        "filter": {
-                            "multi_match": {
-                                "query": label,
-                                "fields": ["labels"],
-                            }
-                        }
-                    }
-                }
-            )
+            compiler.add_term("attributes.uploader.keyword", uploader)
+        compiler.add_range("attributes.rating", gte=rating_gte, lte=rating_lte)
 
+        compiler.add_terms("labels.keyword", labels)
         for tag_field, tag_values in tags.items():
-            for tag_value in tag_values:
-                dsl["query"]["bool"]["must"].append(
-                    {
-                        "constant_score": {
-                            "filter": {
-                                "multi_match": {
-                                    "query": tag_value,
-                                    "fields": [f"tags.{tag_field}"],
-                                }
-                            }
-                        }
-                    }
-                )
+            compiler.add_terms(f"tags.{tag_field}.keyword", tag_values)
 
-        return await self.query(page, dsl)
+        dsl = {
+            "query": compiler.compile(),
+            "size": size,
+            "sort": sorting,
+            "track_total_hits": True,
+        }
+
+        return await self.query(page, dsl, cursor=cursor, fields=fields)
 
     @session
     async def match_phrase_prefix(
@@ -335,13 +266,9 @@ async def get_gallery_by_gallery_id(id: str) -> Gallery:
     return doc
 
 
-async def _create_gallery_tag_in_storage(
-    storage_session: AsyncS3Session,
-    source: SourceBaseModel,
-    tag_source: SourceBaseModel,
-) -> Gallery:
+def _get_new_gallery_tag(source: SourceBaseModel) -> Gallery:
     now = get_now()
-    gallery = Gallery(
+    return Gallery(
         **{
             "id": str(uuid4()),
             "path": source.path,
@@ -351,10 +278,6 @@ async def _create_gallery_tag_in_storage(
         }
     )
 
-    await storage_session.put_json(tag_source, gallery.model_dump())
-
-    return gallery
-
 
 async def _get_gallery_tag_from_storage(
     storage_session: AsyncS3Session,
@@ -382,32 +305,43 @@ class CrudAsyncGallery:
         index: Optional[str] = None,
         dir_fname: Optional[str] = None,
         tag_fname: Optional[str] = None,
+        image_cache: Optional[GalleryImageCache] = None,
         is_from_setting_if_none: bool = False,
     ):
         self.gallery_id = gallery_id
         self.hosts = hosts
-        self.async_elasticsearch = AsyncElasticsearch(self.hosts)
+        self.async_elasticsearch: Optional[AsyncElasticsearch] = None
+        # the shared client is borrowed and must not be closed
+        self.is_shared_async_elasticsearch = False
         self.index = index
         self.dir_fname = dir_fname
         self.tag_fname = tag_fname
+        self.image_cache = image_cache
         self.storage_session = None
 
         if is_from_setting_if_none:
             if self.hosts is None:
-                self.async_elasticsearch = get_async_elasticsearch()
+                self.async_elasticsearch = get_shared_async_elasticsearch()
+                self.is_shared_async_elasticsearch = True
             if self.index is None:
                 self.index = ELASTICSEARCH_INDEX_GALLERY
             if dir_fname is None:
                 self.dir_fname = DIR_FNAME
             if tag_fname is None:
                 self.tag_fname = TAG_FNAME
+            if self.image_cache is None:
+                self.image_cache = gallery_image_cache
+
+        if self.async_elasticsearch is None:
+            self.async_elasticsearch = AsyncElasticsearch(self.hosts)
 
     async def init(self):
         self.gallery = await get_gallery_by_gallery_id(self.gallery_id)
         self.storage_session = await get_storage_session_by_source(self.gallery)
 
     async def close(self):
-        await self.async_elasticsearch.close()
+        if not self.is_shared_async_elasticsearch:
+            await self.async_elasticsearch.close()
 
     async def __aenter__(self):
         await self.init()
@@ -475,6 +409,10 @@ class CrudAsyncGallery:
             await self.async_elasticsearch.index(
                 index=self.index, id=new_gallery.id, document=new_gallery.model_dump()
             )
+            await invalidate_index(self.index)
+
+            if self.image_cache is not None:
+                await self.image_cache.invalidate(new_gallery.id)
 
             return new_gallery
 
@@ -485,9 +423,17 @@ class CrudAsyncGallery:
         return tag
 
     async def get_image_filenames(self) -> List[str]:
+        if self.image_cache is not None:
+            images = await self.image_cache.get_image_filenames(self.gallery.id)
+            if images is not None:
+                return images
+
         async with self.storage_session:
             images = await self.storage_session.list_images(self.gallery)
 
+        if self.image_cache is not None:
+            await self.image_cache.set_image_filenames(self.gallery.id, images)
+
         return images
 
     async def get_cover(self) -> str:
@@ -497,10 +443,61 @@ class CrudAsyncGallery:
         cover_filename = images[0]
         return await self.get_image(cover_filename)
 
+    async def _generate_image_url(self, image_name: str) -> str:
+        image_source = self.gallery.get_joined_source(image_name)
+        if self.image_cache is None:
+            return await self.storage_session.get_url(image_source)
+        return await self.storage_session.get_url(
+            image_source, expires_in=self.image_cache.url_expires_in
+        )
+
     async def get_image(self, image_name: str) -> str:
+        if self.image_cache is not None:
+            url = await self.image_cache.get_url(self.gallery.id, image_name)
+            if url is not None:
+                return url
+
         async with self.storage_session:
-            image_source = self.gallery.get_joined_source(image_name)
-            return await self.storage_session.get_url(image_source)
+            url = await self._generate_image_url(image_name)
+
+        if self.image_cache is not None:
+            await self.image_cache.set_url(self.gallery.id, image_name, url)
+        return url
+
+    async def get_image_urls(
+        self, start: int = 0, end: Optional[int] = None
+    ) -> List[GalleryImageUrl]:
+        """Get the URLs of the images from `start` to `end` (exclusive) in the sorted
+        image filenames.
+        """
+
+        images = await self.get_image_filenames()
+        image_names = images[start:end]
+
+        if self.image_cache is None:
+            urls = [None] * len(image_names)
+        else:
+            urls = await self.image_cache.get_urls(self.gallery.id, image_names)
+
+        missing = [i for i, url in enumerate(urls) if url is None]
+        if len(missing) > 0:
+            async with self.storage_session:
+                new_urls = await asyncio.gather(
+                    *[self._generate_image_url(image_names[i]) for i in missing]
+                )
+            for i, url in zip(missing, new_urls):
+                urls[i] = url
+
+            if self.image_cache is not None:
+                await self.image_cache.set_urls(
+                    self.gallery.id,
+                    {image_names[i]: url for i, url in zip(missing, new_urls)},
+                )
+
+        return [
+            GalleryImageUrl(name=image_name, url=url)
+            for image_name, url in zip(image_names, urls)
+        ]
 
     async def exists(
         self,
@@ -512,9 +509,61 @@ class CrudAsyncGallery:
         async with self.storage_session:
             await self.storage_session.delete(self.gallery)
         await self.async_elasticsearch.delete(index=self.index, id=self.gallery.id)
+        await invalidate_index(self.index)
+        if self.image_cache is not None:
+            await self.image_cache.invalidate(self.gallery.id)
         return "ok"
 
 
+async def get_gallery_cover_url(gallery_id: str) -> str:
+    """Get the URL of the gallery cover without looking up the gallery in Elasticsearch
+    if it is cached.
+    """
+
+    images = await gallery_image_cache.get_image_filenames(gallery_id)
+    if images:
+        url = await gallery_image_cache.get_url(gallery_id, images[0])
+        if url is not None:
+            return url
+
+    async with CrudAsyncGallery(gallery_id, is_from_setting_if_none=True) as crud:
+        return await crud.get_cover()
+
+
+async def get_gallery_image_url(gallery_id: str, image_name: str) -> str:
+    """Get the URL of the gallery image without looking up the gallery in
+    Elasticsearch if it is cached.
+    """
+
+    url = await gallery_image_cache.get_url(gallery_id, image_name)
+    if url is not None:
+        return url
+
+    async with CrudAsyncGallery(gallery_id, is_from_setting_if_none=True) as crud:
+        return await crud.get_image(image_name)
+
+
+async def get_gallery_image_urls(
+    gallery_id: str, start: int = 0, end: Optional[int] = None
+) -> List[GalleryImageUrl]:
+    """Get the URLs of the gallery images without looking up the gallery in
+    Elasticsearch if they are all cached.
+    """
+
+    images = await gallery_image_cache.get_image_filenames(gallery_id)
+    if images is not None:
+        image_names = images[start:end]
+        urls = await gallery_image_cache.get_urls(gallery_id, image_names)
+        if all(url is not None for url in urls):
+            return [
+                GalleryImageUrl(name=image_name, url=url)
+                for image_name, url in zip(image_names, urls)
+            ]
+
+    async with CrudAsyncGallery(gallery_id, is_from_setting_if_none=True) as crud:
+        return await crud.get_image_urls(start=start, end=end)
+
+
 class CrudAsyncGallerySync(AsyncSession):
 
     def __init__(
@@ -525,6 +574,7 @@ class CrudAsyncGallerySync(AsyncSession):
         root_source: SourceBaseModel,
         depth: int,
         hosts: Optional[List[str]] = None,
+        async_elasticsearch: Optional[AsyncElasticsearch] = None,
         index: Optional[str] = None,
         target_index: Optional[str] = None,
         size: Optional[int] = None,
@@ -536,6 +586,11 @@ class CrudAsyncGallerySync(AsyncSession):
         progress_initial: float = 0,
         progress_final: float = 100.0,
         sync_pages: Optional[bool] = None,
+        concurrency: Optional[int] = None,
+        flat_listing: Optional[bool] = None,
+        incremental: Optional[bool] = None,
+        manifest: Optional[GalleryManifest] = None,
+        image_cache: Optional[GalleryImageCache] = None,
         callback: Optional[Callable[[Gallery], SourceBaseModel]] = None,
         new_gallery_model: Optional[SourceBaseModel] = None,
         is_progress: bool = True,
@@ -557,7 +612,7 @@ class CrudAsyncGallerySync(AsyncSession):
         self.dir_fname = dir_fname
         self.tag_fname = tag_fname
 
-        self.async_elasticsearch = AsyncElasticsearch(self.hosts)
+        self.async_elasticsearch = async_elasticsearch
 
         self.progress_initial = progress_initial
         self.progress_final = progress_final
@@ -568,12 +623,17 @@ class CrudAsyncGallerySync(AsyncSession):
                 self.storage_protocol, self.storage_id
             )
         self.sync_pages = sync_pages
+        self.concurrency = concurrency
+        self.flat_listing = flat_listing
+        self.incremental = incremental
+        self.manifest = manifest
+        self.image_cache = image_cache
         self.callback = callback
         self.new_gallery_model = new_gallery_model
         self.is_progress = is_progress
 
         if is_from_setting_if_none:
-            if self.hosts is None:
+            if self.hosts is None and self.async_elasticsearch is None:
                 self.async_elasticsearch = get_async_elasticsearch()
             if self.index is None:
                 self.index = ELASTICSEARCH_INDEX_GALLERY
@@ -587,10 +647,54 @@ class CrudAsyncGallerySync(AsyncSession):
                 self.tag_fname = TAG_FNAME
             if self.sync_pages is None:
                 self.sync_pages = APP_GALLERY_SYNC_PAGES
+            if self.concurrency is None:
+                self.concurrency = APP_GALLERY_SYNC_CONCURRENCY
+            if self.flat_listing is None:
+                self.flat_listing = APP_GALLERY_SYNC_FLAT_LISTING
+            if self.incremental is None:
+                self.incremental = APP_GALLERY_SYNC_INCREMENTAL
+            if self.manifest is None:
+                self.manifest = GalleryManifest(
+                    self.storage_protocol,
+                    self.storage_id,
+                    is_from_setting_if_none=True,
+                )
+            if self.image_cache is None:
+                self.image_cache = gallery_image_cache
+
+        if self.async_elasticsearch is None:
+            self.async_elasticsearch = AsyncElasticsearch(self.hosts)
+
+        if self.concurrency is None:
+            self.concurrency = 1
+
+        # The manifest describes the documents in `self.index`, so it is neither used
+        # nor updated when synchronizing to another index.
+        if self.manifest is not None:
+            if not self.manifest.is_available or self.target_index is not None:
+                self.manifest = None
+
+        # The incremental synchronization compares the ETags from the flat listing.
+        if self.incremental:
+            if self.manifest is None:
+                self.incremental = False
+            else:
+                self.flat_listing = True
 
         self.cache = set()
-        self._elasticsearch_to_storage_batches = []
-        self._storage_to_elasticsearch_batches = []
+        # the paths of the galleries found in the storage during the synchronization
+        self._storage_paths: Optional[Set[str]] = None
+
+        # The refresh is only disabled in a full synchronization, which rewrites every
+        # document of the storage.
+        index = self.index if self.target_index is None else self.target_index
+        self.bulk_indexer = AsyncBulkIndexer(
+            self.async_elasticsearch,
+            max_actions=self.batch_size,
+            disable_refresh=False if self.incremental else None,
+            refresh_indices=[index],
+            is_from_setting_if_none=is_from_setting_if_none,
+        )
 
     @property
     def dsl(self):
@@ -614,20 +718,28 @@ class CrudAsyncGallerySync(AsyncSession):
 
     async def are_galleries(self):
         async with self.storage_session:
+            if self.flat_listing:
+                return await self.storage_session.are_galleries_by_flat_listing(
+                    self.root_source, self.depth
+                )
             return await self.storage_session.are_galleries(
                 self.root_source, self.depth
             )
 
+    def iter_galleries(self) -> AsyncIterator[SourceBaseModel]:
+        if self.flat_listing:
+            return self.storage_session.iter_gallery_summaries(
+                self.root_source,
+                self.depth,
+                dir_fname=self.dir_fname,
+                tag_fname=self.tag_fname,
+            )
+        return self.storage_session.iter_directories(self.root_source, self.depth)
+
     async def iter_elasticsearch_batches(self, batches: List[dict]):
         for batch in batches:
             yield batch
 
-    @session
-    async def send_bulk(self, batches: List[dict]):
-        await async_bulk(self.async_elasticsearch, batches)
-        self._elasticsearch_to_storage_batches = []
-        self._storage_to_elasticsearch_batches = []
-
     async def _sync_gallery_storage_to_elasticsearch(
         self, source: SourceBaseModel
     ) -> Gallery:
@@ -635,20 +747,27 @@ class CrudAsyncGallerySync(AsyncSession):
         checking for differences between the two documents.
 
         In some cases, we need to update the JSON file in storage as well.
+
+        If `source` is a `StorageGallerySummary` from the flat listing, the existence of
+        the JSON file and the number of pages are taken from it.
         """
 
         tag_source = source.get_joined_source(self.dir_fname, self.tag_fname)
-        if not await self.storage_session.exists(tag_source):
-            tag = await _create_gallery_tag_in_storage(
-                self.storage_session, source, tag_source
-            )
-
+        if isinstance(source, StorageGallerySummary):
+            has_tag = source.has_tag
         else:
-            tag = await _get_gallery_tag_from_storage(self.storage_session, tag_source)
+            has_tag = await self.storage_session.exists(tag_source)
 
         # check if we need to update the JSON file in the storage
         need_to_update = False
 
+        if not has_tag:
+            need_to_update = True
+            tag = _get_new_gallery_tag(source)
+
+        else:
+            tag = await _get_gallery_tag_from_storage(self.storage_session, tag_source)
+
         now = get_now()
 
         if not tag.last_updated:
@@ -674,8 +793,11 @@ class CrudAsyncGallerySync(AsyncSession):
             tag.path = source.path
 
         if self.sync_pages:
-            images = await self.storage_session.list_images(source)
-            gallery_pages = len(images)
+            if isinstance(source, StorageGallerySummary):
+                gallery_pages = source.num_images
+            else:
+                images = await self.storage_session.list_images(source)
+                gallery_pages = len(images)
             if gallery_pages != tag.attributes.pages:
                 tag.attributes.pages = gallery_pages
                 need_to_update = True
@@ -690,22 +812,85 @@ class CrudAsyncGallerySync(AsyncSession):
 
         if need_to_update:
             # update the JSON file in storage
-            await _put_gallery_tag_in_storage(self.storage_session, tag, tag_source)
+            resp = await self.storage_session.put_json(tag_source, tag.model_dump())
+            if isinstance(source, StorageGallerySummary):
+                source.has_tag = True
+                source.tag_etag = resp.ETag
+                source.tag_last_modified = None
 
         # add the document to batches to update the document in Elasticsearch
         index = self.index
         if self.target_index is not None:
             index = self.target_index
         action = {"_index": index, "_id": tag.id, "_source": tag.model_dump()}
-        self._storage_to_elasticsearch_batches.append(action)
+        await self.bulk_indexer.add(action)
 
         self.cache.add(tag.id)
 
-        if len(self._storage_to_elasticsearch_batches) > self.batch_size:
-            await self.send_bulk(self._storage_to_elasticsearch_batches)
+        # the pages or the tag of the gallery have been changed
+        if need_to_update and self.image_cache is not None:
+            await self.image_cache.invalidate(tag.id)
 
         return tag
 
+    async def _sync_gallery(self, source: SourceBaseModel):
+        """Synchronize the gallery and keep the manifest up to date.
+
+        In the incremental synchronization, the galleries which did not change since
+        the last run are skipped.
+        """
+
+        if self._storage_paths is not None:
+            self._storage_paths.add(source.path)
+
+        if self.manifest is None or not isinstance(source, StorageGallerySummary):
+            await self._sync_gallery_storage_to_elasticsearch(source)
+            return
+
+        entry = self.manifest.entries.get(source.path, None)
+        if self.incremental and entry is not None and self.callback is None:
+            if not entry.is_changed(source):
+                self.cache.add(entry.id)
+                return
+
+        tag = await self._sync_gallery_storage_to_elasticsearch(source)
+
+        # the gallery ID in the tag file was changed by hand
+        if entry is not None and entry.id != tag.id and self.force:
+            await self.bulk_indexer.add(
+                {"_index": self.index, "_id": entry.id, "_op_type": "delete"}
+            )
+
+        self.manifest.set(
+            source.path,
+            StorageGalleryManifestEntry(
+                id=tag.id,
+                tag_etag=source.tag_etag,
+                tag_last_modified=source.tag_last_modified,
+                num_images=source.num_images,
+            ),
+        )
+
+    async def _sync_vanished_galleries(self):
+        """Delete the documents of the galleries which are in the manifest but no
+        longer in the storage.
+        """
+
+        vanished_paths = [
+            path for path in self.manifest.entries if path not in self._storage_paths
+        ]
+        logger_zetsubou.debug(f"vanished galleries (number): {len(vanished_paths)}")
+
+        if self.force:
+            for path in vanished_paths:
+                entry = self.manifest.entries[path]
+                await self.bulk_indexer.add(
+                    {"_index": self.index, "_id": entry.id, "_op_type": "delete"}
+                )
+        await self.bulk_indexer.join()
+
+        await self.manifest.delete(vanished_paths)
+
     async def _sync_gallery_elasticsearch_to_storage(self, doc: dict):
         source = doc.get("_source", None)
         if source is None:
@@ -716,9 +901,14 @@ class CrudAsyncGallerySync(AsyncSession):
         if gallery._scheme != self.root_source._scheme:
             return
 
-        exists = await self.storage_session.exists(gallery)
+        # reconcile against the galleries found by the storage to Elasticsearch pass
+        # instead of sending requests to the storage for each document
+        if self._storage_paths is None:
+            exists = await self.storage_session.exists(gallery)
+        else:
+            exists = gallery.path in self._storage_paths
         if (not exists or gallery.id not in self.cache) and self.force:
-            self._elasticsearch_to_storage_batches.append(
+            await self.bulk_indexer.add(
                 {
                     "_index": self.index,
                     "_id": gallery.id,
@@ -726,20 +916,14 @@ class CrudAsyncGallerySync(AsyncSession):
                 }
             )
 
-        if len(self._elasticsearch_to_storage_batches) > self.batch_size:
-            await self.send_bulk(self._elasticsearch_to_storage_batches)
-
     async def _sync_storage_to_elasticsearch_without_progress(self):
-        async for source in self.storage_session.iter_directories(
-            self.root_source, self.depth
-        ):
-            if source is None:
-                continue
-
-            await self._sync_gallery_storage_to_elasticsearch(source)
+        await run_in_pool(
+            self.iter_galleries(),
+            self._sync_gallery,
+            concurrency=self.concurrency,
+        )
 
-        if len(self._storage_to_elasticsearch_batches) > 0:
-            await self.send_bulk(self._storage_to_elasticsearch_batches)
+        await self.bulk_indexer.join()
 
     async def _sync_elasticsearch_to_storage_without_progress(self):
         query = self.dsl
@@ -749,14 +933,11 @@ class CrudAsyncGallerySync(AsyncSession):
         ):
             await self._sync_gallery_elasticsearch_to_storage(doc)
 
-        if len(self._elasticsearch_to_storage_batches) > 0:
-            await self.send_bulk(self._elasticsearch_to_storage_batches)
+        await self.bulk_indexer.join()
 
     async def _count_storage(self):
         self._sources = []
-        async for source in self.storage_session.iter_directories(
-            self.root_source, self.depth
-        ):
+        async for source in self.iter_galleries():
             if source is None:
                 continue
             self._sources.append(source)
@@ -788,24 +969,28 @@ class CrudAsyncGallerySync(AsyncSession):
             raise ValueError(f"Index: {self.target_index} should be empty.")
 
     async def _sync_storage_to_elasticsearch(self):
-        self._storage_to_elasticsearch_final = self.progress_initial + (
-            self._storage_to_elasticsearch_num
-            / (self._storage_to_elasticsearch_num + self._elasticsearch_to_storage_num)
-            * self.progress_interval
-        )
+        total = self._storage_to_elasticsearch_num + self._elasticsearch_to_storage_num
+        if total == 0:
+            self._storage_to_elasticsearch_final = self.progress_final
+        else:
+            self._storage_to_elasticsearch_final = self.progress_initial + (
+                self._storage_to_elasticsearch_num / total * self.progress_interval
+            )
 
-        async for source in Progress(
-            self._sources,
-            id=self.progress_id,
-            initial=self.progress_initial,
-            final=self._storage_to_elasticsearch_final,
-            total=self._storage_to_elasticsearch_num,
-            is_from_setting_if_none=True,
-        ):
-            await self._sync_gallery_storage_to_elasticsearch(source)
+        await run_in_pool(
+            Progress(
+                self._sources,
+                id=self.progress_id,
+                initial=self.progress_initial,
+                final=self._storage_to_elasticsearch_final,
+                total=self._storage_to_elasticsearch_num,
+                is_from_setting_if_none=True,
+            ),
+            self._sync_gallery,
+            concurrency=self.concurrency,
+        )
 
-        if len(self._storage_to_elasticsearch_batches) > 0:
-            await self.send_bulk(self._storage_to_elasticsearch_batches)
+        await self.bulk_indexer.join()
 
     async def _sync_elasticsearch_to_storage(self):
         query = self.dsl
@@ -820,8 +1005,7 @@ class CrudAsyncGallerySync(AsyncSession):
         ):
             await self._sync_gallery_elasticsearch_to_storage(doc)
 
-        if len(self._elasticsearch_to_storage_batches) > 0:
-            await self.send_bulk(self._elasticsearch_to_storage_batches)
+        await self.bulk_indexer.join()
 
     @session
     async def sync(self):
@@ -830,23 +1014,51 @@ class CrudAsyncGallerySync(AsyncSession):
         logger_zetsubou.debug(f"elasticsearch index: {self.index}")
         logger_zetsubou.debug(f"is progress: {self.is_progress}")
         logger_zetsubou.debug(f"progress id: {self.progress_id}")
+        logger_zetsubou.debug(f"concurrency: {self.concurrency}")
+        logger_zetsubou.debug(f"flat listing: {self.flat_listing}")
+        logger_zetsubou.debug(f"incremental: {self.incremental}")
 
         is_elasticsearch = await ping_elasticsearch()
         is_storage = await ping_storage()
         if not is_elasticsearch or not is_storage:
             return
 
-        async with self.storage_session:
+        self._storage_paths = set()
+        # The documents are reconciled against the storage unless the manifest knows
+        # them all.
+        is_reconciled = not self.incremental
+        if self.manifest is not None:
+            if self.incremental:
+                await self.manifest.load()
+                # e.g. the first run, whose galleries are unknown
+                if not self.manifest.entries:
+                    is_reconciled = True
+            elif self.flat_listing:
+                # a full synchronization by the flat listing rebuilds the manifest
+                await self.manifest.clear()
+
+        async with self.storage_session, self.bulk_indexer:
             await self._count_to_docs()
             if self.is_progress:
-                await self._count_docs()
+                if is_reconciled:
+                    await self._count_docs()
+                else:
+                    self._elasticsearch_to_storage_num = 0
                 await self._count_storage()
 
                 await self._sync_storage_to_elasticsearch()
-                await self._sync_elasticsearch_to_storage()
+                if is_reconciled:
+                    await self._sync_elasticsearch_to_storage()
             else:
                 await self._sync_storage_to_elasticsearch_without_progress()
-                await self._sync_elasticsearch_to_storage_without_progress()
+                if is_reconciled:
+                    await self._sync_elasticsearch_to_storage_without_progress()
+
+            if self.incremental:
+                await self._sync_vanished_galleries()
+
+        if self.manifest is not None:
+            await self.manifest.flush()
 
 
 async def clean_elasticsearch_gallery(
@@ -861,7 +1073,6 @@ async def clean_elasticsearch_gallery(
     removal of documents.
     """
     results = ElasticsearchCleanResult()
-    batches = []
     dsl = {
         "query": {
             "bool": {
@@ -886,24 +1097,20 @@ async def clean_elasticsearch_gallery(
         }
         dsl["query"]["bool"]["must_not"].append(q)
 
-    async for doc in async_scan(client=async_elasticsearch, query=dsl, index=index):
-        source = doc.get("_source", None)
-        gallery = Gallery(**source)
-        results.storage[gallery._scheme] += 1
-        batches.append(
-            {
-                "_index": index,
-                "_id": gallery.id,
-                "_op_type": "delete",
-            }
-        )
-        if len(batches) >= batch_size:
-            await async_bulk(async_elasticsearch, batches)
-            results.total += len(batches)
-            batches = []
-    if len(batches) > 0:
-        results.total += len(batches)
-        await async_bulk(async_elasticsearch, batches)
-        batches = []
+    async with AsyncBulkIndexer(
+        async_elasticsearch, max_actions=batch_size, is_from_setting_if_none=True
+    ) as bulk_indexer:
+        async for doc in async_scan(client=async_elasticsearch, query=dsl, index=index):
+            source = doc.get("_source", None)
+            gallery = Gallery(**source)
+            results.storage[gallery._scheme] += 1
+            await bulk_indexer.add(
+                {
+                    "_index": index,
+                    "_id": gallery.id,
+                    "_op_type": "delete",
+                }
+            )
+            results.total += 1
 
     return results
@@ -0,0 +1,255 @@
+import json
+import time
+from typing import Dict, List, Optional, Tuple
+
+from redis.asyncio import Redis
+
+from back.session.async_redis import async_redis as _async_redis
+from back.settings import setting
+from back.utils.cache import LRUCache
+
+APP_GALLERY_IMAGE_CACHE_SIZE = setting.app_gallery_image_cache_size
+APP_GALLERY_IMAGE_CACHE_EXPIRES_IN_SECONDS = (
+    setting.app_gallery_image_cache_expires_in_seconds
+)
+STORAGE_EXPIRES_IN_MINUTES = setting.storage_expires_in_minutes
+
+IMAGES_KEY_PREFIX = "zetsubou.gallery.images"
+URLS_KEY_PREFIX = "zetsubou.gallery.urls"
+GENERATION_KEY_PREFIX = "zetsubou.gallery.generation"
+
+# A presigned URL is not reused in the last 10% of its lifetime.
+URL_EXPIRATION_MARGIN_RATIO = 0.1
+
+
+def get_images_key(gallery_id: str, generation: int) -> str:
+    return f"{IMAGES_KEY_PREFIX}.{gallery_id}.{generation}"
+
+
+def get_urls_key(gallery_id: str, generation: int) -> str:
+    return f"{URLS_KEY_PREFIX}.{gallery_id}.{generation}"
+
+
+def get_generation_key(gallery_id: str) -> str:
+    return f"{GENERATION_KEY_PREFIX}.{gallery_id}"
+
+
+class _GalleryEntry:
+    def __init__(self, generation: int):
+        self.generation = generation
+        # (expiration time, sorted image filenames)
+        self.images: Optional[Tuple[float, List[str]]] = None
+        # image filename -> (expiration time, presigned URL)
+        self.urls: Dict[str, Tuple[float, str]] = {}
+
+
+class GalleryImageCache:
+    """
+    Cache the sorted image filenames and the presigned image URLs of the galleries in a
+    per-process LRU backed by Redis.
+
+    The image filenames are kept for `images_expires_in` seconds and the presigned URLs,
+    which are generated with `url_expires_in` seconds, are reused until shortly before
+    they expire. `invalidate` should be called when the images of a gallery change.
+
+    Each gallery has a generation in Redis which is increased by `invalidate`. The
+    entries are cached under their generation and are dropped by the readers of every
+    process once the generation changes, and the entries written by the requests
+    which started before the invalidation are never read.
+    """
+
+    def __init__(
+        self,
+        maxsize: Optional[int] = None,
+        images_expires_in: Optional[int] = None,
+        url_expires_in: Optional[int] = None,
+        async_redis: Optional[Redis] = None,
+        is_from_setting_if_none: bool = False,
+    ):
+        self.maxsize = maxsize
+        self.images_expires_in = images_expires_in
+        self.url_expires_in = url_expires_in
+        self.async_redis = async_redis
+
+        if is_from_setting_if_none:
+            if self.maxsize is None:
+                self.maxsize = APP_GALLERY_IMAGE_CACHE_SIZE
+            if self.images_expires_in is None:
+                self.images_expires_in = APP_GALLERY_IMAGE_CACHE_EXPIRES_IN_SECONDS
+            if self.url_expires_in is None:
+                self.url_expires_in = STORAGE_EXPIRES_IN_MINUTES * 60
+            if self.async_redis is None:
+                self.async_redis = _async_redis
+
+        self._galleries: LRUCache[_GalleryEntry] = LRUCache(maxsize=self.maxsize)
+
+    @property
+    def url_margin(self) -> float:
+        return self.url_expires_in * URL_EXPIRATION_MARGIN_RATIO
+
+    @property
+    def generation_expires_in(self) -> int:
+        # The cached entries of the old generations expire before the generation.
+        return max(self.images_expires_in, self.url_expires_in)
+
+    async def _get_generation(self, gallery_id: str) -> int:
+        if self.async_redis is None:
+            return 0
+        value = await self.async_redis.get(get_generation_key(gallery_id))
+        if value is None:
+            return 0
+        return int(value)
+
+    def _get_cached_entry(
+        self, gallery_id: str, generation: int
+    ) -> Optional[_GalleryEntry]:
+        entry = self._galleries.get(gallery_id, None)
+        if entry is not None and entry.generation != generation:
+            self._galleries.pop(gallery_id, None)
+            return None
+        return entry
+
+    def _get_entry(self, gallery_id: str, generation: int) -> _GalleryEntry:
+        entry = self._get_cached_entry(gallery_id, generation)
+        if entry is None:
+            entry = _GalleryEntry(generation)
+            self._galleries.set(gallery_id, entry)
+        return entry
+
+    async def get_image_filenames(self, gallery_id: str) -> Optional[List[str]]:
+        now = time.time()
+        generation = await self._get_generation(gallery_id)
+
+        entry = self._get_cached_entry(gallery_id, generation)
+        if entry is not None and entry.images is not None:
+            expiration, images = entry.images
+            if expiration > now:
+                return images
+            entry.images = None
+
+        if self.async_redis is None:
+            return None
+
+        value = await self.async_redis.get(get_images_key(gallery_id, generation))
+        if value is None:
+            return None
+        expiration, images = json.loads(value)
+        if expiration <= now:
+            return None
+        self._get_entry(gallery_id, generation).images = (expiration, images)
+        return images
+
+    async def set_image_filenames(self, gallery_id: str, images: List[str]):
+        if self.images_expires_in <= 0:
+            return
+        generation = await self._get_generation(gallery_id)
+        expiration = time.time() + self.images_expires_in
+        self._get_entry(gallery_id, generation).images = (expiration, images)
+
+        if self.async_redis is None:
+            return
+        await self.async_redis.set(
+            get_images_key(gallery_id, generation),
+            json.dumps([expiration, images]),
+            ex=self.images_expires_in,
+        )
+
+    async def get_url(self, gallery_id: str, image_name: str) -> Optional[str]:
+        now = time.time()
+        generation = await self._get_generation(gallery_id)
+
+        entry = self._get_cached_entry(gallery_id, generation)
+        if entry is not None:
+            cached = entry.urls.get(image_name, None)
+            if cached is not None:
+                expiration, url = cached
+                if expiration - self.url_margin > now:
+                    return url
+                entry.urls.pop(image_name, None)
+
+        if self.async_redis is None:
+            return None
+
+        value = await self.async_redis.hget(
+            get_urls_key(gallery_id, generation), image_name
+        )
+        if value is None:
+            return None
+        expiration, url = json.loads(value)
+        if expiration - self.url_margin <= now:
+            return None
+        self._get_entry(gallery_id, generation).urls[image_name] = (expiration, url)
+        return url
+
+    async def get_urls(
+        self, gallery_id: str, image_names: List[str]
+    ) -> List[Optional[str]]:
+        """Get the URLs of the images in one request to Redis. The URLs which are not
+        cached are `None`.
+        """
+
+        now = time.time()
+        generation = await self._get_generation(gallery_id)
+
+        urls: List[Optional[str]] = [None] * len(image_names)
+        entry = self._get_cached_entry(gallery_id, generation)
+        if entry is not None:
+            for i, image_name in enumerate(image_names):
+                cached = entry.urls.get(image_name, None)
+                if cached is not None and cached[0] - self.url_margin > now:
+                    urls[i] = cached[1]
+
+        missing = [i for i, url in enumerate(urls) if url is None]
+        if self.async_redis is None or len(missing) == 0:
+            return urls
+
+        values = await self.async_redis.hmget(
+            get_urls_key(gallery_id, generation), [image_names[i] for i in missing]
+        )
+        for i, value in zip(missing, values):
+            if value is None:
+                continue
+            expiration, url = json.loads(value)
+            if expiration - self.url_margin <= now:
+                continue
+            entry = self._get_entry(gallery_id, generation)
+            entry.urls[image_names[i]] = (expiration, url)
+            urls[i] = url
+        return urls
+
+    async def set_url(self, gallery_id: str, image_name: str, url: str):
+        await self.set_urls(gallery_id, {image_name: url})
+
+    async def set_urls(self, gallery_id: str, urls: Dict[str, str]):
+        if len(urls) == 0:
+            return
+
+        generation = await self._get_generation(gallery_id)
+        expiration = time.time() + self.url_expires_in
+        entry = self._get_entry(gallery_id, generation)
+        for image_name, url in urls.items():
+            entry.urls[image_name] = (expiration, url)
+
+        if self.async_redis is None:
+            return
+        key = get_urls_key(gallery_id, generation)
+        await self.async_redis.hset(
+            key,
+            mapping={
+                image_name: json.dumps([expiration, url])
+                for image_name, url in urls.items()
+            },
+        )
+        await self.async_redis.expire(key, self.url_expires_in)
+
+    async def invalidate(self, gallery_id: str):
+        self._galleries.pop(gallery_id, None)
+
+        if self.async_redis is None:
+            return
+        key = get_generation_key(gallery_id)
+        await self.async_redis.incr(key)
+        await self.async_redis.expire(key, self.generation_expires_in)
+
+
+gallery_image_cache = GalleryImageCache(is_from_setting_if_none=True)
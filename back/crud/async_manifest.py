@@ -0,0 +1,83 @@
+from typing import Dict, List, Optional
+
+from redis.asyncio import Redis
+
+from back.model.base import SourceProtocolEnum
+from back.model.storage import StorageGalleryManifestEntry
+from back.session.async_redis import async_redis as _async_redis
+
+MANIFEST_KEY_PREFIX = "zetsubou.sync.manifest"
+
+BATCH_SIZE = 1000
+
+
+def get_manifest_key(protocol: SourceProtocolEnum, storage_id: int) -> str:
+    return f"{MANIFEST_KEY_PREFIX}.{protocol}.{storage_id}"
+
+
+class GalleryManifest:
+    """
+    A per-storage manifest of gallery path to `StorageGalleryManifestEntry` kept in a
+    Redis hash. It is used by the incremental synchronization to skip the galleries
+    whose tag file and images did not change since the last run.
+    """
+
+    def __init__(
+        self,
+        protocol: SourceProtocolEnum,
+        storage_id: int,
+        async_redis: Optional[Redis] = None,
+        batch_size: int = BATCH_SIZE,
+        is_from_setting_if_none: bool = False,
+    ):
+        self.key = get_manifest_key(protocol, storage_id)
+        self.async_redis = async_redis
+        self.batch_size = batch_size
+
+        if is_from_setting_if_none:
+            if self.async_redis is None:
+                self.async_redis = _async_redis
+
+        self.entries: Dict[str, StorageGalleryManifestEntry] = {}
+        self._updates: Dict[str, str] = {}
+
+    @property
+    def is_available(self) -> bool:
+        return self.async_redis is not None
+
+    async def load(self) -> Dict[str, StorageGalleryManifestEntry]:
+        self.entries = {}
+        async for path, entry in self.async_redis.hscan_iter(
+            self.key, count=self.batch_size
+        ):
+            if type(path) is bytes:
+                path = path.decode("utf-8")
+            self.entries[path] = StorageGalleryManifestEntry.model_validate_json(entry)
+        return self.entries
+
+    def set(self, path: str, entry: StorageGalleryManifestEntry):
+        """The entry is written to Redis by `flush` which should be called after the
+        documents are sent to Elasticsearch.
+        """
+        self.entries[path] = entry
+        self._updates[path] = entry.model_dump_json()
+
+    async def delete(self, paths: List[str]):
+        for i in range(0, len(paths), self.batch_size):
+            batch = paths[i : i + self.batch_size]
+            await self.async_redis.hdel(self.key, *batch)
+        for path in paths:
+            self.entries.pop(path, None)
+            self._updates.pop(path, None)
+
+    async def flush(self):
+        updates = list(self._updates.items())
+        self._updates = {}
+        for i in range(0, len(updates), self.batch_size):
+            batch = dict(updates[i : i + self.batch_size])
+            await self.async_redis.hset(self.key, mapping=batch)
+
+    async def clear(self):
+        self.entries = {}
+        self._updates = {}
+        await self.async_redis.delete(self.key)
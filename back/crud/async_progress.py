@@ -1,11 +1,23 @@
+import asyncio
 import logging
+import time
+from typing import Optional
 from uuid import uuid4
 
+from elasticsearch import AsyncElasticsearch
 from redis.asyncio import Redis
 
 from back.logging import logger_zetsubou
 from back.model.task import ZetsuBouTaskProgressEnum
 from back.session.async_redis import async_redis as _async_redis
+from back.settings import setting
+
+APP_PROGRESS_INTERVAL = setting.app_progress_interval
+APP_PROGRESS_MIN_DELTA = setting.app_progress_min_delta
+APP_PROGRESS_EXPIRES_IN_SECONDS = setting.app_progress_expires_in_seconds
+
+# the minimum seconds between the polls of an Elasticsearch task
+MIN_TASK_POLL_INTERVAL = 1.0
 
 
 def get_progress_id(prefix: str = ""):
@@ -20,10 +32,80 @@ def check_airflow_progress(progress_id: str) -> bool:
         return True
     elif progress_id.startswith(ZetsuBouTaskProgressEnum.SYNC_STORAGE):
         return True
+    elif progress_id.startswith(ZetsuBouTaskProgressEnum.DELETE_TAG):
+        return True
     return False
 
 
+def get_elasticsearch_task_progress(status: dict) -> float:
+    """Get the progress of the status of an `update_by_query` or a `delete_by_query`
+    task, which sums up its slices.
+    """
+
+    total = status.get("total", 0)
+    if not total:
+        return 0.0
+    done = sum(
+        status.get(key, 0)
+        for key in ("updated", "created", "deleted", "noops", "version_conflicts")
+    )
+    return min(100.0, 100 * done / total)
+
+
+async def track_elasticsearch_task(
+    async_elasticsearch: AsyncElasticsearch,
+    task_id: str,
+    progress_id: str,
+    async_redis: Redis = None,
+    interval: Optional[float] = None,
+    expires_in: Optional[int] = None,
+    is_from_setting_if_none: bool = False,
+) -> dict:
+    """Poll an Elasticsearch task every `interval` seconds and publish its progress to
+    Redis until it is completed. It returns the last response of the task.
+
+    The interval is at least `MIN_TASK_POLL_INTERVAL`, so the progress interval of 0
+    does not poll Elasticsearch back to back.
+
+    The progress expires `expires_in` seconds after its last update, so the progress of
+    a finished or abandoned task does not stay in Redis.
+    """
+
+    if is_from_setting_if_none:
+        if async_redis is None:
+            async_redis = _async_redis
+        if interval is None:
+            interval = APP_PROGRESS_INTERVAL
+        if expires_in is None:
+            expires_in = APP_PROGRESS_EXPIRES_IN_SECONDS
+    if interval is None:
+        interval = 0.0
+    interval = max(interval, MIN_TASK_POLL_INTERVAL)
+    if not expires_in:
+        expires_in = None
+
+    while True:
+        resp = await async_elasticsearch.tasks.get(task_id=task_id)
+        if resp.get("completed", False):
+            await async_redis.set(progress_id, "100.00", ex=expires_in)
+            return resp
+
+        status = resp.get("task", {}).get("status", {})
+        progress = get_elasticsearch_task_progress(status)
+        await async_redis.set(progress_id, f"{progress:.2f}", ex=expires_in)
+        await asyncio.sleep(interval)
+
+
 class Progress:
+    """
+    Iterate over `iterable` and publish the progress to Redis.
+
+    The progress is published at most once every `interval` seconds and only when it
+    has advanced by at least `min_delta` since the last write. The writes run in the
+    background so that the iteration is not blocked by Redis, and the final progress is
+    always written when the iteration completes.
+    """
+
     def __init__(
         self,
         iterable,
@@ -32,6 +114,8 @@ class Progress:
         final: int = 100,
         total: int = None,
         async_redis: Redis = None,
+        interval: Optional[float] = None,
+        min_delta: Optional[float] = None,
         is_from_setting_if_none: bool = False,
     ):
         if id is None:
@@ -56,17 +140,60 @@ class Progress:
             self._last_progress = int(self._initial)
 
         self.async_redis = async_redis
+        self.interval = interval
+        self.min_delta = min_delta
         self._iterable = iterable
 
         if is_from_setting_if_none:
             if async_redis is None:
                 self.async_redis = _async_redis
+            if self.interval is None:
+                self.interval = APP_PROGRESS_INTERVAL
+            if self.min_delta is None:
+                self.min_delta = APP_PROGRESS_MIN_DELTA
+
+        if self.interval is None:
+            self.interval = 0.0
+        if self.min_delta is None:
+            self.min_delta = 0.0
+
+        self._last_written_progress: Optional[float] = None
+        self._last_written_time = 0.0
+        self._pending_progress: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
 
     async def _set(self, progress: float):
         _progress = f"{progress:.2f}"
         await self.async_redis.set(self.id, _progress)
 
-    async def _update(self):
+    async def _write(self, progress: float):
+        while True:
+            await self._set(progress)
+            if self._pending_progress is None:
+                return
+            progress = self._pending_progress
+            self._pending_progress = None
+
+    def _publish(self, progress: float):
+        self._last_written_progress = progress
+        self._last_written_time = time.monotonic()
+
+        # coalesce with the write in flight
+        if self._task is not None and not self._task.done():
+            self._pending_progress = progress
+            return
+        if self._task is not None:
+            # raise the exception of the last write
+            self._task.result()
+        self._task = asyncio.create_task(self._write(progress))
+
+    async def _flush(self):
+        if self._task is not None:
+            task = self._task
+            self._task = None
+            await task
+
+    def _update(self):
         self._initial += self._step
 
         if logger_zetsubou.level == logging.DEBUG:
@@ -76,16 +203,25 @@ class Progress:
                 if self._current_progress % 10 == 0:
                     logger_zetsubou.debug(f"progress: {self._current_progress} %")
 
-        await self._set(self._initial)
+        if self._last_written_progress is not None:
+            if time.monotonic() - self._last_written_time < self.interval:
+                return
+            if self._initial - self._last_written_progress < self.min_delta:
+                return
+
+        self._publish(self._initial)
 
     async def __aiter__(self):
-        if hasattr(self._iterable, "__aiter__"):
-            async for obj in self._iterable:
-                await self._update()
-                yield obj
-        else:
-            for obj in self._iterable:
-                await self._update()
-                yield obj
+        try:
+            if hasattr(self._iterable, "__aiter__"):
+                async for obj in self._iterable:
+                    self._update()
+                    yield obj
+            else:
+                for obj in self._iterable:
+                    self._update()
+                    yield obj
+        finally:
+            await self._flush()
 
         await self._set(self.final)
@@ -0,0 +1,192 @@
+import asyncio
+import hashlib
+import json
+import random
+import uuid
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from back.crud.async_search_cache import get_generation_key
+from back.logging import logger_zetsubou
+from back.model.elasticsearch import ElasticsearchRandomOrder
+from back.session.async_redis import async_redis as _async_redis
+from back.settings import setting
+
+ELASTIC_RANDOM_EXPIRES_IN_SECONDS = setting.elastic_random_expires_in_seconds
+ELASTIC_RANDOM_MAX_IDS = setting.elastic_random_max_ids
+ELASTIC_RANDOM_SCROLL_SLICES = setting.elastic_random_scroll_slices
+
+RANDOM_KEY_PREFIX = "zetsubou.elasticsearch.random"
+
+UUID_WIDTH = 16
+
+
+def get_random_key(index: str, seed: int, query: dict) -> str:
+    data = json.dumps([seed, query], sort_keys=True, separators=(",", ":"))
+    digest = hashlib.sha1(data.encode("utf-8")).hexdigest()
+    return f"{RANDOM_KEY_PREFIX}.{index}.{digest}"
+
+
+def shuffle_ids(ids: List[str], seed: int):
+    """Shuffle the IDs in place with the Fisher-Yates shuffle of `random.Random`. The
+    IDs are sorted first, so the order only depends on the seed and the set of the IDs.
+    """
+
+    ids.sort()
+    random.Random(seed).shuffle(ids)
+
+
+def _is_uuid(id: str) -> bool:
+    try:
+        return str(uuid.UUID(id)) == id
+    except ValueError:
+        return False
+
+
+def pack_ids(ids: List[str]) -> Tuple[bytes, int, bool]:
+    """Pack the IDs into fixed-width records. A UUID is packed into its 16 bytes and
+    the other IDs are padded with null bytes to the longest ID.
+    """
+
+    if all(_is_uuid(id) for id in ids):
+        return b"".join(uuid.UUID(id).bytes for id in ids), UUID_WIDTH, True
+
+    encoded_ids = [id.encode("utf-8") for id in ids]
+    width = max((len(id) for id in encoded_ids), default=1)
+    return b"".join(id.ljust(width, b"\0") for id in encoded_ids), width, False
+
+
+def unpack_ids(data: bytes, width: int, is_uuid: bool) -> List[str]:
+    records = [data[i : i + width] for i in range(0, len(data), width)]
+    if is_uuid:
+        return [str(uuid.UUID(bytes=record)) for record in records]
+    return [record.rstrip(b"\0").decode("utf-8") for record in records]
+
+
+def _get_generation(value: Optional[bytes]) -> int:
+    if value is None:
+        return 0
+    return int(value)
+
+
+class RandomOrders:
+    """
+    Cache the shuffled IDs of the documents matched by a query in Redis, so that any
+    page of a random browse is read with one `GETRANGE` however deep it is.
+
+    The IDs are packed into one string of fixed-width records. Its metadata is stored
+    with the generation of the index like `SearchResultCache`, so the IDs are shuffled
+    again after the index is written.
+
+    The IDs of a key are collected by one coroutine of the process at a time with
+    `lock`, so the concurrent first requests of a seed do not all scroll the index.
+    """
+
+    def __init__(
+        self,
+        expires_in_seconds: Optional[int] = None,
+        max_ids: Optional[int] = None,
+        scroll_slices: Optional[int] = None,
+        async_redis: Optional[Redis] = None,
+        is_from_setting_if_none: bool = False,
+    ):
+        self.expires_in_seconds = expires_in_seconds
+        self.max_ids = max_ids
+        self.scroll_slices = scroll_slices
+        self.async_redis = async_redis
+
+        if is_from_setting_if_none:
+            if self.expires_in_seconds is None:
+                self.expires_in_seconds = ELASTIC_RANDOM_EXPIRES_IN_SECONDS
+            if self.max_ids is None:
+                self.max_ids = ELASTIC_RANDOM_MAX_IDS
+            if self.scroll_slices is None:
+                self.scroll_slices = ELASTIC_RANDOM_SCROLL_SLICES
+            if self.async_redis is None:
+                self.async_redis = _async_redis
+
+        if self.scroll_slices is None:
+            self.scroll_slices = 1
+
+        # key -> (lock, the number of the coroutines holding or waiting for it)
+        self._locks: Dict[str, Tuple[asyncio.Lock, int]] = {}
+
+    @property
+    def is_available(self) -> bool:
+        return self.async_redis is not None and self.expires_in_seconds > 0
+
+    @asynccontextmanager
+    async def lock(self, key: str) -> AsyncIterator[None]:
+        lock, count = self._locks.get(key, (None, 0))
+        if lock is None:
+            lock = asyncio.Lock()
+        self._locks[key] = (lock, count + 1)
+        try:
+            async with lock:
+                yield
+        finally:
+            lock, count = self._locks[key]
+            if count == 1:
+                del self._locks[key]
+            else:
+                self._locks[key] = (lock, count - 1)
+
+    async def get_generation(self, index: str) -> Optional[int]:
+        try:
+            value = await self.async_redis.get(get_generation_key(index))
+        except RedisError as e:
+            logger_zetsubou.warning(f"Can't get the generation of {index}: {e}")
+            return None
+        return _get_generation(value)
+
+    async def get_page(
+        self, index: str, key: str, offset: int, size: int
+    ) -> Optional[Tuple[List[str], int]]:
+        """Get the IDs of the page and the number of all the IDs. Return `None` if the
+        IDs are not cached or are outdated.
+        """
+
+        try:
+            generation_value, value = await self.async_redis.mget(
+                [get_generation_key(index), f"{key}.meta"]
+            )
+            if value is None:
+                return None
+            order = ElasticsearchRandomOrder.model_validate_json(value)
+            if order.generation != _get_generation(generation_value):
+                return None
+
+            stop = min(offset + size, order.total)
+            if offset >= stop:
+                return [], order.total
+
+            data = await self.async_redis.getrange(
+                f"{key}.ids", offset * order.width, stop * order.width - 1
+            )
+        except RedisError as e:
+            logger_zetsubou.warning(f"Can't get the shuffled IDs: {e}")
+            return None
+
+        # The IDs expired after the metadata was read.
+        if len(data) != (stop - offset) * order.width:
+            return None
+        return unpack_ids(data, order.width, order.is_uuid), order.total
+
+    async def set(self, index: str, key: str, generation: int, ids: List[str]):
+        data, width, is_uuid = pack_ids(ids)
+        order = ElasticsearchRandomOrder(
+            generation=generation, total=len(ids), width=width, is_uuid=is_uuid
+        )
+        try:
+            await self.async_redis.set(f"{key}.ids", data, ex=self.expires_in_seconds)
+            await self.async_redis.set(
+                f"{key}.meta", order.model_dump_json(), ex=self.expires_in_seconds
+            )
+        except RedisError as e:
+            logger_zetsubou.warning(f"Can't cache the shuffled IDs of {index}: {e}")
+
+
+random_orders = RandomOrders(is_from_setting_if_none=True)
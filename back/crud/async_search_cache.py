@@ -0,0 +1,137 @@
+import hashlib
+import json
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from back.logging import logger_zetsubou
+from back.model.elasticsearch import ElasticsearchResultCacheStats
+from back.session.async_redis import async_redis as _async_redis
+from back.settings import setting
+
+ELASTIC_RESULT_CACHE_EXPIRES_IN_SECONDS = (
+    setting.elastic_result_cache_expires_in_seconds
+)
+ELASTIC_RESULT_CACHE_MAX_BYTES = setting.elastic_result_cache_max_bytes
+
+GENERATION_KEY_PREFIX = "zetsubou.elasticsearch.generation"
+RESULT_KEY_PREFIX = "zetsubou.elasticsearch.results"
+
+
+def get_generation_key(index: str) -> str:
+    return f"{GENERATION_KEY_PREFIX}.{index}"
+
+
+def get_result_key(index: str, *args: Any) -> str:
+    """Canonicalize the arguments of a search, e.g. the kind of the search, the page and
+    the DSL, into a stable hash.
+    """
+
+    data = json.dumps(args, sort_keys=True, separators=(",", ":"), default=str)
+    digest = hashlib.sha1(data.encode("utf-8")).hexdigest()
+    return f"{RESULT_KEY_PREFIX}.{index}.{digest}"
+
+
+def _get_generation(value: Optional[bytes]) -> int:
+    if value is None:
+        return 0
+    return int(value)
+
+
+def _has_point_in_time(resp: dict) -> bool:
+    return resp.get("pit_id", None) is not None or "cursor" in resp
+
+
+class SearchResultCache:
+    """
+    Cache the responses of the searches of Elasticsearch in Redis.
+
+    A cached response is stored with the generation of its index and is only used while
+    the generation is unchanged, so `invalidate` should be called whenever the index is
+    written. The generation and the response are read in one request to Redis.
+
+    The responses with a point in time are not cached, because the point in time and
+    the cursor of the next page expire long before the cached response.
+
+    The searches and the writes of the indices do not fail when Redis is unavailable.
+    """
+
+    def __init__(
+        self,
+        expires_in_seconds: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        async_redis: Optional[Redis] = None,
+        is_from_setting_if_none: bool = False,
+    ):
+        self.expires_in_seconds = expires_in_seconds
+        self.max_bytes = max_bytes
+        self.async_redis = async_redis
+
+        if is_from_setting_if_none:
+            if self.expires_in_seconds is None:
+                self.expires_in_seconds = ELASTIC_RESULT_CACHE_EXPIRES_IN_SECONDS
+            if self.max_bytes is None:
+                self.max_bytes = ELASTIC_RESULT_CACHE_MAX_BYTES
+            if self.async_redis is None:
+                self.async_redis = _async_redis
+
+        self.stats = ElasticsearchResultCacheStats()
+
+    @property
+    def is_available(self) -> bool:
+        return self.async_redis is not None and self.expires_in_seconds > 0
+
+    async def get_or_search(
+        self, index: str, key: str, search: Callable[[], Awaitable[dict]]
+    ) -> dict:
+        if not self.is_available:
+            return await search()
+
+        start = time.perf_counter()
+        try:
+            generation_value, value = await self.async_redis.mget(
+                [get_generation_key(index), key]
+            )
+        except RedisError as e:
+            logger_zetsubou.warning(f"Can't get the cached search result: {e}")
+            return await search()
+        generation = _get_generation(generation_value)
+        if value is not None:
+            cached_generation, resp = json.loads(value)
+            if cached_generation == generation:
+                self.stats.hits += 1
+                self.stats.hit_seconds += time.perf_counter() - start
+                return resp
+
+        resp = await search()
+        self.stats.misses += 1
+        self.stats.miss_seconds += time.perf_counter() - start
+        if _has_point_in_time(resp):
+            return resp
+
+        # The response is stored with the generation read before the search, so it is
+        # not used if the index is written during the search.
+        value = json.dumps([generation, resp], separators=(",", ":"))
+        if len(value) <= self.max_bytes:
+            try:
+                await self.async_redis.set(key, value, ex=self.expires_in_seconds)
+            except RedisError as e:
+                logger_zetsubou.warning(f"Can't cache the search result: {e}")
+        else:
+            self.stats.oversized += 1
+        return resp
+
+    async def invalidate(self, index: str):
+        if self.async_redis is None:
+            return
+        try:
+            await self.async_redis.incr(get_generation_key(index))
+        except RedisError as e:
+            logger_zetsubou.warning(
+                f"Can't invalidate the cached search results of {index}: {e}"
+            )
+
+
+search_result_cache = SearchResultCache(is_from_setting_if_none=True)
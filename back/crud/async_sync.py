@@ -11,6 +11,12 @@ from back.model.source import Source
 from back.model.storage import StorageCategoryEnum
 from back.session.storage import get_app_storage_session
 from back.session.storage.async_s3 import AsyncS3Session
+from back.settings import setting
+
+APP_GALLERY_SYNC_CONCURRENCY = setting.app_gallery_sync_concurrency
+
+# The default size of the connection pool of `botocore`.
+MAX_POOL_CONNECTIONS = 10
 
 
 def get_root_source_by_storage_minio(storage_minio: StorageMinio) -> SourceBaseModel:
@@ -38,6 +44,9 @@ async def get_crud_sync(
     is_progress: bool = False,
     new_model: Source = None,
     target_index: str = None,
+    concurrency: int = None,
+    flat_listing: bool = None,
+    incremental: bool = None,
 ) -> CrudAsyncGallerySync:
     if protocol == SourceProtocolEnum.MINIO.value:
         storage_minio = await CrudStorageMinio.get_row_by_id(storage_id)
@@ -48,10 +57,13 @@ async def get_crud_sync(
             )
 
         if storage_minio.category == StorageCategoryEnum.gallery.value:
+            if concurrency is None:
+                concurrency = APP_GALLERY_SYNC_CONCURRENCY
             storage_session = AsyncS3Session(
                 aws_access_key_id=storage_minio.access_key,
                 aws_secret_access_key=storage_minio.secret_key,
                 endpoint_url=storage_minio.endpoint,
+                max_pool_connections=max(concurrency, MAX_POOL_CONNECTIONS),
             )
 
             root_source = get_root_source_by_storage_minio(storage_minio)
@@ -71,6 +83,9 @@ async def get_crud_sync(
                 new_gallery_model=new_model,
                 is_from_setting_if_none=True,
                 target_index=target_index,
+                concurrency=concurrency,
+                flat_listing=flat_listing,
+                incremental=incremental,
             )
 
         elif storage_minio.category == StorageCategoryEnum.video.value:
@@ -1,16 +1,20 @@
-from typing import Any, Dict, List, Optional
+import asyncio
+from typing import Any, Dict, List, Optional, Set
 
 from elasticsearch import AsyncElasticsearch
 from elasticsearch.exceptions import NotFoundError
-from elasticsearch.helpers import async_bulk, async_scan
+from elasticsearch.helpers import async_scan
 from fastapi import HTTPException
-from sqlalchemy import and_, delete, update
+from redis.asyncio import Redis
+from sqlalchemy import and_, delete, insert, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
-from back.crud.async_elasticsearch import CrudAsyncElasticsearchBase
+from back.crud.async_bulk import AsyncBulkIndexer
+from back.crud.async_elasticsearch import CrudAsyncElasticsearchBase, invalidate_index
+from back.crud.async_progress import track_elasticsearch_task
+from back.crud.async_tag_autocomplete import TagAutocomplete, tag_autocomplete
 from back.db.crud import CrudTagAttribute, CrudTagToken
-from back.db.model import TagRepresentative
 from back.db.table import (
     TagAttributeBase,
     TagCategoryBase,
@@ -33,8 +37,10 @@ from back.model.tag import (
     TagToken,
     TagUpdate,
 )
+from back.model.task import ZetsuBouTaskProgressEnum
 from back.session.async_db import DatabaseSession, async_session
 from back.session.async_elasticsearch import get_async_elasticsearch
+from back.session.async_redis import async_redis as _async_redis
 from back.settings import setting
 
 INDEX = setting.elastic_index_tag
@@ -42,6 +48,24 @@ BATCH_SIZE = 300
 SIZE = 100
 ES_SIZE = setting.elastic_size
 ELASTICSEARCH_INDEX_TAG = setting.elastic_index_tag
+UPDATE_BY_QUERY = setting.elastic_tag_update_by_query
+UPDATE_BY_QUERY_SLICES = setting.elastic_update_by_query_slices
+
+# Remove the ID of a deleted tag from a document referring to it.
+DELETE_RELATED_SCRIPT = """
+if (ctx._source.category_ids != null) {
+    ctx._source.category_ids.removeIf(id -> id == params.id);
+}
+if (ctx._source.synonym_ids != null) {
+    ctx._source.synonym_ids.removeIf(id -> id == params.id);
+}
+if (ctx._source.representative_id == params.id) {
+    ctx._source.representative_id = null;
+}
+"""
+
+# The tasks tracking the `update_by_query` tasks, which outlive the requests.
+_tracking_tasks: Set[asyncio.Task] = set()
 
 elasticsearch_tag_analyzer: ElasticsearchKeywordAnalyzers = {
     ElasticsearchAnalyzerEnum.DEFAULT.value: ["attributes.*.default"],
@@ -52,6 +76,71 @@ elasticsearch_tag_analyzer: ElasticsearchKeywordAnalyzers = {
 }
 
 
+def get_delete_tag_progress_id(tag_id: int) -> str:
+    return f"{ZetsuBouTaskProgressEnum.DELETE_TAG}.{tag_id}"
+
+
+def _get_related_query(tag_id: int) -> dict:
+    return {
+        "bool": {
+            "should": [
+                {"term": {"category_ids": {"value": tag_id}}},
+                {"term": {"synonym_ids": {"value": tag_id}}},
+                {"term": {"representative_id": {"value": tag_id}}},
+            ]
+        }
+    }
+
+
+def _get_token_ids(tag_in_ids: TagElasticsearch) -> List[int]:
+    token_ids = [tag_in_ids.id] + tag_in_ids.category_ids + tag_in_ids.synonym_ids
+    if tag_in_ids.representative_id:
+        token_ids.append(tag_in_ids.representative_id)
+    return token_ids
+
+
+def _get_interpretation(
+    tag_in_ids: Optional[TagElasticsearch],
+    token_id_table: Dict[int, str],
+    attribute_id_table: Dict[int, str],
+) -> Optional[Tag]:
+    if tag_in_ids is None:
+        return None
+
+    inconsistent = any(id not in token_id_table for id in _get_token_ids(tag_in_ids))
+    inconsistent = inconsistent or any(
+        id not in attribute_id_table for id in tag_in_ids.attributes.keys()
+    )
+    if inconsistent:
+        logger_zetsubou.warning(
+            f"There is an inconsistency in the tag ID {tag_in_ids.id} in Elasticsearch."
+        )
+        return None
+
+    return Tag(
+        id=tag_in_ids.id,
+        name=token_id_table[tag_in_ids.id],
+        categories=[
+            TagToken(id=id, name=token_id_table[id]) for id in tag_in_ids.category_ids
+        ],
+        synonyms=[
+            TagToken(id=id, name=token_id_table[id]) for id in tag_in_ids.synonym_ids
+        ],
+        representative=(
+            TagToken(
+                id=tag_in_ids.representative_id,
+                name=token_id_table[tag_in_ids.representative_id],
+            )
+            if tag_in_ids.representative_id
+            else None
+        ),
+        attributes=[
+            TagAttributeWithValue(id=id, name=attribute_id_table[id], value=value)
+            for id, value in tag_in_ids.attributes.items()
+        ],
+    )
+
+
 class CrudAsyncElasticsearchTag(CrudAsyncElasticsearchBase[TagElasticsearch]):
 
     def __init__(
@@ -79,151 +168,131 @@ class CrudTag:
         index: str = INDEX,
         size: int = SIZE,
         batch_size: int = BATCH_SIZE,
+        autocomplete: Optional[TagAutocomplete] = tag_autocomplete,
+        async_redis: Redis = _async_redis,
+        update_by_query: bool = UPDATE_BY_QUERY,
+        slices: int = UPDATE_BY_QUERY_SLICES,
     ):
         self.async_elasticsearch = async_elasticsearch
         self.async_database = async_database
         self.index = index
         self.size = size
         self.batch_size = batch_size
+        self.autocomplete = autocomplete
+        self.async_redis = async_redis
+        self.update_by_query = update_by_query
+        self.slices = slices
+
+    async def _check_token_ids(self, session: AsyncSession, token_ids: Set[int]):
+        """Check that all the tokens exist with one query."""
+
+        if not token_ids:
+            return
+        rows = await session.execute(
+            select(TagTokenBase.id).where(TagTokenBase.id.in_(token_ids))
+        )
+        missing_ids = token_ids - set(rows.scalars().all())
+        if missing_ids:
+            raise HTTPException(
+                status_code=404, detail=f"Token id: {min(missing_ids)} not found"
+            )
 
     async def _update_array(
-        self,
-        session: AsyncSession,
-        tag_id: int,
-        ids_to_add: List[int],
-        ids_to_delete: List[int],
-        base,
+        self, session: AsyncSession, tag_id: int, linked_ids: Set[int], base
     ):
-        if ids_to_add:
-            for id in ids_to_add:
-                rows = await session.execute(
-                    select(TagTokenBase).where(TagTokenBase.id == id)
-                )
-                first = rows.scalars().first()
-                if first is None:
-                    raise HTTPException(
-                        status_code=404, detail=f"Token id: {id} not found"
-                    )
+        """Link the tag to exactly `linked_ids` with one query of the existing links,
+        one insert of the missing links and one delete of the stale links.
+        """
 
-                rows = await session.execute(
-                    select(base).where(
-                        and_(base.linked_id == id, base.token_id == tag_id)
-                    )
-                )
-                first = rows.scalars().first()
-                if first is None:
-                    array = base(linked_id=id, token_id=tag_id)
-                    session.add(array)
+        rows = await session.execute(
+            select(base.linked_id).where(base.token_id == tag_id)
+        )
+        existing_ids = set(rows.scalars().all())
 
-        for id in ids_to_delete:
+        ids_to_add = linked_ids - existing_ids
+        if ids_to_add:
             await session.execute(
-                delete(base).where(and_(base.id == id, base.token_id == tag_id))
+                insert(base),
+                [{"linked_id": id, "token_id": tag_id} for id in sorted(ids_to_add)],
+            )
+
+        ids_to_delete = existing_ids - linked_ids
+        if ids_to_delete:
+            await session.execute(
+                delete(base).where(
+                    and_(base.token_id == tag_id, base.linked_id.in_(ids_to_delete))
+                )
             )
 
     async def _update_categories(
-        self,
-        session: AsyncSession,
-        tag_id: int,
-        ids_to_add: List[int],
-        ids_to_delete: List[int],
+        self, session: AsyncSession, tag_id: int, category_ids: Set[int]
     ):
-        await self._update_array(
-            session, tag_id, ids_to_add, ids_to_delete, TagCategoryBase
-        )
+        await self._update_array(session, tag_id, category_ids, TagCategoryBase)
 
     async def _update_synonyms(
-        self,
-        session: AsyncSession,
-        tag_id: int,
-        ids_to_add: List[int],
-        ids_to_delete: List[int],
+        self, session: AsyncSession, tag_id: int, synonym_ids: Set[int]
     ):
-        await self._update_array(
-            session, tag_id, ids_to_add, ids_to_delete, TagSynonymBase
-        )
+        await self._update_array(session, tag_id, synonym_ids, TagSynonymBase)
 
     async def _update_representative(
-        self, session: AsyncSession, token_id: int, representative_id: int
+        self, session: AsyncSession, token_id: int, representative_id: Optional[int]
     ):
-        if representative_id:
-            rows = await session.execute(
-                select(TagTokenBase).where(TagTokenBase.id == representative_id)
-            )
-            first = rows.scalars().first()
-            if first is None:
-                raise HTTPException(
-                    status_code=404, detail=f"Token id: {representative_id} not found"
-                )
-
-            rows = await session.execute(
-                select(TagRepresentativeBase).where(
-                    TagRepresentativeBase.token_id == token_id
-                )
-            )
-            first = rows.scalars().first()
-            if first is None:
-                representative = TagRepresentativeBase(
-                    linked_id=representative_id, token_id=token_id
-                )
-                session.add(representative)
-            else:
-                representative = TagRepresentative(**first.__dict__)
-                representative.linked_id = representative_id
-                rows = await session.execute(
-                    update(TagRepresentativeBase)
-                    .where(TagRepresentativeBase.token_id == token_id)
-                    .values(**representative.model_dump())
-                )
-        else:
+        if not representative_id:
             await session.execute(
                 delete(TagRepresentativeBase).where(
                     TagRepresentativeBase.token_id == token_id
                 )
             )
+            return
 
-    async def _check_attribures(self, session: AsyncSession, tag: TagInsert):
-        if tag.attributes:
-            for attr_id in tag.attributes.keys():
-                rows = await session.execute(
-                    select(TagAttributeBase).where(TagAttributeBase.id == attr_id)
-                )
-                first = rows.scalars().first()
-                if first is None:
-                    raise HTTPException(
-                        status_code=404,
-                        detail=f"Token Attribute id: {attr_id} not found",
-                    )
+        result = await session.execute(
+            update(TagRepresentativeBase)
+            .where(TagRepresentativeBase.token_id == token_id)
+            .values(linked_id=representative_id)
+        )
+        if result.rowcount == 0:
+            session.add(
+                TagRepresentativeBase(linked_id=representative_id, token_id=token_id)
+            )
 
-    async def insert(self, tag: TagInsert) -> TagInserted:
-        tag = TagInsert(**tag.model_dump())
+    async def _check_attribures(self, session: AsyncSession, tag: TagInsert):
+        """Check that all the attributes exist with one query."""
 
-        old_tag = None
-        if tag.id is not None:
-            old_tag = await self.get_row_by_id_by_elasticsearch(tag.id)
+        attribute_ids = set(tag.attributes.keys())
+        if not attribute_ids:
+            return
+        rows = await session.execute(
+            select(TagAttributeBase.id).where(TagAttributeBase.id.in_(attribute_ids))
+        )
+        missing_ids = attribute_ids - set(rows.scalars().all())
+        if missing_ids:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Token Attribute id: {min(missing_ids)} not found",
+            )
 
-        tag_category_ids_set = set(tag.category_ids)
-        tag.category_ids = list(tag_category_ids_set)
+    async def insert(self, tag: TagInsert) -> TagInserted:
+        """Write the tag with a constant number of statements whatever the number of
+        its categories, synonyms and attributes.
+        """
 
-        tag_synonym_ids_set = set(tag.synonym_ids)
-        tag.synonym_ids = list(tag_synonym_ids_set)
+        tag = TagInsert(**tag.model_dump())
 
-        if old_tag is None or not old_tag.category_ids:
-            category_ids_to_add = tag.category_ids
-            category_ids_to_delete = []
+        category_ids = set(tag.category_ids)
+        tag.category_ids = list(category_ids)
 
-            synonyms_ids_to_add = tag.synonym_ids
-            synonyms_ids_to_delete = []
-        else:
-            old_tag_category_ids_set = set(old_tag.category_ids)
-            category_ids_to_add = tag_category_ids_set - old_tag_category_ids_set
-            category_ids_to_delete = old_tag_category_ids_set - tag_category_ids_set
+        synonym_ids = set(tag.synonym_ids)
+        tag.synonym_ids = list(synonym_ids)
 
-            old_tag_synonym_ids_set = set(old_tag.synonym_ids)
-            synonyms_ids_to_add = tag_synonym_ids_set - old_tag_synonym_ids_set
-            synonyms_ids_to_delete = old_tag_synonym_ids_set - tag_synonym_ids_set
+        token_ids = category_ids | synonym_ids
+        if tag.representative_id:
+            token_ids.add(tag.representative_id)
 
         async with self.async_database() as session:
             async with session.begin():
+                await self._check_token_ids(session, token_ids)
+                await self._check_attribures(session, tag)
+
                 if tag.id is None:
                     token = TagTokenBase(name=tag.name)
                     session.add(token)
@@ -237,16 +306,11 @@ class CrudTag:
                         .values(id=tag.id, name=tag.name)
                     )
 
-                await self._update_categories(
-                    session, tag.id, category_ids_to_add, category_ids_to_delete
-                )
-                await self._update_synonyms(
-                    session, tag.id, synonyms_ids_to_add, synonyms_ids_to_delete
-                )
+                await self._update_categories(session, tag.id, category_ids)
+                await self._update_synonyms(session, tag.id, synonym_ids)
                 await self._update_representative(
                     session, tag.id, tag.representative_id
                 )
-                await self._check_attribures(session, tag)
                 await session.commit()
 
         await self.async_elasticsearch.index(
@@ -254,6 +318,9 @@ class CrudTag:
             id=tag.id,
             document=TagElasticsearch(**tag.model_dump()).model_dump(),
         )
+        await invalidate_index(self.index)
+        if self.autocomplete is not None:
+            await self.autocomplete.set_tag(tag)
         return tag
 
     async def create(self, tag: TagCreate) -> TagInserted:
@@ -291,66 +358,59 @@ class CrudTag:
         elastic_tag["name"] = token.name
         return TagInserted(**elastic_tag)
 
-    async def get_interpretation_by_id(self, tag_id: int) -> Optional[Tag]:
-        tag_in_ids = await self.get_row_by_id_by_elasticsearch(tag_id)
-        if tag_in_ids is None:
-            return None
-        token_ids = [tag_in_ids.id] + tag_in_ids.category_ids + tag_in_ids.synonym_ids
-        if tag_in_ids.representative_id:
-            token_ids.append(tag_in_ids.representative_id)
-
-        inconsistent = False
-        token_id_table = {}
-        for id in token_ids:
-            token = await CrudTagToken.get_row_by_id(id)
-            if token is None:
-                inconsistent = True
-                continue
-            token_id_table[token.id] = token.name
+    async def get_rows_by_ids_by_elasticsearch(
+        self, tag_ids: List[int]
+    ) -> Dict[int, TagElasticsearch]:
+        """Get the tags of the ids with one `mget`. The missing tags are skipped."""
 
-        attribute_id_table = {}
-        for attribute_id in tag_in_ids.attributes.keys():
-            attribute = await CrudTagAttribute.get_row_by_id(attribute_id)
-            if attribute is None:
-                inconsistent = True
+        if len(tag_ids) == 0:
+            return {}
+        resp = await self.async_elasticsearch.mget(
+            index=self.index, body={"ids": [str(tag_id) for tag_id in tag_ids]}
+        )
+        tags = {}
+        for doc in resp.get("docs", []):
+            source = doc.get("_source", None)
+            if not doc.get("found", False) or source is None:
                 continue
-            attribute_id_table[attribute.id] = attribute.name
+            tag = TagElasticsearch(**source)
+            tags[tag.id] = tag
+        return tags
 
-        if inconsistent:
-            logger_zetsubou.warning(
-                f"There is an inconsistency in the tag ID {tag_id} in Elasticsearch."
-            )
-            return None
+    async def get_interpretations_by_ids(
+        self, tag_ids: List[int]
+    ) -> List[Optional[Tag]]:
+        """Interpret the tags with one `mget` of Elasticsearch, one query of the tokens
+        and one query of the attributes, whatever the number of the tags. The
+        interpretation of a tag is `None` if it is not found or inconsistent.
+        """
 
-        return Tag(
-            id=tag_in_ids.id,
-            name=token_id_table[tag_in_ids.id],
-            categories=[
-                TagToken(id=id, name=token_id_table[id])
-                for id in tag_in_ids.category_ids
-                if token_id_table.get(id, None) is not None
-            ],
-            synonyms=[
-                TagToken(id=id, name=token_id_table[id])
-                for id in tag_in_ids.synonym_ids
-                if token_id_table.get(id, None) is not None
-            ],
-            representative=(
-                TagToken(
-                    id=tag_in_ids.representative_id,
-                    name=token_id_table[tag_in_ids.representative_id],
-                )
-                if tag_in_ids.representative_id
-                and token_id_table.get(tag_in_ids.representative_id, None) is not None
-                else None
-            ),
-            attributes=[
-                TagAttributeWithValue(id=id, name=attribute_id_table[id], value=value)
-                for id, value in tag_in_ids.attributes.items()
-                if attribute_id_table.get(id, None) is not None
-            ],
+        tags_in_ids = await self.get_rows_by_ids_by_elasticsearch(
+            list(dict.fromkeys(tag_ids))
         )
 
+        token_ids = set()
+        attribute_ids = set()
+        for tag_in_ids in tags_in_ids.values():
+            token_ids.update(_get_token_ids(tag_in_ids))
+            attribute_ids.update(tag_in_ids.attributes.keys())
+
+        tokens = await CrudTagToken.get_rows_by_ids(sorted(token_ids))
+        token_id_table = {token.id: token.name for token in tokens}
+        attributes = await CrudTagAttribute.get_rows_by_ids(sorted(attribute_ids))
+        attribute_id_table = {attribute.id: attribute.name for attribute in attributes}
+
+        return [
+            _get_interpretation(
+                tags_in_ids.get(tag_id, None), token_id_table, attribute_id_table
+            )
+            for tag_id in tag_ids
+        ]
+
+    async def get_interpretation_by_id(self, tag_id: int) -> Optional[Tag]:
+        tags = await self.get_interpretations_by_ids([tag_id])
+        return tags[0]
+
     async def get_interpretations_by_name(
         self,
         name: str,
@@ -361,9 +421,11 @@ class CrudTag:
         tokens = await CrudTagToken.get_rows_by_name_order_by_id(
             name, skip=skip, limit=limit, is_desc=is_desc
         )
+        interpretations = await self.get_interpretations_by_ids(
+            [token.id for token in tokens]
+        )
         tags = []
-        for token in tokens:
-            tag = await self.get_interpretation_by_id(token.id)
+        for token, tag in zip(tokens, interpretations):
             if tag is None:
                 tag = Tag(id=token.id, name=token.name)
 
@@ -374,47 +436,83 @@ class CrudTag:
         return await self.insert(tag)
 
     async def delete_related_elasticsearch_docs(self, tag_id: int):
-        query = {
-            "query": {
-                "bool": {
-                    "should": [
-                        {"term": {"category_ids": {"value": tag_id}}},
-                        {"term": {"synonym_ids": {"value": tag_id}}},
-                        {"term": {"representative_id": {"value": tag_id}}},
-                    ]
-                }
-            }
-        }
-        batches = []
+        query = {"query": _get_related_query(tag_id)}
+        async with AsyncBulkIndexer(
+            self.async_elasticsearch,
+            max_actions=self.batch_size,
+            is_from_setting_if_none=True,
+        ) as bulk_indexer:
+            async for doc in async_scan(
+                client=self.async_elasticsearch, query=query, index=self.index
+            ):
+                source = doc.get("_source", None)
+                if source is None:
+                    continue
+                tag = TagElasticsearch(**source)
+                try:
+                    tag.category_ids.remove(tag_id)
+                except ValueError:
+                    pass
+                try:
+                    tag.synonym_ids.remove(tag_id)
+                except ValueError:
+                    pass
+                if tag.representative_id == tag_id:
+                    tag.representative_id = None
+                await bulk_indexer.add(
+                    {
+                        "_index": self.index,
+                        "_id": tag.id,
+                        "_source": tag.model_dump(),
+                    }
+                )
 
-        async for doc in async_scan(
-            client=self.async_elasticsearch, query=query, index=self.index
-        ):
-            source = doc.get("_source", None)
-            if source is None:
-                continue
-            tag = TagElasticsearch(**source)
-            try:
-                tag.category_ids.remove(tag_id)
-            except ValueError:
-                pass
-            try:
-                tag.synonym_ids.remove(tag_id)
-            except ValueError:
-                pass
-            if tag.representative_id == tag_id:
-                tag.representative_id = None
-            action = {
-                "_index": self.index,
-                "_id": tag.id,
-                "_source": tag.model_dump(),
-            }
-            batches.append(action)
-            if len(batches) > self.batch_size:
-                await async_bulk(self.async_elasticsearch, batches)
-                batches = []
-        if len(batches) > 0:
-            await async_bulk(self.async_elasticsearch, batches)
+    async def delete_related_elasticsearch_docs_by_query(self, tag_id: int) -> str:
+        """Start an `update_by_query` task which removes the ID from the documents
+        referring to it on Elasticsearch, so they are not sent through the application.
+        It returns the ID of the task.
+        """
+
+        resp = await self.async_elasticsearch.update_by_query(
+            index=self.index,
+            body={
+                "query": _get_related_query(tag_id),
+                "script": {
+                    "source": DELETE_RELATED_SCRIPT,
+                    "lang": "painless",
+                    "params": {"id": tag_id},
+                },
+            },
+            conflicts="proceed",
+            refresh=True,
+            slices=self.slices if self.slices > 0 else "auto",
+            wait_for_completion=False,
+        )
+        return resp["task"]
+
+    async def track_related_elasticsearch_docs(self, task_id: str, tag_id: int):
+        """Publish the progress of the `update_by_query` task to
+        `get_delete_tag_progress_id(tag_id)` until it is completed.
+        """
+
+        try:
+            resp = await track_elasticsearch_task(
+                self.async_elasticsearch,
+                task_id,
+                get_delete_tag_progress_id(tag_id),
+                async_redis=self.async_redis,
+                is_from_setting_if_none=True,
+            )
+            failures = resp.get("response", {}).get("failures", [])
+            if "error" in resp or failures:
+                logger_zetsubou.error(
+                    f"Failed to remove the tag {tag_id} from the related tags: "
+                    f"{resp.get('error', failures)}"
+                )
+        except Exception as e:
+            logger_zetsubou.exception(e)
+        finally:
+            await invalidate_index(self.index)
 
     async def delete_by_id(self, tag_id: int) -> bool:
         async with self.async_database() as session:
@@ -422,9 +520,20 @@ class CrudTag:
                 await session.execute(
                     delete(TagTokenBase).where(TagTokenBase.id == tag_id)
                 )
-        await self.delete_related_elasticsearch_docs(tag_id)
+        if self.update_by_query:
+            task_id = await self.delete_related_elasticsearch_docs_by_query(tag_id)
+            task = asyncio.create_task(
+                self.track_related_elasticsearch_docs(task_id, tag_id)
+            )
+            _tracking_tasks.add(task)
+            task.add_done_callback(_tracking_tasks.discard)
+        else:
+            await self.delete_related_elasticsearch_docs(tag_id)
         try:
             await self.async_elasticsearch.delete(index=self.index, id=tag_id)
         except NotFoundError:
             pass
+        await invalidate_index(self.index)
+        if self.autocomplete is not None:
+            await self.autocomplete.delete(tag_id)
         return True
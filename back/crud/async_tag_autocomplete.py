@@ -0,0 +1,419 @@
+import asyncio
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Set
+from uuid import uuid4
+
+from elasticsearch import AsyncElasticsearch
+from elasticsearch.exceptions import TransportError
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.future import select
+
+from back.db.table import (
+    TagCategoryBase,
+    TagRepresentativeBase,
+    TagSynonymBase,
+    TagTokenBase,
+)
+from back.logging import logger_zetsubou
+from back.model.tag import (
+    TagAutocompleteEvent,
+    TagAutocompleteEventEnum,
+    TagAutocompletion,
+    TagInserted,
+    TagToken,
+)
+from back.session.async_db import DatabaseSession, async_session
+from back.session.async_elasticsearch import (
+    elasticsearch_mapping_registry,
+    get_shared_async_elasticsearch,
+)
+from back.session.async_redis import async_redis as _async_redis
+from back.settings import setting
+from back.utils.prefix_index import PrefixIndex
+
+APP_TAG_AUTOCOMPLETE_EXPIRES_IN_SECONDS = (
+    setting.app_tag_autocomplete_expires_in_seconds
+)
+APP_TAG_AUTOCOMPLETE_CACHE_SIZE = setting.app_tag_autocomplete_cache_size
+ELASTICSEARCH_INDICES = [setting.elastic_index_gallery, setting.elastic_index_video]
+
+CHANNEL = "zetsubou.tag.autocomplete"
+COUNT_SIZE = 10000
+RETRY_SECONDS = 5
+
+
+def _add_link(links: Dict[int, Set[int]], id: int, linked_id: int):
+    links.setdefault(id, set()).add(linked_id)
+
+
+def _discard_link(links: Dict[int, Set[int]], id: int, linked_id: int):
+    linked_ids = links.get(id, None)
+    if linked_ids is None:
+        return
+    linked_ids.discard(linked_id)
+    if not linked_ids:
+        del links[id]
+
+
+class TagAutocomplete:
+    """
+    Autocomplete the tag tokens from the memory of the process.
+
+    The names of all the tokens are kept in a `PrefixIndex` ranked by how many
+    galleries and videos use them, with their categories, synonyms and representatives.
+    It is loaded from the database on the first autocompletion and rebuilt in the
+    background after `expires_in_seconds` to refresh the usage counts.
+
+    The changes of the tags are applied to the index of the process which makes them and
+    published to a channel of Redis, so the other processes apply them without
+    rebuilding their indices.
+    """
+
+    def __init__(
+        self,
+        async_database: DatabaseSession = async_session,
+        async_elasticsearch: Optional[AsyncElasticsearch] = None,
+        async_redis: Optional[Redis] = None,
+        indices: Optional[List[str]] = None,
+        expires_in_seconds: Optional[int] = None,
+        cache_size: Optional[int] = None,
+        channel: str = CHANNEL,
+        is_from_setting_if_none: bool = False,
+    ):
+        self.async_database = async_database
+        self.async_elasticsearch = async_elasticsearch
+        self.async_redis = async_redis
+        self.indices = indices
+        self.expires_in_seconds = expires_in_seconds
+        self.cache_size = cache_size
+        self.channel = channel
+
+        if is_from_setting_if_none:
+            if self.async_redis is None:
+                self.async_redis = _async_redis
+            if self.indices is None:
+                self.indices = ELASTICSEARCH_INDICES
+            if self.expires_in_seconds is None:
+                self.expires_in_seconds = APP_TAG_AUTOCOMPLETE_EXPIRES_IN_SECONDS
+            if self.cache_size is None:
+                self.cache_size = APP_TAG_AUTOCOMPLETE_CACHE_SIZE
+
+        if self.indices is None:
+            self.indices = []
+        if self.expires_in_seconds is None:
+            self.expires_in_seconds = 0
+        if self.cache_size is None:
+            self.cache_size = 0
+
+        # The events published by this instance are ignored by its subscriber.
+        self.source = str(uuid4())
+
+        self.index = PrefixIndex(cache_size=self.cache_size)
+        self.names: Dict[int, str] = {}
+        self.counts: Dict[str, int] = {}
+        self.categories: Dict[int, Set[int]] = {}
+        self.members: Dict[int, Set[int]] = {}
+        self.synonyms: Dict[int, Set[int]] = {}
+        self.representatives: Dict[int, int] = {}
+
+        self._loaded_at: Optional[float] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._reloading: Optional[asyncio.Task] = None
+        self._listening: Optional[asyncio.Task] = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    @property
+    def is_expired(self) -> bool:
+        if self._loaded_at is None:
+            return True
+        if self.expires_in_seconds <= 0:
+            return False
+        return time.monotonic() - self._loaded_at > self.expires_in_seconds
+
+    def _get_score(self, name: str) -> int:
+        return self.counts.get(name.lower(), 0)
+
+    async def _get_counts(self) -> Dict[str, int]:
+        """Count the usages of the names in the labels and the tags of the indices with
+        one `terms` aggregation per field.
+        """
+
+        async_elasticsearch = self.async_elasticsearch
+        if async_elasticsearch is None:
+            async_elasticsearch = get_shared_async_elasticsearch()
+
+        counts = defaultdict(int)
+        for index in self.indices:
+            try:
+                field_names = await elasticsearch_mapping_registry.get_field_names(
+                    async_elasticsearch, index
+                )
+                for field_name in sorted(field_names):
+                    if field_name != "labels" and not field_name.startswith("tags."):
+                        continue
+                    resp = await async_elasticsearch.search(
+                        index=index,
+                        size=0,
+                        aggs={
+                            "counts": {
+                                "terms": {
+                                    "field": f"{field_name}.keyword",
+                                    "size": COUNT_SIZE,
+                                }
+                            }
+                        },
+                    )
+                    for bucket in resp["aggregations"]["counts"]["buckets"]:
+                        counts[bucket["key"].lower()] += bucket["doc_count"]
+            except TransportError as e:
+                logger_zetsubou.warning(f"Can't count the tags in {index}: {e}")
+        return dict(counts)
+
+    async def load(self):
+        async with self.async_database() as session:
+            async with session.begin():
+                tokens = (
+                    await session.execute(select(TagTokenBase.id, TagTokenBase.name))
+                ).all()
+                categories = (
+                    await session.execute(
+                        select(TagCategoryBase.token_id, TagCategoryBase.linked_id)
+                    )
+                ).all()
+                synonyms = (
+                    await session.execute(
+                        select(TagSynonymBase.token_id, TagSynonymBase.linked_id)
+                    )
+                ).all()
+                representatives = (
+                    await session.execute(
+                        select(
+                            TagRepresentativeBase.token_id,
+                            TagRepresentativeBase.linked_id,
+                        )
+                    )
+                ).all()
+        counts = await self._get_counts()
+
+        self.names = {id: name for id, name in tokens}
+        self.counts = counts
+        self.categories = {}
+        self.members = {}
+        for token_id, category_id in categories:
+            _add_link(self.categories, token_id, category_id)
+            _add_link(self.members, category_id, token_id)
+        self.synonyms = {}
+        for token_id, synonym_id in synonyms:
+            _add_link(self.synonyms, token_id, synonym_id)
+        self.representatives = {
+            token_id: representative_id
+            for token_id, representative_id in representatives
+        }
+        self.index.build(
+            {id: name.lower() for id, name in self.names.items()},
+            {id: self._get_score(name) for id, name in self.names.items()},
+        )
+        self._loaded_at = time.monotonic()
+
+    async def _reload(self):
+        try:
+            await self.load()
+        except (SQLAlchemyError, OSError) as e:
+            logger_zetsubou.warning(f"Can't rebuild the autocomplete of the tags: {e}")
+
+    async def ensure_loaded(self):
+        """Load the index for the first autocompletion, and rebuild it in the background
+        after it expires, so the autocompletions do not wait for the rebuilding.
+        """
+
+        if not self.is_loaded:
+            if self._lock is None:
+                self._lock = asyncio.Lock()
+            async with self._lock:
+                if not self.is_loaded:
+                    await self.load()
+        elif self.is_expired and (self._reloading is None or self._reloading.done()):
+            self._reloading = asyncio.create_task(self._reload())
+
+    async def autocomplete(
+        self, prefix: str, size: int = 10, category_id: Optional[int] = None
+    ) -> List[TagAutocompletion]:
+        await self.ensure_loaded()
+
+        allowed_ids = None
+        if category_id is not None:
+            allowed_ids = self.members.get(category_id, set())
+        ids = self.index.search(prefix.lower(), size, allowed_ids)
+        return [self._get_autocompletion(id) for id in ids]
+
+    def _get_token(self, id: int) -> Optional[TagToken]:
+        name = self.names.get(id, None)
+        if name is None:
+            return None
+        return TagToken(id=id, name=name)
+
+    def _get_autocompletion(self, id: int) -> TagAutocompletion:
+        name = self.names[id]
+        representative_id = self.representatives.get(id, None)
+        return TagAutocompletion(
+            id=id,
+            name=name,
+            count=self._get_score(name),
+            representative=(
+                None
+                if representative_id is None
+                else self._get_token(representative_id)
+            ),
+            synonyms=[
+                token
+                for token in map(self._get_token, sorted(self.synonyms.get(id, [])))
+                if token is not None
+            ],
+        )
+
+    def _set(self, event: TagAutocompleteEvent):
+        self.names[event.id] = event.name
+        self.index.set(event.id, event.name.lower(), self._get_score(event.name))
+        if not event.has_relations:
+            return
+
+        for category_id in self.categories.pop(event.id, set()):
+            _discard_link(self.members, category_id, event.id)
+        for category_id in event.category_ids:
+            _add_link(self.categories, event.id, category_id)
+            _add_link(self.members, category_id, event.id)
+
+        self.synonyms.pop(event.id, None)
+        for synonym_id in event.synonym_ids:
+            _add_link(self.synonyms, event.id, synonym_id)
+
+        if event.representative_id:
+            self.representatives[event.id] = event.representative_id
+        else:
+            self.representatives.pop(event.id, None)
+
+    def _delete(self, id: int):
+        self.names.pop(id, None)
+        self.index.delete(id)
+
+        for category_id in self.categories.pop(id, set()):
+            _discard_link(self.members, category_id, id)
+        for token_id in self.members.pop(id, set()):
+            _discard_link(self.categories, token_id, id)
+
+        self.synonyms.pop(id, None)
+        for token_id in list(self.synonyms):
+            _discard_link(self.synonyms, token_id, id)
+
+        self.representatives.pop(id, None)
+        for token_id, representative_id in list(self.representatives.items()):
+            if representative_id == id:
+                del self.representatives[token_id]
+
+    def apply(self, event: TagAutocompleteEvent):
+        if event.event == TagAutocompleteEventEnum.RELOAD:
+            # Rebuilt on the next autocompletion.
+            self._loaded_at = None
+            return
+
+        # The index is up to date when it is loaded.
+        if not self.is_loaded:
+            return
+
+        if event.event == TagAutocompleteEventEnum.SET:
+            self._set(event)
+        elif event.event == TagAutocompleteEventEnum.DELETE:
+            self._delete(event.id)
+
+    async def _publish(self, event: TagAutocompleteEvent):
+        self.apply(event)
+        if self.async_redis is None:
+            return
+        try:
+            await self.async_redis.publish(self.channel, event.model_dump_json())
+        except RedisError as e:
+            logger_zetsubou.warning(f"Can't publish the change of the tags: {e}")
+
+    async def set_token(self, token: TagToken):
+        await self._publish(
+            TagAutocompleteEvent(
+                source=self.source,
+                event=TagAutocompleteEventEnum.SET,
+                id=token.id,
+                name=token.name,
+            )
+        )
+
+    async def set_tag(self, tag: TagInserted):
+        await self._publish(
+            TagAutocompleteEvent(
+                source=self.source,
+                event=TagAutocompleteEventEnum.SET,
+                id=tag.id,
+                name=tag.name,
+                has_relations=True,
+                category_ids=tag.category_ids,
+                synonym_ids=tag.synonym_ids,
+                representative_id=tag.representative_id,
+            )
+        )
+
+    async def delete(self, id: int):
+        await self._publish(
+            TagAutocompleteEvent(
+                source=self.source, event=TagAutocompleteEventEnum.DELETE, id=id
+            )
+        )
+
+    async def reload(self):
+        await self._publish(
+            TagAutocompleteEvent(
+                source=self.source, event=TagAutocompleteEventEnum.RELOAD
+            )
+        )
+
+    def on_message(self, data: bytes):
+        event = TagAutocompleteEvent.model_validate_json(data)
+        if event.source == self.source:
+            return
+        self.apply(event)
+
+    async def listen(self):
+        while True:
+            pubsub = self.async_redis.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                # The changes may be missed while unsubscribed.
+                self._loaded_at = None
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self.on_message(message["data"])
+            except RedisError as e:
+                logger_zetsubou.warning(f"Can't subscribe to the change of tags: {e}")
+            finally:
+                await pubsub.reset()
+            await asyncio.sleep(RETRY_SECONDS)
+
+    async def start(self):
+        if self.async_redis is None or self._listening is not None:
+            return
+        self._listening = asyncio.create_task(self.listen())
+
+    async def close(self):
+        if self._listening is None:
+            return
+        self._listening.cancel()
+        try:
+            await self._listening
+        except asyncio.CancelledError:
+            pass
+        self._listening = None
+
+
+tag_autocomplete = TagAutocomplete(is_from_setting_if_none=True)
@@ -0,0 +1,287 @@
+import json
+import time
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from elasticsearch import AsyncElasticsearch
+from sqlalchemy import delete, insert
+from sqlalchemy.future import select
+from tqdm import tqdm
+
+from back.crud.async_bulk import AsyncBulkIndexer
+from back.crud.async_tag_autocomplete import TagAutocomplete, tag_autocomplete
+from back.db.table import (
+    TagAttributeBase,
+    TagCategoryBase,
+    TagRepresentativeBase,
+    TagSynonymBase,
+    TagTokenBase,
+)
+from back.logging import logger_zetsubou
+from back.model.tag import (
+    Tag,
+    TagElasticsearch,
+    TagImportCheckpoint,
+    TagImportStatistic,
+)
+from back.session.async_db import DatabaseSession, async_session
+from back.session.async_elasticsearch import get_shared_async_elasticsearch
+from back.settings import setting
+
+INDEX = setting.elastic_index_tag
+BATCH_SIZE = 1000
+
+
+def get_relation_rows(
+    tags: List[Tag], token_table: Dict[int, int]
+) -> Dict[type, List[dict]]:
+    """Get the rows of the relation tables of the tags with the inserted IDs."""
+
+    rows = {TagCategoryBase: [], TagSynonymBase: [], TagRepresentativeBase: []}
+    for tag in tags:
+        token_id = token_table[tag.id]
+        for base, linked_tokens in (
+            (TagCategoryBase, tag.categories),
+            (TagSynonymBase, tag.synonyms),
+        ):
+            linked_ids = {token_table[token.id] for token in linked_tokens}
+            rows[base].extend(
+                {"linked_id": linked_id, "token_id": token_id}
+                for linked_id in sorted(linked_ids)
+            )
+        if tag.representative is not None:
+            rows[TagRepresentativeBase].append(
+                {
+                    "linked_id": token_table[tag.representative.id],
+                    "token_id": token_id,
+                }
+            )
+    return rows
+
+
+def get_document(
+    tag: Tag, token_table: Dict[int, int], attribute_table: Dict[str, int]
+) -> TagElasticsearch:
+    """Get the document of the tag with the inserted IDs."""
+
+    return TagElasticsearch(
+        id=token_table[tag.id],
+        name=tag.name,
+        category_ids=sorted({token_table[token.id] for token in tag.categories}),
+        synonym_ids=sorted({token_table[token.id] for token in tag.synonyms}),
+        representative_id=(
+            token_table[tag.representative.id] if tag.representative else None
+        ),
+        attributes={
+            attribute_table[attribute.name.lower()]: attribute.value
+            for attribute in tag.attributes
+        },
+    )
+
+
+class TagImporter:
+    """
+    Import the tags dumped by `tag dump` in bulk.
+
+    The attributes and the tokens are inserted with multi-row inserts of `batch_size`
+    rows per transaction and their IDs are mapped in memory, then the relations are
+    written with `executemany` and the documents are indexed through
+    `AsyncBulkIndexer`.
+
+    The progress is saved to `checkpoint` after each committed batch, so a failed import
+    resumes from the first unfinished batch. The tokens committed by a batch whose
+    progress was not saved are found by their names instead of being inserted again,
+    the relations of a batch are replaced, and the documents are indexed by their IDs,
+    so writing a batch twice is harmless. The documents are saved to `checkpoint` once
+    all of them are indexed, so the bulk requests are not serialized by the batches.
+    """
+
+    def __init__(
+        self,
+        async_database: DatabaseSession = async_session,
+        async_elasticsearch: Optional[AsyncElasticsearch] = None,
+        index: str = INDEX,
+        batch_size: int = BATCH_SIZE,
+        checkpoint: Optional[Path] = None,
+        autocomplete: Optional[TagAutocomplete] = tag_autocomplete,
+    ):
+        self.async_database = async_database
+        self.async_elasticsearch = async_elasticsearch
+        self.index = index
+        self.batch_size = batch_size
+        self.checkpoint = checkpoint
+        self.autocomplete = autocomplete
+
+        if self.async_elasticsearch is None:
+            self.async_elasticsearch = get_shared_async_elasticsearch()
+
+        self.progress = self.load_checkpoint()
+        self.statistics: List[TagImportStatistic] = []
+
+    def load_checkpoint(self) -> TagImportCheckpoint:
+        if self.checkpoint is None or not self.checkpoint.exists():
+            return TagImportCheckpoint()
+        with self.checkpoint.open(mode="r", encoding="utf-8") as fp:
+            return TagImportCheckpoint(**json.load(fp))
+
+    def save_checkpoint(self):
+        if self.checkpoint is None:
+            return
+        # Replace the checkpoint at once, so a failure while writing keeps the old one.
+        tmp = self.checkpoint.with_name(f"{self.checkpoint.name}.tmp")
+        with tmp.open(mode="w", encoding="utf-8") as fp:
+            fp.write(self.progress.model_dump_json())
+        tmp.replace(self.checkpoint)
+
+    def _batches(self, rows: list, start: int = 0):
+        for i in tqdm(range(start, len(rows), self.batch_size)):
+            yield i, rows[i : i + self.batch_size]
+
+    async def run(self, attributes: List[dict], tags: List[dict]):
+        tags = [Tag(**tag) for tag in tags]
+        names = [attribute["name"] for attribute in attributes]
+        for tag in tags:
+            names.extend(attribute.name for attribute in tag.attributes)
+
+        await self._measure("attributes", self.insert_attributes(names))
+        await self._measure("tokens", self.insert_tokens(tags))
+        await self._measure("relations", self.insert_relations(tags))
+        await self._measure("documents", self.index_documents(tags))
+
+        if self.autocomplete is not None:
+            await self.autocomplete.reload()
+
+    async def _measure(self, phase: str, coroutine):
+        start = time.time()
+        count = await coroutine
+        self.statistics.append(
+            TagImportStatistic(phase=phase, count=count, seconds=time.time() - start)
+        )
+
+    async def insert_attributes(self, names: List[str]) -> int:
+        """Insert the attributes which do not exist. The names are unique, so the
+        existing attributes are selected again instead of being saved.
+        """
+
+        logger_zetsubou.info("insert tag attributes ...")
+        names = sorted({name.lower() for name in names})
+        count = 0
+        for _, batch in self._batches(names):
+            async with self.async_database() as session:
+                async with session.begin():
+                    rows = await session.execute(
+                        select(TagAttributeBase.name, TagAttributeBase.id).where(
+                            TagAttributeBase.name.in_(batch)
+                        )
+                    )
+                    attribute_table = dict(rows.all())
+                    missing_names = [
+                        name for name in batch if name not in attribute_table
+                    ]
+                    if missing_names:
+                        rows = await session.execute(
+                            insert(TagAttributeBase).returning(
+                                TagAttributeBase.name, TagAttributeBase.id
+                            ),
+                            [{"name": name} for name in missing_names],
+                        )
+                        attribute_table.update(rows.all())
+                        count += len(missing_names)
+            self.progress.attributes.update(attribute_table)
+        self.save_checkpoint()
+        return count
+
+    async def insert_tokens(self, tags: List[Tag]) -> int:
+        """Insert the tokens which are not in the checkpoint. The tokens which exist
+        but are not in the checkpoint, e.g. the ones committed right before a failure,
+        are mapped by their names instead.
+        """
+
+        logger_zetsubou.info("insert tag tokens ...")
+        tags = [tag for tag in tags if tag.id not in self.progress.tokens]
+        mapped_ids = set(self.progress.tokens.values())
+        count = 0
+        for _, batch in self._batches(tags):
+            token_table = {}
+            async with self.async_database() as session:
+                async with session.begin():
+                    rows = await session.execute(
+                        select(TagTokenBase.name, TagTokenBase.id)
+                        .where(TagTokenBase.name.in_({tag.name for tag in batch}))
+                        .order_by(TagTokenBase.id)
+                    )
+                    existing_ids = {}
+                    for name, id in rows.all():
+                        if id not in mapped_ids:
+                            existing_ids.setdefault(name, deque()).append(id)
+
+                    missing_tags = []
+                    for tag in batch:
+                        ids = existing_ids.get(tag.name, None)
+                        if ids:
+                            token_table[tag.id] = ids.popleft()
+                        else:
+                            missing_tags.append(tag)
+                    if missing_tags:
+                        rows = await session.execute(
+                            insert(TagTokenBase).returning(
+                                TagTokenBase.id, sort_by_parameter_order=True
+                            ),
+                            [{"name": tag.name} for tag in missing_tags],
+                        )
+                        token_table.update(
+                            (tag.id, id)
+                            for tag, id in zip(missing_tags, rows.scalars().all())
+                        )
+                        count += len(missing_tags)
+            mapped_ids.update(token_table.values())
+            self.progress.tokens.update(token_table)
+            self.save_checkpoint()
+        return count
+
+    async def insert_relations(self, tags: List[Tag]) -> int:
+        logger_zetsubou.info("insert tag relations ...")
+        start = self.progress.relations
+        for i, batch in self._batches(tags, start):
+            token_ids = [self.progress.tokens[tag.id] for tag in batch]
+            relation_rows = get_relation_rows(batch, self.progress.tokens)
+            async with self.async_database() as session:
+                async with session.begin():
+                    for base, rows in relation_rows.items():
+                        await session.execute(
+                            delete(base).where(base.token_id.in_(token_ids))
+                        )
+                        if rows:
+                            await session.execute(insert(base), rows)
+            self.progress.relations = i + len(batch)
+            self.save_checkpoint()
+        return len(tags) - start
+
+    async def index_documents(self, tags: List[Tag]) -> int:
+        logger_zetsubou.info("index tags ...")
+        start = self.progress.documents
+        async with AsyncBulkIndexer(
+            self.async_elasticsearch,
+            refresh_indices=[self.index],
+            is_from_setting_if_none=True,
+        ) as bulk_indexer:
+            for _, batch in self._batches(tags, start):
+                await bulk_indexer.add_many(
+                    {
+                        "_index": self.index,
+                        "_id": document.id,
+                        "_source": document.model_dump(),
+                    }
+                    for document in (
+                        get_document(
+                            tag, self.progress.tokens, self.progress.attributes
+                        )
+                        for tag in batch
+                    )
+                )
+            await bulk_indexer.join()
+            if bulk_indexer.result.failed == 0:
+                self.progress.documents = len(tags)
+                self.save_checkpoint()
+        return self.progress.documents - start
@@ -1,14 +1,15 @@
 import io
 from pathlib import Path
-from typing import Any, Callable, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Set
 from uuid import uuid4
 
 import cv2
 from elasticsearch import AsyncElasticsearch
-from elasticsearch.helpers import async_bulk, async_scan
+from elasticsearch.helpers import async_scan
 from fastapi import HTTPException
 
-from back.crud.async_elasticsearch import CrudAsyncElasticsearchBase
+from back.crud.async_bulk import AsyncBulkIndexer
+from back.crud.async_elasticsearch import CrudAsyncElasticsearchBase, invalidate_index
 from back.crud.async_progress import Progress
 from back.init.check import ping_elasticsearch, ping_storage
 from back.logging import logger_zetsubou
@@ -20,7 +21,10 @@ from back.model.elasticsearch import (
 )
 from back.model.task import ZetsuBouTaskProgressEnum
 from back.model.video import Video, VideoOrderedFieldEnum, Videos
-from back.session.async_elasticsearch import get_async_elasticsearch
+from back.session.async_elasticsearch import (
+    get_async_elasticsearch,
+    get_shared_async_elasticsearch,
+)
 from back.session.storage import get_app_storage_session, get_storage_session_by_source
 from back.session.storage.async_s3 import AsyncS3Session
 from back.settings import setting
@@ -29,6 +33,7 @@ from back.utils.dt import (
     get_now,
     is_isoformat_with_timezone,
 )
+from back.utils.query import QueryCompiler
 from back.utils.session import AsyncSession, session
 
 ELASTICSEARCH_INDEX_VIDEO = setting.elastic_index_video
@@ -159,13 +164,9 @@ class CrudAsyncElasticsearchVideo(CrudAsyncElasticsearchBase[Video]):
         is_desc: bool = True,
         labels: List[str] = [],
         tags: Dict[str, List[str]] = {},
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
     ):
-        dsl = {
-            "query": {"bool": {"must": [], "should": []}},
-            "size": size,
-            "track_total_hits": True,
-        }
-
         sorting = ["_score"]
         if order_by is None:
             sorting.append({"last_updated": {"order": "desc", "unmapped_type": "long"}})
@@ -175,154 +176,52 @@ class CrudAsyncElasticsearchVideo(CrudAsyncElasticsearchBase[Video]):
         else:
             sorting.append({order_by: {"order": "asc"}})
 
-        dsl["sort"] = sorting
+        compiler = QueryCompiler()
 
         if keywords is not None:
-            keywords = keywords.split()
-            keyword_fields = self.get_keyword_fields(keywords_analyzer)
-            for keyword in keywords:
-                dsl["query"]["bool"][keywords_bool].append(
-                    {
-                        "constant_score": {
-                            "filter": {
-                                "multi_match": {
-                                    "query": keyword,
-                                    "fuzziness": keywords_fuzziness,
-                                    "fields": keyword_fields,
-                                }
-                            }
-                        }
-                    }
-                )
-        if name is not None:
-            self.add_advanced_query(
-                dsl, name, "name", name_analyzer, name_fuzziness, name_bool
+            compiler.add_multi_match(
+                keywords.split(),
+                self.get_keyword_fields(keywords_analyzer),
+                fuzziness=keywords_fuzziness,
+                boolean=keywords_bool,
             )
 
+        if name is not None:
+            compiler.add_text(name, "name", name_analyzer, name_fuzziness, name_bool)
         if other_names is not None:
-            self.add_advanced_query(
-                dsl,
+            compiler.add_text(
                 other_names,
                 "other_names",
                 other_names_analyzer,
                 other_names_fuzziness,
                 other_names_bool,
             )
-
         if src is not None:
-            self.add_advanced_query(
-                dsl,
-                src,
-                "src",
-                src_analyzer,
-                src_fuzziness,
-                src_bool,
-            )
-
+            compiler.add_text(src, "src", src_analyzer, src_fuzziness, src_bool)
         if path is not None:
-            self.add_advanced_query(
-                dsl,
-                path,
-                "path",
-                path_analyzer,
-                path_fuzziness,
-                path_bool,
-            )
+            compiler.add_text(path, "path", path_analyzer, path_fuzziness, path_bool)
 
         if category is not None:
-            dsl["query"]["bool"]["must"].append(
-                {
-                    "constant_score": {
-                        "filter": {
-                            "multi_match": {
-                                "query": category,
-                                "fields": ["attributes.category"],
-                            }
-                        }
-                    }
-                }
-            )
-
+            compiler.add_term("attributes.category.keyword", category)
         if uploader is not None:
-            dsl["query"]["bool"]["must"].append(
-                {
-                    "constant_score": {
-                        "filter": {
-                            "multi_match": {
-                                "query": uploader,
-                                "fields": ["attributes.uploader"],
-                            }
-                        }
-                    }
-                }
-            )
-
-        if rating_gte is not None:
-            dsl["query"]["bool"]["must"].append(
-                {"range": {"attributes.rating": {"gte": rating_gte}}}
-            )
-        if rating_lte is not None:
-            dsl["query"]["bool"]["must"].append(
-                {"range": {"attributes.rating": {"lte": rating_lte}}}
-            )
-
-        if height_gte is not None:
-            dsl["query"]["bool"]["must"].append(
-                {"range": {"attributes.height": {"gte": height_gte}}}
-            )
-        if height_lte is not None:
-            dsl["query"]["bool"]["must"].append(
-                {"range": {"attributes.height": {"lte": height_lte}}}
-            )
-
-        if width_gte is not None:
-            dsl["query"]["bool"]["must"].append(
-                {"range": {"attributes.width": {"gte": width_gte}}}
-            )
-        if width_lte is not None:
-            dsl["query"]["bool"]["must"].append(
-                {"range": {"attributes.width": {"lte": width_lte}}}
-            )
-
-        if duration_gte is not None:
-            dsl["query"]["bool"]["must"].append(
-                {"range": {"attributes.duration": {"gte": duration_gte}}}
-            )
-        if duration_lte is not None:
-            dsl["query"]["bool"]["must"].append(
-                {"range": {"attributes.duration": {"lte": duration_lte}}}
-            )
-
-        for label in labels:
-            dsl["query"]["bool"]["must"].append(
-                {
-                    "constant_score": {
-                        "filter": {
-                            "multi_match": {
-                                "query": label,
-                                "fields": ["labels"],
-                            }
-                        }
-                    }
-                }
-            )
+            compiler.add_term("attributes.uploader.keyword", uploader)
+        compiler.add_range("attributes.rating", gte=rating_gte, lte=rating_lte)
+        compiler.add_range("attributes.height", gte=height_gte, lte=height_lte)
+        compiler.add_range("attributes.width", gte=width_gte, lte=width_lte)
+        compiler.add_range("attributes.duration", gte=duration_gte, lte=duration_lte)
 
+        compiler.add_terms("labels.keyword", labels)
         for tag_field, tag_values in tags.items():
-            for tag_value in tag_values:
-                dsl["query"]["bool"]["must"].append(
-                    {
-                        "constant_score": {
-                            "filter": {
-                                "multi_match": {
-                                    "query": tag_value,
-                                    "fields": [f"tags.{tag_field}"],
-                                }
-                            }
-                        }
-                    }
-                )
+            compiler.add_terms(f"tags.{tag_field}.keyword", tag_values)
 
-        return await self.query(page, dsl)
+        dsl = {
+            "query": compiler.compile(),
+            "size": size,
+            "sort": sorting,
+            "track_total_hits": True,
+        }
+
+        return await self.query(page, dsl, cursor=cursor, fields=fields)
 
     @session
     async def match_phrase_prefix(
@@ -427,7 +326,9 @@ class CrudAsyncVideo:
         self.video = video
 
         self.hosts = hosts
-        self.async_elasticsearch = AsyncElasticsearch(self.hosts)
+        self.async_elasticsearch: Optional[AsyncElasticsearch] = None
+        # the shared client is borrowed and must not be closed
+        self.is_shared_async_elasticsearch = False
         self.index = index
         self.cache_home = cache_home
         self.cover_home = cover_home
@@ -438,7 +339,8 @@ class CrudAsyncVideo:
         self.is_from_setting_if_none = is_from_setting_if_none
         if self.is_from_setting_if_none:
             if self.hosts is None:
-                self.async_elasticsearch = get_async_elasticsearch()
+                self.async_elasticsearch = get_shared_async_elasticsearch()
+                self.is_shared_async_elasticsearch = True
             if self.index is None:
                 self.index = ELASTICSEARCH_INDEX_VIDEO
             if self.cache_home is None:
@@ -448,6 +350,9 @@ class CrudAsyncVideo:
             if self.app_storage_protocol is None:
                 self.app_storage_protocol = STORAGE_PROTOCOL
 
+        if self.async_elasticsearch is None:
+            self.async_elasticsearch = AsyncElasticsearch(self.hosts)
+
     async def init(self):
         if self.video is None:
             self.video = await get_video_by_video_id(self.video_id)
@@ -460,7 +365,8 @@ class CrudAsyncVideo:
                 self.storage_session = await get_storage_session_by_source(self.video)
 
     async def close(self):
-        await self.async_elasticsearch.close()
+        if not self.is_shared_async_elasticsearch:
+            await self.async_elasticsearch.close()
 
     async def __aenter__(self):
         await self.init()
@@ -534,6 +440,7 @@ class CrudAsyncVideo:
         await self.async_elasticsearch.index(
             index=self.index, id=new_video.id, document=new_video.model_dump()
         )
+        await invalidate_index(self.index)
 
         return new_video
 
@@ -653,9 +560,17 @@ class CrudAsyncVideoSync(AsyncSession):
 
         self.available_extensions = [".mp4"]
 
-        self._elasticsearch_to_storage_batches = []
-        self._storage_to_elasticsearch_batches = []
         self._video_paths_in_elasitcsearch = {}
+        # the paths of the videos found in the storage before the synchronization
+        self._storage_paths: Optional[Set[str]] = None
+
+        index = self.index if self.target_index is None else self.target_index
+        self.bulk_indexer = AsyncBulkIndexer(
+            self.async_elasticsearch,
+            max_actions=self.batch_size,
+            refresh_indices=[index],
+            is_from_setting_if_none=is_from_setting_if_none,
+        )
 
     async def init(self):
         if self.is_from_setting_if_none and self.app_storage_session is None:
@@ -683,12 +598,6 @@ class CrudAsyncVideoSync(AsyncSession):
     async def close(self):
         await self.async_elasticsearch.close()
 
-    @session
-    async def send_bulk(self, batches: List[dict]):
-        await async_bulk(self.async_elasticsearch, batches)
-        self._elasticsearch_to_storage_batches = []
-        self._storage_to_elasticsearch_batches = []
-
     async def _sync_video_elasticsearch_to_storage(self, doc: dict):
         source = doc.get("_source", None)
         if source is None:
@@ -699,9 +608,14 @@ class CrudAsyncVideoSync(AsyncSession):
         if video._scheme != self.root_source._scheme:
             return
 
-        exists = await self.storage_session.exists(video)
+        # reconcile against the listing of the storage instead of sending requests to
+        # the storage for each document
+        if self._storage_paths is None:
+            exists = await self.storage_session.exists(video)
+        else:
+            exists = video.path in self._storage_paths
         if not exists and self.force:
-            self._elasticsearch_to_storage_batches.append(
+            await self.bulk_indexer.add(
                 {
                     "_index": self.index,
                     "_id": video.id,
@@ -711,9 +625,6 @@ class CrudAsyncVideoSync(AsyncSession):
         else:
             self._video_paths_in_elasitcsearch[video.path] = video
 
-        if len(self._elasticsearch_to_storage_batches) > self.batch_size:
-            await self.send_bulk(self._elasticsearch_to_storage_batches)
-
     async def _sync_video_storage_to_elasticsearch(self, source: SourceBaseModel):
         if Path(source.path).suffix not in self.available_extensions:
             return
@@ -765,10 +676,7 @@ class CrudAsyncVideoSync(AsyncSession):
             index = self.target_index
 
         action = {"_index": index, "_id": video.id, "_source": video.model_dump()}
-        self._storage_to_elasticsearch_batches.append(action)
-
-        if len(self._storage_to_elasticsearch_batches) > self.batch_size:
-            await self.send_bulk(self._storage_to_elasticsearch_batches)
+        await self.bulk_indexer.add(action)
 
     async def _sync_elasticsearch_to_storage_without_progress(self):
         query = self.dsl
@@ -778,19 +686,21 @@ class CrudAsyncVideoSync(AsyncSession):
         ):
             await self._sync_video_elasticsearch_to_storage(doc)
 
-        if len(self._elasticsearch_to_storage_batches) > 0:
-            await self.send_bulk(self._elasticsearch_to_storage_batches)
+        await self.bulk_indexer.join()
 
     async def _sync_storage_to_elasticsearch_without_progress(self):
-        sources = await self.storage_session.list_nested_sources(self.root_source)
-        for source in sources:
+        for source in self._sources:
             await self._sync_video_storage_to_elasticsearch(source)
 
-        if len(self._storage_to_elasticsearch_batches) > 0:
-            await self.send_bulk(self._storage_to_elasticsearch_batches)
+        await self.bulk_indexer.join()
 
     async def _count_storage(self):
         self._sources = await self.storage_session.list_nested_sources(self.root_source)
+        self._storage_paths = {
+            source.path
+            for source in self._sources
+            if Path(source.path).suffix in self.available_extensions
+        }
 
         self._storage_to_elasticsearch_num = len(self._sources)
 
@@ -827,8 +737,7 @@ class CrudAsyncVideoSync(AsyncSession):
         ):
             await self._sync_video_elasticsearch_to_storage(doc)
 
-        if len(self._elasticsearch_to_storage_batches) > 0:
-            await self.send_bulk(self._elasticsearch_to_storage_batches)
+        await self.bulk_indexer.join()
 
     async def _sync_storage_to_elasticsearch(self):
         async for source in Progress(
@@ -841,8 +750,7 @@ class CrudAsyncVideoSync(AsyncSession):
         ):
             await self._sync_video_storage_to_elasticsearch(source)
 
-        if len(self._storage_to_elasticsearch_batches) > 0:
-            await self.send_bulk(self._storage_to_elasticsearch_batches)
+        await self.bulk_indexer.join()
 
     @session
     async def sync(self):
@@ -857,7 +765,7 @@ class CrudAsyncVideoSync(AsyncSession):
         if not is_elasticsearch or not is_storage:
             return
 
-        async with self.app_storage_session, self.storage_session:
+        async with self.app_storage_session, self.storage_session, self.bulk_indexer:
             if self.is_progress:
                 await self._count_storage()
                 await self._count_elasticsearch()
@@ -865,5 +773,6 @@ class CrudAsyncVideoSync(AsyncSession):
                 await self._sync_storage_to_elasticsearch()
 
             else:
+                await self._count_storage()
                 await self._sync_elasticsearch_to_storage_without_progress()
                 await self._sync_storage_to_elasticsearch_without_progress()
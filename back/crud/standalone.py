@@ -10,6 +10,7 @@ from uuid import uuid4
 from elasticsearch import AsyncElasticsearch
 from fastapi import HTTPException
 
+from back.crud.async_elasticsearch import invalidate_index
 from back.crud.async_gallery import get_gallery_by_gallery_id
 from back.crud.async_progress import Progress
 from back.db.crud import CrudStorageMinio
@@ -76,25 +77,9 @@ def _check_storage_minio(
 
 
 async def _check_storage_minios(relative_path: Path) -> bool:
-    skip = 0
-    limit = 1000
-    storage_minios = await CrudStorageMinio.get_rows_order_by_id(
-        skip=skip,
-        limit=limit,
-    )
-
-    if _check_storage_minio(relative_path, storage_minios):
-        return True
-
-    while len(storage_minios) > 0:
-        skip += limit
-        storage_minios = await CrudStorageMinio.get_rows_order_by_id(
-            skip=skip,
-            limit=limit,
-        )
-        if _check_storage_minio(relative_path, storage_minios):
+    async for storage_minio in CrudStorageMinio.iter_order_by_id(limit=1000):
+        if _check_storage_minio(relative_path, [storage_minio]):
             return True
-
     return False
 
 
@@ -252,6 +237,7 @@ class _SyncNewGalleries:
                 id=gallery_tag.id,
                 document=gallery_tag.model_dump(),
             )
+            await invalidate_index(self.elastic_index_gallery)
 
     async def _sync_new_storage(self):
         if self.storage_protocol == SourceProtocolEnum.MINIO:
@@ -1,4 +1,5 @@
 import json
+from typing import Dict, List, Optional
 
 from fastapi import HTTPException
 
@@ -9,13 +10,31 @@ from back.db.crud import CrudUserElasticCountQuery
 class CrudElasticCount:
     @classmethod
     async def count(cls, query_id: int) -> int:
-        query = await CrudUserElasticCountQuery.get_row_by_id(query_id)
-        if not query:
-            raise HTTPException(
-                status_code=404, detail=f"Elastic Count Query Id: {query_id} not found"
-            )
-        query_json = json.loads(query.query)
+        counts = await cls.count_many([query_id])
+        return counts[query_id]
+
+    @classmethod
+    async def count_many(
+        cls, query_ids: List[int], user_id: Optional[int] = None
+    ) -> Dict[int, int]:
+        """Count the queries with one query of the database and one `_msearch` of
+        Elasticsearch. Only the queries of the user are counted if `user_id` is given.
+        """
+
+        query_ids = list(dict.fromkeys(query_ids))
+        if len(query_ids) == 0:
+            return {}
+
+        queries = await CrudUserElasticCountQuery.get_rows_by_ids(query_ids, user_id)
+        found_ids = {query.id for query in queries}
+        for query_id in query_ids:
+            if query_id not in found_ids:
+                raise HTTPException(
+                    status_code=404,
+                    detail=f"Elastic Count Query Id: {query_id} not found",
+                )
+        bodies = [json.loads(query.query)["body"] for query in queries]
 
         async with CrudAsyncElasticsearchGallery(is_from_setting_if_none=True) as crud:
-            c = await crud.count(query_json["body"])
-        return c.count
+            results = await crud.count_many(bodies)
+        return {query.id: result.count for query, result in zip(queries, results)}
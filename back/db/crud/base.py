@@ -2,7 +2,7 @@ from datetime import datetime
 from typing import AsyncIterator, Dict, List, Optional, Set, Type, TypeVar, Union
 
 from pydantic import BaseModel
-from sqlalchemy import Column, delete, desc, text, update
+from sqlalchemy import Column, and_, delete, desc, or_, text, update
 from sqlalchemy.engine.cursor import CursorResult
 from sqlalchemy.ext.asyncio.engine import AsyncEngine
 from sqlalchemy.future import select
@@ -170,43 +170,121 @@ async def get_rows_by_ids_order_by_id(
     )
 
 
+def _to_json_dict(row: dict) -> dict:
+    for k, v in row.items():
+        if isinstance(v, datetime):
+            row[k] = v.isoformat()
+    return row
+
+
+async def iter_rows_by_keyset(
+    instance: DeclarativeMeta,
+    condition=None,
+    order=None,
+    model: Optional[Type[PydanticBaseModel]] = None,
+    limit: int = 100,
+    is_desc: bool = False,
+    is_tuple: bool = False,
+) -> AsyncIterator[Union[PydanticBaseModel, dict, tuple]]:
+    """
+    Iterate over the rows ordered by `order` and the ID with keyset pagination.
+
+    Each page is `WHERE (order, id) > (:last_order, :last_id) ... LIMIT limit`, so it
+    starts from the index instead of scanning the rows of the previous pages like
+    `OFFSET`, and a full iteration is linear in the number of the rows. `order` must
+    not be nullable. The rows are yielded as the tuples of the columns if `is_tuple`,
+    the dicts of the columns if `model` is None, or the instances of `model`.
+
+    Each page is fetched and its session is closed before the rows are yielded, so a
+    caller which stops iterating early does not leave a transaction open.
+    """
+
+    if order is None:
+        order = instance.id
+    columns = list(instance.__table__.columns)
+    names = [column.key for column in columns]
+    id_index = names.index("id")
+    is_by_id = order is instance.id
+
+    last_order = last_id = None
+    while True:
+        if is_by_id:
+            statement = select(*columns)
+        else:
+            statement = select(*columns, order)
+        if condition is not None:
+            statement = statement.where(condition)
+        if last_id is not None:
+            if is_by_id:
+                after = instance.id < last_id if is_desc else instance.id > last_id
+            elif is_desc:
+                after = or_(
+                    order < last_order, and_(order == last_order, instance.id < last_id)
+                )
+            else:
+                after = or_(
+                    order > last_order, and_(order == last_order, instance.id > last_id)
+                )
+            statement = statement.where(after)
+        if is_by_id:
+            orders = [desc(order) if is_desc else order]
+        elif is_desc:
+            orders = [desc(order), desc(instance.id)]
+        else:
+            orders = [order, instance.id]
+        statement = statement.order_by(*orders).limit(limit)
+
+        async with async_session() as session:
+            async with session.begin():
+                result = await session.execute(statement)
+                rows = result.all()
+
+        for row in rows:
+            values = tuple(row)
+            last_id = values[id_index]
+            if not is_by_id:
+                last_order = values[-1]
+                values = values[:-1]
+            if is_tuple:
+                yield values
+            elif model is None:
+                yield dict(zip(names, values))
+            else:
+                yield model(**dict(zip(names, values)))
+        if len(rows) < limit:
+            return
+
+
 async def iter_by_condition_order_by_id(
     instance: DeclarativeMeta,
     condition,
-    model: Type[PydanticBaseModel],
+    model: Optional[Type[PydanticBaseModel]] = None,
     limit: int = 100,
     is_desc: bool = False,
-) -> AsyncIterator[PydanticBaseModel]:
-    skip = 0
-    rows = await get_rows_by_condition_order_by_id(
-        instance, condition, model, skip=skip, limit=limit, is_desc=is_desc
-    )
-    while rows:
-        for row in rows:
-            yield row
-        skip += limit
-        rows = await get_rows_by_condition_order_by_id(
-            instance, condition, model, skip=skip, limit=limit, is_desc=is_desc
-        )
+    is_tuple: bool = False,
+) -> AsyncIterator[Union[PydanticBaseModel, dict, tuple]]:
+    async for row in iter_rows_by_keyset(
+        instance,
+        condition=condition,
+        model=model,
+        limit=limit,
+        is_desc=is_desc,
+        is_tuple=is_tuple,
+    ):
+        yield row
 
 
 async def iter_order_by_id(
     instance: DeclarativeMeta,
-    model: Type[PydanticBaseModel],
+    model: Optional[Type[PydanticBaseModel]] = None,
     limit: int = 100,
     is_desc: bool = False,
-) -> AsyncIterator[PydanticBaseModel]:
-    skip = 0
-    rows = await get_rows_order_by_id(
-        instance, model, skip=skip, limit=limit, is_desc=is_desc
-    )
-    while rows:
-        for row in rows:
-            yield row
-        skip += limit
-        rows = await get_rows_order_by_id(
-            instance, model, skip=skip, limit=limit, is_desc=is_desc
-        )
+    is_tuple: bool = False,
+) -> AsyncIterator[Union[PydanticBaseModel, dict, tuple]]:
+    async for row in iter_rows_by_keyset(
+        instance, model=model, limit=limit, is_desc=is_desc, is_tuple=is_tuple
+    ):
+        yield row
 
 
 async def get_all_rows_by_condition_order_by(
@@ -215,20 +293,12 @@ async def get_all_rows_by_condition_order_by(
     order,
     model: Type[PydanticBaseModel],
 ) -> List[PydanticBaseModel]:
-    out = []
-    skip = 0
-    limit = 1000
-    rows = await get_rows_by_condition_order_by(
-        instance, condition, order, model, skip=skip, limit=limit
-    )
-    while rows:
-        out += rows
-        skip += limit
-        rows = await get_rows_by_condition_order_by(
-            instance, condition, order, model, skip=skip, limit=limit
+    return [
+        row
+        async for row in iter_rows_by_keyset(
+            instance, condition=condition, order=order, model=model, limit=1000
         )
-
-    return out
+    ]
 
 
 async def get_all_rows_by_condition_order_by_id(
@@ -242,16 +312,9 @@ async def get_all_rows_by_condition_order_by_id(
 
 
 async def get_all_rows_order_by_id(instance: DeclarativeMeta) -> List[dict]:
-    out = []
-    skip = 0
-    limit = 1000
-    rows = await get_rows_order_by(instance, instance.id, skip=skip, limit=limit)
-    while rows:
-        out += rows
-        skip += limit
-        rows = await get_rows_order_by(instance, instance.id, skip=skip, limit=limit)
-
-    return out
+    return [
+        _to_json_dict(row) async for row in iter_rows_by_keyset(instance, limit=1000)
+    ]
 
 
 async def update_by(
@@ -13,6 +13,7 @@ from ..base import (
     delete_by_id,
     get_row_by,
     get_row_by_id,
+    get_rows_by_condition_order_by_id,
     get_rows_order_by_id,
     update_by_id,
 )
@@ -31,6 +32,15 @@ class CrudTagAttribute(TagAttributeBase):
     async def get_row_by_id(cls, id: int) -> Optional[TagAttribute]:
         return await get_row_by_id(cls, id, TagAttribute)
 
+    @classmethod
+    async def get_rows_by_ids(cls, ids: List[int]) -> List[TagAttribute]:
+        """Get the attributes of the ids in one query."""
+        if len(ids) == 0:
+            return []
+        return await get_rows_by_condition_order_by_id(
+            cls, cls.id.in_(ids), TagAttribute, limit=len(ids)
+        )
+
     @classmethod
     async def get_row_by_name(cls, name: str) -> Optional[TagAttribute]:
         return await get_row_by(cls, cls.name == name, TagAttribute)
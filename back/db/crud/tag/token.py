@@ -37,6 +37,15 @@ class CrudTagToken(TagTokenBase):
     async def get_row_by_id(cls, id: int) -> Optional[TagToken]:
         return await get_row_by_id(cls, id, TagToken)
 
+    @classmethod
+    async def get_rows_by_ids(cls, ids: List[int]) -> List[TagToken]:
+        """Get the tokens of the ids in one query."""
+        if len(ids) == 0:
+            return []
+        return await get_rows_by_condition_order_by_id(
+            cls, cls.id.in_(ids), TagToken, limit=len(ids)
+        )
+
     @classmethod
     async def get_rows_order_by_id(
         cls, skip: int = 0, limit: int = 100, is_desc: bool = False
@@ -18,6 +18,7 @@ from ...base import (
     get_row_by,
     get_row_by_id,
     get_rows_by_condition_order_by,
+    get_rows_by_condition_order_by_id,
     update_by_id,
 )
 
@@ -46,6 +47,20 @@ class CrudUserElasticCountQuery(UserElasticCountQueryBase):
             cls, and_(cls.id == id, cls.user_id == user_id), UserElasticCountQuery
         )
 
+    @classmethod
+    async def get_rows_by_ids(
+        cls, ids: List[int], user_id: Optional[int] = None
+    ) -> List[UserElasticCountQuery]:
+        """Get the queries of the ids in one query, only the ones of the user if
+        `user_id` is given.
+        """
+        condition = cls.id.in_(ids)
+        if user_id is not None:
+            condition = and_(condition, cls.user_id == user_id)
+        return await get_rows_by_condition_order_by_id(
+            cls, condition, UserElasticCountQuery, limit=len(ids)
+        )
+
     @classmethod
     async def get_rows_by_user_id_order_by_id(
         cls, user_id: int, skip: int = 0, limit: int = 100, is_desc: bool = False
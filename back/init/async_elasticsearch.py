@@ -4,6 +4,8 @@ from typing import Dict, List
 
 from elasticsearch import AsyncElasticsearch
 
+from back.crud.async_bulk import reset_refresh
+from back.crud.async_elasticsearch import invalidate_index
 from back.model.elasticsearch import ElasticsearchAnalyzerEnum, ElasticsearchField
 from back.session.async_elasticsearch import get_async_elasticsearch
 from back.settings import setting
@@ -183,6 +185,7 @@ def get_field_analyzer_from_mapping(
 async def safe_create(session: AsyncElasticsearch, index: str, body: dict):
     if not await session.indices.exists(index=index):
         await session.indices.create(index=index, body=body)
+        await invalidate_index(index)
 
 
 async def create_gallery(session: AsyncElasticsearch, index: str):
@@ -208,3 +211,12 @@ async def init_indices(session: AsyncElasticsearch = get_async_elasticsearch()):
     await create_gallery(session, setting.elastic_index_gallery)
     await create_video(session, setting.elastic_index_video)
     await create_tag(session, setting.elastic_index_tag)
+
+    await reset_refresh(
+        session,
+        [
+            setting.elastic_index_gallery,
+            setting.elastic_index_video,
+            setting.elastic_index_tag,
+        ],
+    )
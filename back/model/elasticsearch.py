@@ -9,9 +9,10 @@ from typing import (
     Optional,
     TypedDict,
     TypeVar,
+    Union,
 )
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, computed_field
 
 SourceT = TypeVar("SourceT")
 
@@ -44,6 +45,11 @@ class ElasticsearchQueryBooleanEnum(str, Enum):
     SHOULD: str = "should"
 
 
+class ElasticsearchViewEnum(str, Enum):
+    FULL: str = "full"
+    CARD: str = "card"
+
+
 class ElasticsearchTotal(BaseModel):
     value: int = 0
 
@@ -63,12 +69,74 @@ class ElasticsearchHits(BaseModel, Generic[SourceT]):
 class ElasticsearchSearchResult(BaseModel, Generic[SourceT]):
     scroll_id: Optional[str] = Field(default=None, alias="_scroll_id")
     hits: ElasticsearchHits[SourceT] = Field(default=ElasticsearchHits[SourceT]())
+    cursor: Optional[str] = Field(
+        default=None, description="The opaque cursor of the next page."
+    )
+
+
+class ElasticsearchSearchCursor(BaseModel):
+    key: str
+    page: int
+    size: int
+    search_after: List[Any]
+    pit_id: Optional[str] = None
+
+
+class ElasticsearchRandomOrder(BaseModel):
+    generation: int
+    total: int
+    width: int = Field(description="Number of bytes of a packed ID.")
+    is_uuid: bool
 
 
 class ElasticsearchCountResult(BaseModel):
     count: int
 
 
+class ElasticsearchBulkError(BaseModel):
+    index: Optional[str] = None
+    id: Optional[str] = None
+    op_type: str
+    status: Union[int, str]
+    error: Any = None
+
+
+class ElasticsearchBulkResult(BaseModel):
+    succeeded: int = 0
+    failed: int = 0
+    retries: int = Field(default=0, description="Number of the retried bulk requests.")
+    requests: int = 0
+    errors: List[ElasticsearchBulkError] = Field(
+        default=[], description="The first errors of the failed actions."
+    )
+
+
+class ElasticsearchResultCacheStats(BaseModel):
+    hits: int = 0
+    misses: int = 0
+    oversized: int = Field(
+        default=0, description="Number of the responses too large to be cached."
+    )
+    hit_seconds: float = 0.0
+    miss_seconds: float = 0.0
+
+    @computed_field
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0.0
+
+    @computed_field
+    @property
+    def mean_hit_seconds(self) -> float:
+        return self.hit_seconds / self.hits if self.hits > 0 else 0.0
+
+    @computed_field
+    @property
+    def mean_miss_seconds(self) -> float:
+        return self.miss_seconds / self.misses if self.misses > 0 else 0.0
+
+
 class ElasticsearchHealthResponse(BaseModel):
     status: str = None
 
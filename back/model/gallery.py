@@ -1,11 +1,11 @@
 from enum import Enum
-from typing import Optional
+from typing import List, Optional
 
-from pydantic import Field
+from pydantic import BaseModel, Field
 
 from back.model.base import SourceBaseModel
 from back.model.elasticsearch import ElasticsearchSearchResult
-from back.model.source import Source, SourceAttributes
+from back.model.source import Source, SourceAttributes, SourceCard
 from back.settings import setting
 
 DIR_FNAME = setting.gallery_dir_fname
@@ -51,3 +51,32 @@ class Gallery(Source):
 
 
 Galleries = ElasticsearchSearchResult[Gallery]
+
+
+class GalleryCardAttributes(BaseModel):
+    category: Optional[str] = None
+    rating: Optional[int] = None
+    pages: Optional[int] = None
+
+
+class GalleryCard(SourceCard):
+    attributes: GalleryCardAttributes = GalleryCardAttributes()
+
+
+GalleryCards = ElasticsearchSearchResult[GalleryCard]
+
+GALLERY_CARD_FIELDS: List[str] = [
+    "id",
+    "name",
+    "path",
+    "src",
+    "last_updated",
+    "attributes.category",
+    "attributes.rating",
+    "attributes.pages",
+]
+
+
+class GalleryImageUrl(BaseModel):
+    name: str = Field(title="Image filename", examples=["1.jpg"])
+    url: str = Field(title="Presigned image URL")
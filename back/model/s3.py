@@ -1,3 +1,4 @@
+from datetime import datetime
 from typing import Any, List, Optional
 
 from pydantic import BaseModel, Field
@@ -11,6 +12,8 @@ class S3Object(BaseModel):
 class S3GetPaginatorResponseContent(BaseModel):
     Key: str
     Size: int = Field(..., description="Size in bytes of the object")
+    ETag: Optional[str] = None
+    LastModified: Optional[datetime] = None
 
 
 class S3GetPaginatorResponseCommonPrefix(BaseModel):
@@ -6,9 +6,11 @@ from back.utils.enum import StrEnumMeta
 class ScopeEnum(str, Enum, metaclass=StrEnumMeta):
     elasticsearch_query_examples_get: str = "elasticsearch.query-examples:get"
     elasticsearch_analyzers_get: str = "elasticsearch.analyzers:get"
+    elasticsearch_result_cache_get: str = "elasticsearch.result-cache:get"
 
     gallery_images_get: str = "gallery.images:get"
     gallery_image_get: str = "gallery.image:get"
+    gallery_image_urls_get: str = "gallery.image-urls:get"
     gallery_cover_get: str = "gallery.cover:get"
     gallery_delete: str = "gallery:delete"
     gallery_open_get: str = "gallery.open:get"
@@ -77,8 +79,10 @@ class ScopeEnum(str, Enum, metaclass=StrEnumMeta):
 
     tag_search_for_tag_attributes_get: str = "tag.search-for-tag-attributes:get"
     tag_interpretation_get: str = "tag.interpretation:get"
+    tag_interpretations_post: str = "tag.interpretations:post"
     tag_get: str = "tag:get"
     tag_delete: str = "tag:delete"
+    tag_delete_progress_get: str = "tag.delete-progress:get"
     tag_post: str = "tag:post"
     tag_put: str = "tag:put"
 
@@ -97,6 +101,7 @@ class ScopeEnum(str, Enum, metaclass=StrEnumMeta):
     tag_synonym_put: str = "tag.synonym:put"
     tag_synonym_delete: str = "tag.synonym:delete"
 
+    tag_autocomplete_get: str = "tag.autocomplete:get"
     tag_token_startswith_get: str = "tag.token-startswith:get"
     tag_toal_tokens_get: str = "tag.toal-tokens:get"
     tag_token_exists_get: str = "tag.token.exists:get"
@@ -138,6 +143,7 @@ class ScopeEnum(str, Enum, metaclass=StrEnumMeta):
     user_elastic_count_query_post: str = "user.elastic.count-query:post"
     user_elastic_count_query_put: str = "user.elastic.count-query:put"
     user_elastic_count_query_delete: str = "user.elastic.count-query:delete"
+    user_elastic_counts_post: str = "user.elastic.counts:post"
     user_elastic_total_search_queries_get: str = "user.elastic.total-search-queries:get"
     user_elastic_search_queries_get: str = "user.elastic.search-queries:get"
     user_elastic_search_query_get: str = "user.elastic.search-query:get"
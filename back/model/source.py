@@ -75,3 +75,12 @@ class Source(SourceBaseModel):
         description="One layer label. We use tokens as labels.",
         examples=[{"Color": ["Red", "Green", "Blue"]}],
     )
+
+
+class SourceCard(SourceBaseModel):
+    """The fields of a source shown in the grid views."""
+
+    id: Optional[str] = None
+    name: Optional[str] = None
+    src: List[Optional[str]] = []
+    last_updated: Optional[DatetimeStr] = None
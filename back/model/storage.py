@@ -1,3 +1,4 @@
+from datetime import datetime
 from enum import Enum
 from typing import List, Optional
 
@@ -22,6 +23,39 @@ class StorageGallery(SourceBaseModel):
     code: StorageGalleryCodeEnum
 
 
+class StorageGallerySummary(SourceBaseModel):
+    has_tag: bool = Field(
+        default=False, description="Whether the gallery has the tag file."
+    )
+    tag_etag: Optional[str] = Field(default=None, description="ETag of the tag file.")
+    tag_last_modified: Optional[datetime] = Field(
+        default=None, description="Last modified time of the tag file."
+    )
+    num_images: int = Field(
+        default=0, description="Number of browser images directly in the gallery."
+    )
+
+
+class StorageGalleryManifestEntry(BaseModel):
+    id: str = Field(..., description="Gallery ID.")
+    tag_etag: Optional[str] = Field(default=None, description="ETag of the tag file.")
+    tag_last_modified: Optional[datetime] = Field(
+        default=None, description="Last modified time of the tag file."
+    )
+    num_images: int = Field(
+        default=0, description="Number of browser images directly in the gallery."
+    )
+
+    def is_changed(self, summary: StorageGallerySummary) -> bool:
+        # The last modified time is not compared because it is unknown right after the
+        # tag file is written by the synchronization itself.
+        if not summary.has_tag:
+            return True
+        return (
+            self.tag_etag != summary.tag_etag or self.num_images != summary.num_images
+        )
+
+
 class StorageGalleries(BaseModel):
     percentage: Optional[float] = None
     galleries: List[StorageGallery] = []
@@ -1,3 +1,4 @@
+from enum import Enum
 from typing import Dict, List, Optional
 
 from pydantic import BaseModel
@@ -52,3 +53,49 @@ class Tag(BaseModel):
 
 
 TagInterpretation = Tag
+
+
+class TagAutocompletion(TagToken):
+    count: int = 0
+    representative: Optional[TagToken] = None
+    synonyms: List[TagToken] = []
+
+
+class TagAutocompleteEventEnum(str, Enum):
+    SET: str = "set"
+    DELETE: str = "delete"
+    RELOAD: str = "reload"
+
+
+class TagAutocompleteEvent(BaseModel):
+    source: str
+    event: TagAutocompleteEventEnum
+    id: Optional[int] = None
+    name: Optional[str] = None
+    # The relations are unchanged if `has_relations` is false, e.g. a token is renamed.
+    has_relations: bool = False
+    category_ids: List[int] = []
+    synonym_ids: List[int] = []
+    representative_id: Optional[int] = None
+
+
+class TagImportCheckpoint(BaseModel):
+    # The IDs of the attributes by their names.
+    attributes: Dict[str, int] = {}
+    # The IDs of the inserted tokens by their IDs in the imported file.
+    tokens: Dict[int, int] = {}
+    # The numbers of the tags whose relations and documents are written.
+    relations: int = 0
+    documents: int = 0
+
+
+class TagImportStatistic(BaseModel):
+    phase: str
+    count: int = 0
+    seconds: float = 0.0
+
+    @property
+    def throughput(self) -> float:
+        if self.seconds <= 0:
+            return 0.0
+        return self.count / self.seconds
@@ -10,6 +10,7 @@ class ZetsuBouTaskProgressEnum(str, Enum):
     SYNC_STORAGE: str = f"{PREFIX}.task.progress.sync-storage"
     SYNC_STORAGES: str = f"{PREFIX}.task.progress.sync-storages"
     SYNC_NEW_GALLERIES: str = f"{PREFIX}.task.progress.sync-new-galleries"
+    DELETE_TAG: str = f"{PREFIX}.task.progress.delete-tag"
 
 
 class ZetsuBouTask(BaseModel):
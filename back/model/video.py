@@ -1,8 +1,10 @@
 from enum import Enum
-from typing import Optional
+from typing import List, Optional
+
+from pydantic import BaseModel
 
 from back.model.elasticsearch import ElasticsearchSearchResult
-from back.model.source import Source, SourceAttributes
+from back.model.source import Source, SourceAttributes, SourceCard
 
 
 class VideoOrderedFieldEnum(str, Enum):
@@ -28,3 +30,27 @@ class Video(Source):
 
 
 Videos = ElasticsearchSearchResult[Video]
+
+
+class VideoCardAttributes(BaseModel):
+    category: Optional[str] = None
+    rating: Optional[int] = None
+    duration: Optional[float] = None
+
+
+class VideoCard(SourceCard):
+    attributes: VideoCardAttributes = VideoCardAttributes()
+
+
+VideoCards = ElasticsearchSearchResult[VideoCard]
+
+VIDEO_CARD_FIELDS: List[str] = [
+    "id",
+    "name",
+    "path",
+    "src",
+    "last_updated",
+    "attributes.category",
+    "attributes.rating",
+    "attributes.duration",
+]
@@ -6,6 +6,7 @@ guest_scopes = [
     ScopeEnum.elasticsearch_analyzers_get,
     ScopeEnum.gallery_images_get,
     ScopeEnum.gallery_image_get,
+    ScopeEnum.gallery_image_urls_get,
     ScopeEnum.gallery_cover_get,
     ScopeEnum.gallery_random_get,
     ScopeEnum.gallery_advanced_search_get,
@@ -29,6 +30,7 @@ guest_scopes = [
     ScopeEnum.user_elastic_count_query_post,
     ScopeEnum.user_elastic_count_query_put,
     ScopeEnum.user_elastic_count_query_delete,
+    ScopeEnum.user_elastic_counts_post,
     ScopeEnum.user_elastic_total_search_queries_get,
     ScopeEnum.user_elastic_search_queries_get,
     ScopeEnum.user_elastic_search_query_get,
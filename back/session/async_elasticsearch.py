@@ -1,11 +1,177 @@
-from typing import List
+import asyncio
+import time
+from collections import deque
+from typing import Dict, List, Optional, Set, Tuple
 
 from elasticsearch import AsyncElasticsearch
 
+from back.logging import logger_zetsubou
 from back.settings import setting
 
 HOSTS = setting.elastic_hosts
+ELASTIC_MAXSIZE = setting.elastic_maxsize
+ELASTIC_TIMEOUT = setting.elastic_timeout
+ELASTIC_MAPPING_EXPIRES_IN_SECONDS = setting.elastic_mapping_expires_in_seconds
 
+_async_elasticsearch: Optional[AsyncElasticsearch] = None
+_async_elasticsearch_loop: Optional[asyncio.AbstractEventLoop] = None
+# The tasks closing the clients replaced on another event loop.
+_closing_tasks: Set[asyncio.Task] = set()
 
-def get_async_elasticsearch(hosts: List[str] = HOSTS) -> AsyncElasticsearch:
-    return AsyncElasticsearch(hosts=hosts)
+
+def get_async_elasticsearch(
+    hosts: List[str] = HOSTS,
+    maxsize: int = ELASTIC_MAXSIZE,
+    timeout: float = ELASTIC_TIMEOUT,
+) -> AsyncElasticsearch:
+    return AsyncElasticsearch(hosts=hosts, maxsize=maxsize, timeout=timeout)
+
+
+def _get_running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+async def _close_stale_async_elasticsearch(async_elasticsearch: AsyncElasticsearch):
+    try:
+        await async_elasticsearch.close()
+    except Exception as e:
+        # e.g. the event loop of its connections is closed already
+        logger_zetsubou.debug(f"Can't close the replaced Elasticsearch client: {e}")
+
+
+def _close_stale_async_elasticsearch_later(
+    async_elasticsearch: AsyncElasticsearch,
+    stale_loop: Optional[asyncio.AbstractEventLoop],
+    loop: Optional[asyncio.AbstractEventLoop],
+):
+    coroutine = _close_stale_async_elasticsearch(async_elasticsearch)
+    if stale_loop is not None and stale_loop.is_running():
+        # Its connections are bound to the event loop running in another thread.
+        asyncio.run_coroutine_threadsafe(coroutine, stale_loop)
+    elif loop is not None:
+        task = loop.create_task(coroutine)
+        _closing_tasks.add(task)
+        task.add_done_callback(_closing_tasks.discard)
+    else:
+        coroutine.close()
+
+
+def get_shared_async_elasticsearch() -> AsyncElasticsearch:
+    """Get the pooled client shared by the whole process. The borrowers must not close
+    it.
+
+    The connections of `aiohttp` are bound to an event loop, so another client is
+    created when it is borrowed from another event loop, e.g. `asyncio.run` in the
+    commands, and the replaced client is closed in the background.
+    """
+
+    global _async_elasticsearch, _async_elasticsearch_loop
+
+    loop = _get_running_loop()
+    if _async_elasticsearch is None or _async_elasticsearch_loop is not loop:
+        if _async_elasticsearch is not None:
+            _close_stale_async_elasticsearch_later(
+                _async_elasticsearch, _async_elasticsearch_loop, loop
+            )
+        _async_elasticsearch = get_async_elasticsearch()
+        _async_elasticsearch_loop = loop
+    return _async_elasticsearch
+
+
+async def open_async_elasticsearch():
+    get_shared_async_elasticsearch()
+
+
+async def close_async_elasticsearch():
+    global _async_elasticsearch, _async_elasticsearch_loop
+
+    if _async_elasticsearch is None:
+        return
+
+    async_elasticsearch = _async_elasticsearch
+    _async_elasticsearch = None
+    _async_elasticsearch_loop = None
+    await async_elasticsearch.close()
+
+
+def get_field_names_from_mappings(mappings: Optional[dict]) -> Set[str]:
+    """Flatten the mappings of an index into the dotted names of the leaf fields."""
+
+    if mappings is None:
+        return set()
+    field_names = set()
+    stack = deque([(mappings, "")])
+    while stack:
+        current_mappings, parent_field_name = stack.popleft()
+        properties = current_mappings.get("properties", None)
+
+        if properties is None:
+            field_names.add(parent_field_name)
+            continue
+
+        for field_name, next_mappings in properties.items():
+            if parent_field_name:
+                stack.append((next_mappings, f"{parent_field_name}.{field_name}"))
+            else:
+                stack.append((next_mappings, field_name))
+
+    return field_names
+
+
+class ElasticsearchMappingRegistry:
+    """Cache the field names of the indices so that a search does not have to fetch
+    the mappings first.
+
+    The cached field names expire after `expires_in_seconds` so that the fields added
+    by the dynamic mappings or by other processes are picked up, and `invalidate`
+    should be called when an index is created, deleted, reindexed or written.
+    """
+
+    def __init__(
+        self,
+        expires_in_seconds: Optional[float] = None,
+        is_from_setting_if_none: bool = False,
+    ):
+        self.expires_in_seconds = expires_in_seconds
+
+        if is_from_setting_if_none:
+            if self.expires_in_seconds is None:
+                self.expires_in_seconds = ELASTIC_MAPPING_EXPIRES_IN_SECONDS
+
+        if self.expires_in_seconds is None:
+            self.expires_in_seconds = 0.0
+
+        self._field_names: Dict[str, Tuple[float, Set[str]]] = {}
+
+    async def get_field_names(
+        self, async_elasticsearch: AsyncElasticsearch, index: str
+    ) -> Set[str]:
+        now = time.monotonic()
+        cached = self._field_names.get(index, None)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+
+        resp = await async_elasticsearch.indices.get_mapping(index=index)
+        mappings = resp.get(index, {}).get("mappings", None)
+        field_names = get_field_names_from_mappings(mappings)
+        # An index without the mappings is not cached since it may be created soon.
+        if mappings is not None and self.expires_in_seconds > 0:
+            self._field_names[index] = (now + self.expires_in_seconds, field_names)
+        return field_names
+
+    def invalidate(self, index: Optional[str] = None):
+        """Invalidate the field names of the index, or of all the indices if the index
+        is not given.
+        """
+        if index is None:
+            self._field_names.clear()
+        else:
+            self._field_names.pop(index, None)
+
+
+elasticsearch_mapping_registry = ElasticsearchMappingRegistry(
+    is_from_setting_if_none=True
+)
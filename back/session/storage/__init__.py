@@ -1,6 +1,12 @@
+import asyncio
+import time
+from typing import Any, Dict, Optional, Tuple
+
 from fastapi import HTTPException
 
 from back.db.crud import CrudStorageMinio
+from back.db.model import StorageMinio
+from back.logging import logger_zetsubou
 from back.model.base import SourceBaseModel, SourceProtocolEnum
 from back.session.storage.async_s3 import AsyncS3Session
 from back.settings import setting
@@ -9,6 +15,212 @@ STORAGE_PROTOCOL = setting.storage_protocol
 STORAGE_S3_AWS_ACCESS_KEY_ID = setting.storage_s3_aws_access_key_id
 STORAGE_S3_AWS_SECRET_ACCESS_KEY = setting.storage_s3_aws_secret_access_key
 STORAGE_S3_ENDPOINT_URL = setting.storage_s3_endpoint_url
+STORAGE_S3_MAX_POOL_CONNECTIONS = setting.storage_s3_max_pool_connections
+STORAGE_SESSION_EXPIRES_IN_SECONDS = setting.storage_session_expires_in_seconds
+
+
+def _get_running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def _get_credentials(storage_minio: StorageMinio) -> Tuple[str, str, str]:
+    return (
+        storage_minio.endpoint,
+        storage_minio.access_key,
+        storage_minio.secret_key,
+    )
+
+
+async def _close_stale_client(client: Any):
+    try:
+        await client.close()
+    except Exception as e:
+        # e.g. the event loop of its connections is closed already
+        logger_zetsubou.warning(f"Can't close the replaced storage client: {e}")
+
+
+class _SharedClient:
+    def __init__(
+        self,
+        loop: Optional[asyncio.AbstractEventLoop],
+        credentials: Tuple[str, str, str],
+        client: Any,
+    ):
+        self.loop = loop
+        self.credentials = credentials
+        self.client = client
+        # the number of the sessions using the client
+        self.borrowers = 0
+        # the client is replaced and closed when it is no longer borrowed
+        self.is_retired = False
+
+
+class SharedAsyncS3Session(AsyncS3Session):
+    """Borrow the long-lived client of a storage from `AsyncS3SessionRegistry`. The
+    client is returned instead of being closed when the session is closed.
+    """
+
+    def __init__(
+        self,
+        registry: "AsyncS3SessionRegistry",
+        storage_minio: StorageMinio,
+        **kwargs,
+    ):
+        super().__init__(
+            aws_access_key_id=storage_minio.access_key,
+            aws_secret_access_key=storage_minio.secret_key,
+            endpoint_url=storage_minio.endpoint,
+            **kwargs,
+        )
+        self.registry = registry
+        self.storage_id = storage_minio.id
+        self._shared_client: Optional[_SharedClient] = None
+
+    async def open(self):
+        self._shared_client = await self.registry.acquire_client(self.storage_id)
+        self.client = self._shared_client.client
+        return self.client
+
+    async def close(self):
+        if self._shared_client is None:
+            return
+        shared_client = self._shared_client
+        self._shared_client = None
+        await self.registry.release_client(shared_client)
+
+
+class AsyncS3SessionRegistry:
+    """Cache the MinIO storage rows and keep one pooled S3 client per storage.
+
+    The cached rows expire after `expires_in_seconds` so that the changes made by other
+    processes are picked up, and `invalidate` should be called when a storage is
+    updated or deleted. A replaced client is closed once the sessions which borrowed it
+    are closed.
+    """
+
+    def __init__(
+        self,
+        max_pool_connections: Optional[int] = None,
+        expires_in_seconds: Optional[float] = None,
+        is_from_setting_if_none: bool = False,
+    ):
+        self.max_pool_connections = max_pool_connections
+        self.expires_in_seconds = expires_in_seconds
+
+        if is_from_setting_if_none:
+            if self.max_pool_connections is None:
+                self.max_pool_connections = STORAGE_S3_MAX_POOL_CONNECTIONS
+            if self.expires_in_seconds is None:
+                self.expires_in_seconds = STORAGE_SESSION_EXPIRES_IN_SECONDS
+
+        # storage ID -> (expiration time, row)
+        self._storage_minios: Dict[int, Tuple[float, StorageMinio]] = {}
+        # storage ID -> client
+        self._clients: Dict[int, _SharedClient] = {}
+
+    async def get_storage_minio(self, storage_id: int) -> StorageMinio:
+        now = time.monotonic()
+        cached = self._storage_minios.get(storage_id, None)
+        if cached is not None and (self.expires_in_seconds is None or cached[0] > now):
+            return cached[1]
+
+        storage_minio = await CrudStorageMinio.get_row_by_id(storage_id)
+        if storage_minio is None:
+            await self.invalidate(storage_id)
+            raise HTTPException(
+                status_code=404,
+                detail=f"Minio storage id: {storage_id} not found",
+            )
+
+        expiration = now
+        if self.expires_in_seconds is not None:
+            expiration += self.expires_in_seconds
+        self._storage_minios[storage_id] = (expiration, storage_minio)
+        return storage_minio
+
+    async def get_session(self, storage_id: int) -> SharedAsyncS3Session:
+        storage_minio = await self.get_storage_minio(storage_id)
+        return SharedAsyncS3Session(
+            self, storage_minio, max_pool_connections=self.max_pool_connections
+        )
+
+    async def _retire(self, shared_client: _SharedClient):
+        shared_client.is_retired = True
+        if shared_client.borrowers == 0:
+            await self._close_client(shared_client)
+
+    async def _close_client(self, shared_client: _SharedClient):
+        if shared_client.loop is _get_running_loop():
+            await shared_client.client.close()
+            return
+
+        coroutine = _close_stale_client(shared_client.client)
+        if shared_client.loop is not None and shared_client.loop.is_running():
+            # Its connections are bound to the event loop running in another thread.
+            asyncio.run_coroutine_threadsafe(coroutine, shared_client.loop)
+        else:
+            await coroutine
+
+    async def acquire_client(self, storage_id: int) -> _SharedClient:
+        storage_minio = await self.get_storage_minio(storage_id)
+        credentials = _get_credentials(storage_minio)
+        loop = _get_running_loop()
+
+        shared_client = self._clients.get(storage_id, None)
+        if shared_client is not None:
+            if shared_client.loop is loop and shared_client.credentials == credentials:
+                shared_client.borrowers += 1
+                return shared_client
+            del self._clients[storage_id]
+            await self._retire(shared_client)
+
+        session = AsyncS3Session(
+            aws_access_key_id=storage_minio.access_key,
+            aws_secret_access_key=storage_minio.secret_key,
+            endpoint_url=storage_minio.endpoint,
+            max_pool_connections=self.max_pool_connections,
+        )
+        client = await session.open()
+
+        # another coroutine may have created the client in the meantime
+        shared_client = self._clients.get(storage_id, None)
+        if (
+            shared_client is not None
+            and shared_client.loop is loop
+            and shared_client.credentials == credentials
+        ):
+            await client.close()
+        else:
+            if shared_client is not None:
+                await self._retire(shared_client)
+            shared_client = _SharedClient(loop, credentials, client)
+            self._clients[storage_id] = shared_client
+        shared_client.borrowers += 1
+        return shared_client
+
+    async def release_client(self, shared_client: _SharedClient):
+        shared_client.borrowers -= 1
+        if shared_client.is_retired and shared_client.borrowers == 0:
+            await self._close_client(shared_client)
+
+    async def invalidate(self, storage_id: int):
+        self._storage_minios.pop(storage_id, None)
+        shared_client = self._clients.pop(storage_id, None)
+        if shared_client is not None:
+            await self._retire(shared_client)
+
+    async def close(self):
+        self._storage_minios = {}
+        clients = self._clients
+        self._clients = {}
+        for shared_client in clients.values():
+            await self._retire(shared_client)
+
+
+async_s3_session_registry = AsyncS3SessionRegistry(is_from_setting_if_none=True)
 
 
 async def ping_storage(
@@ -32,19 +244,7 @@ async def get_storage_session_by_source(
     source: SourceBaseModel,
 ) -> AsyncS3Session:
     if source.protocol == SourceProtocolEnum.MINIO.value:
-        storage_id = source.storage_id
-        storage_minio = await CrudStorageMinio.get_row_by_id(storage_id)
-        if storage_minio is None:
-            raise HTTPException(
-                status_code=404,
-                detail=f"Minio storage id: {storage_id} not found",
-            )
-
-        return AsyncS3Session(
-            aws_access_key_id=storage_minio.access_key,
-            aws_secret_access_key=storage_minio.secret_key,
-            endpoint_url=storage_minio.endpoint,
-        )
+        return await async_s3_session_registry.get_session(source.storage_id)
 
 
 def get_app_storage_session(
@@ -2,8 +2,9 @@ import io
 import json
 from collections import deque
 from pathlib import Path
-from typing import AsyncIterator, Deque, List, Optional, Tuple
+from typing import AsyncIterator, Deque, List, Optional, Set, Tuple
 
+from aiobotocore.config import AioConfig
 from aiobotocore.httpsession import EndpointConnectionError
 from aiobotocore.session import AioSession, ClientCreatorContext
 
@@ -22,6 +23,7 @@ from back.model.storage import (
     StorageGalleries,
     StorageGallery,
     StorageGalleryCodeEnum,
+    StorageGallerySummary,
     StorageStat,
 )
 from back.settings import setting
@@ -36,6 +38,9 @@ STORAGE_S3_AWS_ACCESS_KEY_ID = setting.storage_s3_aws_access_key_id
 STORAGE_S3_AWS_SECRET_ACCESS_KEY = setting.storage_s3_aws_secret_access_key
 STORAGE_S3_ENDPOINT_URL = setting.storage_s3_endpoint_url
 
+DIR_FNAME = setting.gallery_dir_fname
+TAG_FNAME = setting.gallery_tag_fname
+
 
 def get_source(
     bucket_name: str,
@@ -154,6 +159,67 @@ async def iter_prefixes(
     yield None
 
 
+async def iter_gallery_summaries(
+    client,
+    bucket_name: str,
+    prefix: str,
+    depth: int,
+    tag_key: str,
+    internal_nodes: Optional[Set[str]] = None,
+) -> AsyncIterator[Tuple[str, StorageGallerySummary]]:
+    """
+    Summarize the galleries at `depth` under `prefix` with a single flat listing.
+
+    S3 returns the keys in lexicographical order, so the keys of a gallery are
+    contiguous and each summary is yielded as soon as the listing leaves its prefix.
+    If `internal_nodes` is given, the prefixes of the internal nodes containing files
+    are added to it.
+    """
+    if depth < 1:
+        raise ValueError("depth should be greater than 0.")
+
+    root = prefix or ""
+    if root.startswith("/"):
+        root = root[1:]
+    if len(root) > 0 and not root.endswith("/"):
+        root += "/"
+    root_length = len(root)
+
+    current_prefix = None
+    summary = None
+
+    paginator = client.get_paginator("list_objects_v2")
+    async for page in paginator.paginate(
+        Bucket=bucket_name, Prefix=root, Delimiter="", MaxKeys=1000
+    ):
+        _page = S3GetPaginatorResponse(**page)
+        for c in _page.Contents:
+            parts = c.Key[root_length:].split("/")
+            if len(parts) <= depth:
+                # `parts[-1]` is empty for the directory placeholders.
+                if internal_nodes is not None and parts[-1]:
+                    internal_nodes.add(root + "".join(f"{p}/" for p in parts[:-1]))
+                continue
+
+            gallery_prefix = root + "".join(f"{p}/" for p in parts[:depth])
+            if gallery_prefix != current_prefix:
+                if summary is not None:
+                    yield current_prefix, summary
+                current_prefix = gallery_prefix
+                summary = StorageGallerySummary()
+
+            name = "/".join(parts[depth:])
+            if name == tag_key:
+                summary.has_tag = True
+                summary.tag_etag = c.ETag
+                summary.tag_last_modified = c.LastModified
+            elif "/" not in name and is_browser_image(Path(name)):
+                summary.num_images += 1
+
+    if summary is not None:
+        yield current_prefix, summary
+
+
 async def exists(client, bucket_name: str, object_name: str) -> bool:
     try:
         await client.head_object(
@@ -298,6 +364,7 @@ class AsyncS3Session(AioSession, AsyncSession):
         aws_secret_access_key: str = None,
         endpoint_url: str = None,
         region_name: str = None,
+        max_pool_connections: int = None,
         is_from_setting_if_none: bool = False,
     ):
         super().__init__(session_vars, event_hooks, include_builtin_handlers, profile)
@@ -305,6 +372,7 @@ class AsyncS3Session(AioSession, AsyncSession):
         self.aws_secret_access_key = aws_secret_access_key
         self.endpoint_url = endpoint_url
         self.region_name = region_name
+        self.max_pool_connections = max_pool_connections
 
         if is_from_setting_if_none:
             if self.aws_access_key_id is None:
@@ -315,6 +383,9 @@ class AsyncS3Session(AioSession, AsyncSession):
                 self.endpoint_url = STORAGE_S3_ENDPOINT_URL
 
     def create_s3_client(self):
+        config = None
+        if self.max_pool_connections is not None:
+            config = AioConfig(max_pool_connections=self.max_pool_connections)
         return ClientCreatorContext(
             self._create_client(
                 "s3",
@@ -322,6 +393,7 @@ class AsyncS3Session(AioSession, AsyncSession):
                 aws_secret_access_key=self.aws_secret_access_key,
                 endpoint_url=self.endpoint_url,
                 region_name=self.region_name,
+                config=config,
             )
         )
 
@@ -415,6 +487,50 @@ class AsyncS3Session(AioSession, AsyncSession):
 
         raise ValueError("depth should be greater than 0.")
 
+    @session
+    async def are_galleries_by_flat_listing(
+        self, source: SourceBaseModel, depth: int
+    ) -> StorageGalleries:
+        s = StorageGalleries()
+        internal_nodes = set()
+        count_galleries = 0
+        total = 0
+
+        async for prefix, summary in iter_gallery_summaries(
+            self.client,
+            source.bucket_name,
+            source.object_name,
+            depth,
+            f"{DIR_FNAME}/{TAG_FNAME}",
+            internal_nodes=internal_nodes,
+        ):
+            total += 1
+            if summary.num_images > 0:
+                count_galleries += 1
+                continue
+            g_source = get_source(
+                source.bucket_name, prefix=prefix, protocol=source.protocol
+            )
+            g = StorageGallery(
+                path=g_source.path,
+                code=StorageGalleryCodeEnum.DOES_NOT_HAVE_IMAGES.value,
+            )
+            s.galleries.append(g)
+
+        for prefix in sorted(internal_nodes):
+            g_source = get_source(
+                source.bucket_name, prefix=prefix, protocol=source.protocol
+            )
+            g = StorageGallery(
+                path=g_source.path,
+                code=StorageGalleryCodeEnum.FILES_IN_THE_INTERNAL_NODES_OF_THE_STORAGE_PATH.value,
+            )
+            s.galleries.append(g)
+
+        if total != 0:
+            s.percentage = count_galleries / total
+        return s
+
     @session
     async def init(self):
         for bucket_name in BUCKET_NAMES:
@@ -435,9 +551,9 @@ class AsyncS3Session(AioSession, AsyncSession):
         return False
 
     @session
-    async def get_url(self, source: SourceBaseModel) -> str:
+    async def get_url(self, source: SourceBaseModel, expires_in: int = 3600) -> str:
         return await generate_presigned_url(
-            self.client, source.bucket_name, source.object_name
+            self.client, source.bucket_name, source.object_name, expires_in=expires_in
         )
 
     @session
@@ -559,6 +675,30 @@ class AsyncS3Session(AioSession, AsyncSession):
                 obj_source = SourceBaseModel(path=obj_path)
                 yield obj_source
 
+    async def iter_gallery_summaries(
+        self,
+        source: SourceBaseModel,
+        depth: int,
+        dir_fname: str = DIR_FNAME,
+        tag_fname: str = TAG_FNAME,
+    ) -> AsyncIterator[StorageGallerySummary]:
+        """
+        An alternative to `iter_directories` which also tells whether each gallery has
+        the tag file and how many images it has without any extra request.
+        """
+        check_session(self)
+        async for prefix, summary in iter_gallery_summaries(
+            self.client,
+            source.bucket_name,
+            source.object_name,
+            depth,
+            f"{dir_fname}/{tag_fname}",
+        ):
+            summary.path = (
+                f"{source.protocol}-{source.storage_id}://{source.bucket_name}/{prefix}"
+            )
+            yield summary
+
     @session
     async def exists(self, source: SourceBaseModel) -> bool:
         return await exists(self.client, source.bucket_name, source.object_name)
@@ -145,6 +145,55 @@ class Setting(BaseSettings):
         default=True,
         description="If this value is true, the number of gallery images will be updated when you go to the gallery page.",
     )
+    app_gallery_sync_concurrency: int = Field(
+        default=1,
+        ge=1,
+        description="The number of galleries synchronized from the storage to Elasticsearch at the same time.",
+    )
+    app_gallery_sync_flat_listing: bool = Field(
+        default=False,
+        description="If this value is true, the galleries will be discovered by a single flat listing of the storage instead of listing each directory, and the tag files and the pages will be read from that listing.",
+    )
+    app_gallery_sync_incremental: bool = Field(
+        default=False,
+        description="If this value is true, only the galleries whose tag files or images changed since the last synchronization will be synchronized. The manifest of each storage is kept in Redis and rebuilt by every full synchronization.",
+    )
+    app_gallery_image_cache_size: int = Field(
+        default=1024,
+        ge=0,
+        description="The number of galleries whose image filenames and image URLs are cached in the memory of each process. The cache is backed by Redis.",
+    )
+    app_gallery_image_cache_expires_in_seconds: int = Field(
+        default=3600,
+        ge=0,
+        description="The number of seconds for which the image filenames of a gallery are cached.",
+    )
+
+    app_progress_interval: float = Field(
+        default=0.5,
+        ge=0,
+        description="The minimum number of seconds between two updates of the progress of a task.",
+    )
+    app_progress_min_delta: float = Field(
+        default=0.1,
+        ge=0,
+        description="The minimum change in percentage points between two updates of the progress of a task.",
+    )
+    app_progress_expires_in_seconds: int = Field(
+        default=86400,
+        ge=0,
+        description="The number of seconds for which the progress of an Elasticsearch task is kept in Redis after its last update. 0 means it never expires.",
+    )
+    app_tag_autocomplete_expires_in_seconds: int = Field(
+        default=3600,
+        ge=0,
+        description="The number of seconds after which the autocomplete index of the tag tokens in the memory of each process is rebuilt in the background with the latest usage counts. The changes of the tags are applied immediately through Redis. 0 means it is never rebuilt.",
+    )
+    app_tag_autocomplete_cache_size: int = Field(
+        default=1024,
+        ge=0,
+        description="The number of prefixes whose autocompletions are cached in the memory of each process.",
+    )
 
     standalone_storage_protocol: Optional[SourceProtocolEnum] = None
     standalone_storage_id: Optional[int] = None
@@ -180,6 +229,104 @@ class Setting(BaseSettings):
     elastic_index_gallery: str = f"{ELASTIC_INDEX_PREFIX}-gallery"
     elastic_index_video: str = f"{ELASTIC_INDEX_PREFIX}-video"
     elastic_index_tag: str = f"{ELASTIC_INDEX_PREFIX}-tag"
+    elastic_maxsize: int = Field(
+        default=10,
+        ge=1,
+        description="The maximum number of connections to each Elasticsearch node in the connection pool shared by the application.",
+    )
+    elastic_timeout: float = Field(
+        default=10.0,
+        gt=0,
+        description="The timeout of the requests to Elasticsearch in seconds.",
+    )
+    elastic_mapping_expires_in_seconds: float = Field(
+        default=60.0,
+        ge=0,
+        description="The number of seconds for which the application caches the field names of an index. The cache is also cleared when the index is created or written by the application.",
+    )
+    elastic_pit_keep_alive: str = Field(
+        default="1m",
+        description="The keep alive of the point in time of the deep pages and the cursors.",
+        examples=["1m"],
+    )
+    elastic_checkpoint_expires_in_seconds: int = Field(
+        default=600,
+        ge=0,
+        description="The number of seconds for which the sort values of the deep pages of a query are cached in Redis.",
+    )
+    elastic_result_cache_expires_in_seconds: int = Field(
+        default=60,
+        ge=0,
+        description="The number of seconds for which the responses of the searches are cached in Redis. The cache of an index is also invalidated when the index is written by the application. 0 disables the cache.",
+    )
+    elastic_result_cache_max_bytes: int = Field(
+        default=1024 * 1024,
+        ge=0,
+        description="The maximum size in bytes of a cached response of a search.",
+    )
+    elastic_random_expires_in_seconds: int = Field(
+        default=600,
+        ge=0,
+        description="The number of seconds for which the shuffled IDs of a random browse are cached in Redis. The shuffled IDs are also discarded when the index is written by the application. 0 disables the cache.",
+    )
+    elastic_random_max_ids: int = Field(
+        default=1000000,
+        ge=0,
+        description="The maximum number of documents shuffled for a random browse. The larger random browses are scored by `random_score`.",
+    )
+    elastic_random_scroll_slices: int = Field(
+        default=2,
+        ge=1,
+        description="The number of slices of the scroll which collects the IDs of a random browse.",
+    )
+    elastic_bulk_concurrency: int = Field(
+        default=2,
+        ge=1,
+        description="The number of bulk requests sent concurrently by a bulk indexer.",
+    )
+    elastic_bulk_queue_size: int = Field(
+        default=4,
+        ge=1,
+        description="The number of batches waiting for the bulk requests. The producers of the documents wait while the queue is full.",
+    )
+    elastic_bulk_max_actions: int = Field(
+        default=500,
+        ge=1,
+        description="The maximum number of actions in a bulk request.",
+    )
+    elastic_bulk_max_bytes: int = Field(
+        default=10 * 1024 * 1024,
+        ge=1,
+        description="The maximum number of bytes of a bulk request. A larger action is sent alone.",
+    )
+    elastic_bulk_max_retries: int = Field(
+        default=3,
+        ge=0,
+        description="The number of retries of the actions rejected with 429 or 5xx.",
+    )
+    elastic_bulk_initial_backoff: float = Field(
+        default=1.0,
+        ge=0,
+        description="The number of seconds before the first retry of a bulk request. It is doubled for each retry.",
+    )
+    elastic_bulk_max_backoff: float = Field(
+        default=30.0,
+        ge=0,
+        description="The maximum number of seconds before a retry of a bulk request.",
+    )
+    elastic_bulk_disable_refresh: bool = Field(
+        default=False,
+        description="Disable the refresh of the index during a full synchronization of the galleries or the videos, the loading of a backup and the bulk import of the tags. The index is refreshed once at the end.",
+    )
+    elastic_tag_update_by_query: bool = Field(
+        default=True,
+        description="Remove the ID of a deleted tag from the other tags by an `update_by_query` task of Elasticsearch in the background, instead of reindexing them through the application.",
+    )
+    elastic_update_by_query_slices: int = Field(
+        default=0,
+        ge=0,
+        description="The number of slices of an `update_by_query` task. 0 lets Elasticsearch choose it.",
+    )
     elasticsearch_port: Optional[int] = Field(
         default=None,
         description="Environment variable for docker-compose.",
@@ -200,6 +347,11 @@ class Setting(BaseSettings):
 
     storage_protocol: SourceProtocolEnum = SourceProtocolEnum.MINIO.value
     storage_expires_in_minutes: int = 7 * 24 * 60
+    storage_session_expires_in_seconds: float = Field(
+        default=300.0,
+        ge=0,
+        description="The number of seconds for which the application caches the settings of a storage. The cache is also cleared when the storage is updated or deleted.",
+    )
 
     storage_cache: str = Field(
         default="zetsubou", description="ZetsuBou S3 storage bucket name."
@@ -242,6 +394,11 @@ class Setting(BaseSettings):
         description="Environment variable for docker-compose.",
         examples=["9001"],
     )
+    storage_s3_max_pool_connections: int = Field(
+        default=10,
+        ge=1,
+        description="The maximum number of connections in the pool of the S3 client kept by the application for each storage.",
+    )
 
     airflow_host: Optional[str] = Field(
         default=None, examples=["http://localhost:8080"]
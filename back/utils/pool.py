@@ -0,0 +1,66 @@
+import asyncio
+from typing import Any, AsyncIterable, Awaitable, Callable, Iterable, TypeVar, Union
+
+_T = TypeVar("_T")
+
+_STOP = object()
+
+
+async def run_in_pool(
+    iterable: Union[Iterable[_T], AsyncIterable[_T]],
+    func: Callable[[_T], Awaitable[Any]],
+    concurrency: int = 1,
+    queue_size: int = None,
+):
+    """
+    Call `func` on every item of `iterable` with at most `concurrency` calls in flight.
+
+    The iterable is consumed by a single producer, so wrappers like `Progress` are
+    advanced in order. The queue between the producer and the workers is bounded to keep
+    the memory usage flat. If any call raises, the remaining workers are cancelled and
+    the exception is re-raised.
+    """
+
+    if concurrency < 1:
+        raise ValueError("concurrency should be greater than 0.")
+
+    if concurrency == 1:
+        if hasattr(iterable, "__aiter__"):
+            async for item in iterable:
+                await func(item)
+        else:
+            for item in iterable:
+                await func(item)
+        return
+
+    if queue_size is None:
+        queue_size = concurrency * 2
+    queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    async def worker():
+        while True:
+            item = await queue.get()
+            if item is _STOP:
+                return
+            await func(item)
+
+    async def producer():
+        if hasattr(iterable, "__aiter__"):
+            async for item in iterable:
+                await queue.put(item)
+        else:
+            for item in iterable:
+                await queue.put(item)
+        for _ in range(concurrency):
+            await queue.put(_STOP)
+
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    producer_task = asyncio.create_task(producer())
+    tasks = workers + [producer_task]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
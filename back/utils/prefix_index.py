@@ -0,0 +1,93 @@
+import heapq
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+# No code point is greater, so every key starting with a prefix sorts before the prefix
+# followed by it.
+MAX_CHARACTER = "\U0010ffff"
+
+
+class PrefixIndex:
+    """
+    Find the IDs whose keys start with a prefix in a sorted array of `(key, id)`.
+
+    The keys starting with a prefix are one contiguous range of the array, which is
+    found by two `bisect`. The IDs in the range are ranked by their scores in descending
+    order, then by their keys and IDs. The results of the recent prefixes are cached
+    until the index is changed.
+    """
+
+    def __init__(self, cache_size: int = 1024):
+        self.cache_size = cache_size
+
+        self._entries: List[Tuple[str, int]] = []
+        self._keys: Dict[int, str] = {}
+        self._scores: Dict[int, int] = {}
+        self._cache: "OrderedDict[Tuple[str, int], List[int]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, id: int) -> bool:
+        return id in self._keys
+
+    def build(self, keys: Dict[int, str], scores: Optional[Dict[int, int]] = None):
+        self._keys = dict(keys)
+        self._entries = sorted((key, id) for id, key in self._keys.items())
+        self._scores = {} if scores is None else dict(scores)
+        self._cache.clear()
+
+    def set(self, id: int, key: str, score: int = 0):
+        self.delete(id)
+        insort(self._entries, (key, id))
+        self._keys[id] = key
+        self._scores[id] = score
+        self._cache.clear()
+
+    def delete(self, id: int):
+        key = self._keys.pop(id, None)
+        if key is None:
+            return
+        i = bisect_left(self._entries, (key, id))
+        del self._entries[i]
+        self._scores.pop(id, None)
+        self._cache.clear()
+
+    def _get_rank(self, id: int) -> Tuple[int, str, int]:
+        return -self._scores.get(id, 0), self._keys[id], id
+
+    def search(
+        self, prefix: str, size: int, allowed_ids: Optional[Set[int]] = None
+    ) -> List[int]:
+        """Get the top `size` IDs whose keys start with `prefix`. Only the IDs in
+        `allowed_ids` are returned if it is given, and such results are not cached.
+        """
+
+        cache_key = (prefix, size)
+        if allowed_ids is None:
+            ids = self._cache.get(cache_key, None)
+            if ids is not None:
+                self._cache.move_to_end(cache_key)
+                return list(ids)
+
+        lo = bisect_left(self._entries, (prefix,))
+        hi = bisect_left(self._entries, (prefix + MAX_CHARACTER,), lo)
+        if allowed_ids is None:
+            candidates = (id for _, id in self._entries[lo:hi])
+        elif len(allowed_ids) < hi - lo:
+            candidates = (
+                id
+                for id in allowed_ids
+                if id in self._keys and self._keys[id].startswith(prefix)
+            )
+        else:
+            candidates = (id for _, id in self._entries[lo:hi] if id in allowed_ids)
+        ids = heapq.nsmallest(size, candidates, key=self._get_rank)
+
+        if allowed_ids is None and self.cache_size > 0:
+            self._cache[cache_key] = ids
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return list(ids)
+        return ids
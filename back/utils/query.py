@@ -0,0 +1,163 @@
+import json
+from typing import Any, Dict, Iterable, List, Optional
+
+from back.model.elasticsearch import (
+    ElasticsearchAnalyzerEnum,
+    ElasticsearchQueryBooleanEnum,
+)
+
+
+def _get_key(clause: dict) -> str:
+    return json.dumps(clause, sort_keys=True, separators=(",", ":"))
+
+
+def get_ngram_query(
+    keywords: str,
+    fields: List[str],
+    boolean: ElasticsearchQueryBooleanEnum = ElasticsearchQueryBooleanEnum.SHOULD,
+) -> dict:
+    """Match the characters of the keywords with the n-gram subfields in one clause.
+
+    The n-gram analyzer splits the keywords into single characters, so a `cross_fields`
+    query requires all the characters with `must` or any of them with `should`, and each
+    character may be found in any of the fields. The hits with the keywords as
+    contiguous characters are boosted by the `phrase` query.
+    """
+
+    if type(boolean) is not str:
+        boolean = boolean.value
+    operator = "and" if boolean == ElasticsearchQueryBooleanEnum.MUST.value else "or"
+
+    return {
+        "bool": {
+            "must": [
+                {
+                    "multi_match": {
+                        "query": keywords,
+                        "type": "cross_fields",
+                        "operator": operator,
+                        "fields": fields,
+                    }
+                }
+            ],
+            "should": [
+                {
+                    "multi_match": {
+                        "query": keywords,
+                        "type": "phrase",
+                        "fields": fields,
+                    }
+                }
+            ],
+        }
+    }
+
+
+class QueryCompiler:
+    """
+    Compile the parameters of a search into the `bool` query of a DSL.
+
+    The keywords score in `bool.must` or `bool.should`. The constraints which do not
+    score go to `bool.filter` as `term` queries on the keyword fields and `range`
+    queries, so that Elasticsearch caches them. The clauses are deduplicated and sorted,
+    so the same parameters always compile into the same DSL.
+    """
+
+    def __init__(self):
+        self._scores: Dict[str, Dict[str, dict]] = {
+            ElasticsearchQueryBooleanEnum.MUST.value: {},
+            ElasticsearchQueryBooleanEnum.SHOULD.value: {},
+        }
+        self._filters: Dict[str, dict] = {}
+        self._ranges: Dict[str, Dict[str, Any]] = {}
+
+    def _add_score(self, clause: dict, boolean: ElasticsearchQueryBooleanEnum):
+        if type(boolean) is not str:
+            boolean = boolean.value
+        self._scores[boolean][_get_key(clause)] = clause
+
+    def add_multi_match(
+        self,
+        keywords: Iterable[str],
+        fields: List[str],
+        fuzziness: int = 0,
+        boolean: ElasticsearchQueryBooleanEnum = ElasticsearchQueryBooleanEnum.SHOULD,
+    ):
+        for keyword in keywords:
+            self._add_score(
+                {
+                    "constant_score": {
+                        "filter": {
+                            "multi_match": {
+                                "query": keyword,
+                                "fuzziness": fuzziness,
+                                "fields": fields,
+                            }
+                        }
+                    }
+                },
+                boolean,
+            )
+
+    def add_text(
+        self,
+        keywords: str,
+        field_name: str,
+        analyzer: ElasticsearchAnalyzerEnum,
+        fuzziness: int = 0,
+        boolean: ElasticsearchQueryBooleanEnum = ElasticsearchQueryBooleanEnum.SHOULD,
+    ):
+        """Match the keywords with the subfield of the field analyzed by `analyzer`.
+        The n-gram subfield is matched by one `get_ngram_query` without the fuzziness,
+        since one edit of a single character matches every character.
+        """
+
+        if type(analyzer) is not str:
+            analyzer = analyzer.value
+
+        fields = [f"{field_name}.{analyzer}"]
+        if analyzer == ElasticsearchAnalyzerEnum.NGRAM.value:
+            _keywords = keywords.replace(" ", "")
+            if _keywords:
+                self._add_score(get_ngram_query(_keywords, fields, boolean), boolean)
+            return
+
+        self.add_multi_match(
+            keywords.split(), fields, fuzziness=fuzziness, boolean=boolean
+        )
+
+    def add_term(self, field_name: str, value: Any):
+        clause = {"term": {field_name: value}}
+        self._filters[_get_key(clause)] = clause
+
+    def add_terms(self, field_name: str, values: Iterable[Any]):
+        """All the values are required. Each value is a `term` filter, which is cached
+        by Elasticsearch on its own and reused by the other combinations of the values.
+        """
+
+        for value in values:
+            self.add_term(field_name, value)
+
+    def add_range(
+        self, field_name: str, gte: Optional[Any] = None, lte: Optional[Any] = None
+    ):
+        bounds = self._ranges.setdefault(field_name, {})
+        if gte is not None:
+            bounds["gte"] = gte
+        if lte is not None:
+            bounds["lte"] = lte
+
+    def compile(self) -> dict:
+        filters = dict(self._filters)
+        for field_name, bounds in self._ranges.items():
+            if not bounds:
+                continue
+            clause = {"range": {field_name: bounds}}
+            filters[_get_key(clause)] = clause
+
+        query = {
+            boolean: [clause for _, clause in sorted(clauses.items())]
+            for boolean, clauses in self._scores.items()
+        }
+        query["filter"] = [clause for _, clause in sorted(filters.items())]
+        return {"bool": query}
@@ -4,10 +4,11 @@ from pathlib import Path
 from typing import List, Union
 
 import typer
-from elasticsearch.helpers import async_bulk, async_scan
+from elasticsearch.helpers import async_scan
 from sqlalchemy.orm.decl_api import DeclarativeMeta
 from tqdm import tqdm
 
+from back.crud.async_bulk import AsyncBulkIndexer
 from back.db.crud.base import (
     flatten_dependent_tables,
     get_all_rows_order_by_id,
@@ -179,22 +180,21 @@ async def load(
             await _load_table(table_name, table_instance, rows)
 
         await init_indices()
-        size = 1000
         for index in tqdm(indices):
             index_source = get_elasticsearch_index_source(date, index)
             rows = await storage_session.get_json(index_source)
+            if rows is None:
+                continue
 
-            i = 0
-            batch = rows[i * size : (i + 1) * size]
-            while batch:
-                actions = [
+            async with AsyncBulkIndexer(
+                async_elasticsearch,
+                refresh_indices=[index],
+                is_from_setting_if_none=True,
+            ) as bulk_indexer:
+                await bulk_indexer.add_many(
                     {"_index": index, "_id": source["id"], "_source": source}
-                    for source in batch
-                ]
-                await async_bulk(async_elasticsearch, actions)
-
-                i += 1
-                batch = rows[i * size : (i + 1) * size]
+                    for source in rows
+                )
 
 
 @app.command(
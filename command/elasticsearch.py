@@ -4,7 +4,7 @@ import typer
 from elasticsearch.helpers import async_reindex
 from rich import print_json
 
-from back.crud.async_elasticsearch import CrudAsyncElasticsearchBase
+from back.crud.async_elasticsearch import CrudAsyncElasticsearchBase, invalidate_index
 from back.init.async_elasticsearch import (
     create_gallery,
     create_tag,
@@ -64,6 +64,7 @@ async def delete(index: str = typer.Argument(..., help="Index name.")):
         return
     if await async_elasticsearch.indices.exists(index=index):
         await async_elasticsearch.indices.delete(index=index, ignore=[400, 404])
+    await invalidate_index(index)
 
     await async_elasticsearch.close()
 
@@ -103,6 +104,7 @@ async def reset():
     for index in indices.keys():
         if await async_elasticsearch.indices.exists(index=index):
             await async_elasticsearch.indices.delete(index=index, ignore=[400, 404])
+        await invalidate_index(index)
     await init_indices(sesion=async_elasticsearch)
     await async_elasticsearch.close()
 
@@ -132,6 +134,7 @@ async def reindex(
         target_index=target_index,
         query=query,
     )
+    await invalidate_index(target_index)
 
     await async_elasticsearch.close()
 
@@ -25,6 +25,9 @@ so on).
 app = ZetsuBouTyper(name="sync", help=_help)
 
 ELASTICSEARCH_URLS = setting.elastic_urls
+APP_GALLERY_SYNC_CONCURRENCY = setting.app_gallery_sync_concurrency
+APP_GALLERY_SYNC_FLAT_LISTING = setting.app_gallery_sync_flat_listing
+APP_GALLERY_SYNC_INCREMENTAL = setting.app_gallery_sync_incremental
 
 
 @app.command(
@@ -34,10 +37,14 @@ ELASTICSEARCH_URLS = setting.elastic_urls
 async def are_galleries(
     protocol: SourceProtocolEnum = typer.Argument(..., help="Storage protocol."),
     storage_id: int = typer.Argument(..., help="Storage ID."),
+    flat_listing: bool = typer.Option(
+        default=APP_GALLERY_SYNC_FLAT_LISTING,
+        help="Discover the galleries by a single flat listing of the storage.",
+    ),
 ):
     ti = time.time()
 
-    crud = await get_crud_sync(protocol, storage_id)
+    crud = await get_crud_sync(protocol, storage_id, flat_listing=flat_listing)
     results = await crud.are_galleries()
     print(results.model_dump_json(indent=4))
 
@@ -68,6 +75,19 @@ async def _storage(
         default=True, help="Send progress information to Redis."
     ),
     target_index: str = typer.Option(default=None, help="Target Elasticsearch index."),
+    concurrency: int = typer.Option(
+        default=APP_GALLERY_SYNC_CONCURRENCY,
+        min=1,
+        help="The number of galleries synchronized at the same time.",
+    ),
+    flat_listing: bool = typer.Option(
+        default=APP_GALLERY_SYNC_FLAT_LISTING,
+        help="Discover the galleries by a single flat listing of the storage.",
+    ),
+    incremental: bool = typer.Option(
+        default=APP_GALLERY_SYNC_INCREMENTAL,
+        help="Only synchronize the galleries changed since the last synchronization. A full synchronization rebuilds the manifest.",
+    ),
 ):
     """
     Synchronize the storage with protocol and storage ID.
@@ -87,6 +107,9 @@ async def _storage(
         force=force,
         is_progress=progress,
         target_index=target_index,
+        concurrency=concurrency,
+        flat_listing=flat_listing,
+        incremental=incremental,
     )
     async with crud as c:
         await c.sync()
@@ -111,6 +134,19 @@ async def _storages(
     progress: bool = typer.Option(
         True, "-p/", "--progress/", help="Send progress information to Redis."
     ),
+    concurrency: int = typer.Option(
+        default=APP_GALLERY_SYNC_CONCURRENCY,
+        min=1,
+        help="The number of galleries synchronized at the same time.",
+    ),
+    flat_listing: bool = typer.Option(
+        default=APP_GALLERY_SYNC_FLAT_LISTING,
+        help="Discover the galleries by a single flat listing of the storage.",
+    ),
+    incremental: bool = typer.Option(
+        default=APP_GALLERY_SYNC_INCREMENTAL,
+        help="Only synchronize the galleries changed since the last synchronization. A full synchronization rebuilds the manifest.",
+    ),
 ):
     """
     Synchronize all storages.
@@ -151,6 +187,9 @@ async def _storages(
             progress_final=final,
             force=force,
             is_progress=progress,
+            concurrency=concurrency,
+            flat_listing=flat_listing,
+            incremental=incremental,
         )
         async with crud as c:
             await crud.sync()
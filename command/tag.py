@@ -6,6 +6,7 @@ import typer
 from tqdm import tqdm
 
 from back.crud.async_tag import CrudTag
+from back.crud.async_tag_import import BATCH_SIZE, TagImporter
 from back.db.crud import CrudTagAttribute, CrudTagToken
 from back.db.model import TagAttributeCreate, TagTokenCreate
 from back.model.tag import TagInsert
@@ -86,6 +87,21 @@ async def dump(
 async def load(
     attr: str = typer.Argument(..., help="The JSON file of the attributes."),
     tag: str = typer.Argument(..., help="The JSON file of the tags."),
+    bulk: bool = typer.Option(
+        default=False,
+        help="Insert the rows in batches and index the tags by bulk requests.",
+    ),
+    batch_size: int = typer.Option(
+        default=BATCH_SIZE, help="The number of the tags of a batch in bulk mode."
+    ),
+    checkpoint: str = typer.Option(
+        default=None,
+        help=(
+            "The JSON file of the progress in bulk mode, "
+            "which resumes a failed import. "
+            "Default: the JSON file of the tags with the suffix `.checkpoint`."
+        ),
+    ),
 ):
     """
     Load the tag into JSON file.
@@ -143,6 +159,27 @@ async def load(
     if not tag.exists():
         return
 
+    if bulk:
+        if checkpoint is None:
+            checkpoint = tag.with_name(f"{tag.name}.checkpoint")
+        checkpoint = Path(checkpoint)
+        if not checkpoint.exists() and not await is_ok():
+            print("TagToken table is not empty.")
+            return
+
+        importer = TagImporter(batch_size=batch_size, checkpoint=checkpoint)
+        try:
+            await importer.run(load_json(attr), load_json(tag))
+        finally:
+            for statistic in importer.statistics:
+                print(
+                    f"{statistic.phase}: {statistic.count} rows in "
+                    f"{statistic.seconds:.2f} seconds "
+                    f"({statistic.throughput:.1f} rows/s)"
+                )
+        checkpoint.unlink()
+        return
+
     ok = await is_ok()
     if not ok:
         print("TagToken table is not empty.")
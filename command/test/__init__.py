@@ -9,6 +9,7 @@ from back.utils.gen.gallery import (
 from back.utils.gen.tag import generate_tag_attributes, generate_tags
 from back.utils.keyword import KeywordParser
 from command.logging import logger
+from command.test.benchmark import app as benchmark
 from command.test.gallery import app as gallery
 from command.test.route import app as route
 from command.test.service import app as service
@@ -21,6 +22,7 @@ Test the functions or services.
 """
 app = ZetsuBouTyper(name="test", help=_help)
 
+app.add_typer(benchmark)
 app.add_typer(gallery)
 app.add_typer(route)
 app.add_typer(service)
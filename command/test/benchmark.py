@@ -0,0 +1,528 @@
+import json
+import resource
+import statistics
+import time
+from typing import Dict, List, Optional, Set, Tuple
+from unittest.mock import AsyncMock, patch
+from uuid import uuid4
+
+import typer
+from pydantic import BaseModel
+from rich import print_json
+
+from back.crud.async_bulk import AsyncBulkIndexer
+from back.crud.async_gallery import CrudAsyncGallerySync
+from back.init.async_elasticsearch import settings as elasticsearch_settings
+from back.init.async_elasticsearch import text_fields
+from back.model.base import SourceBaseModel, SourceProtocolEnum
+from back.model.elasticsearch import (
+    ElasticsearchAnalyzerEnum,
+    ElasticsearchQueryBooleanEnum,
+)
+from back.session.async_elasticsearch import get_async_elasticsearch
+from back.settings import setting
+from back.utils.query import QueryCompiler, get_ngram_query
+from lib.faker import ZetsuBouFaker
+from lib.faker.elasticsearch import FakeAsyncElasticsearch
+from lib.faker.s3 import FakeAsyncS3Session, FakeS3Client
+from lib.typer import ZetsuBouTyper
+
+DIR_FNAME = setting.gallery_dir_fname
+TAG_FNAME = setting.gallery_tag_fname
+ELASTIC_INDEX_GALLERY = setting.elastic_index_gallery
+
+BUCKET_NAME = "benchmark"
+PREFIX = "galleries"
+STORAGE_ID = 1
+INDEX = "benchmark-gallery"
+NGRAM_INDEX = "benchmark-ngram"
+
+_help = """
+Benchmark the hot paths.
+"""
+app = ZetsuBouTyper(name="benchmark", help=_help)
+
+
+class GallerySyncBenchmark(BaseModel):
+    name: str
+    galleries: int
+    seconds: float
+    galleries_per_second: float
+    s3_requests: Dict[str, int]
+    s3_requests_per_gallery: float
+    elasticsearch_requests: Dict[str, int]
+    elasticsearch_bulk_requests: int
+    peak_rss_mb: float
+
+
+def get_peak_rss_mb() -> float:
+    # `ru_maxrss` is in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def generate_fake_galleries(
+    client: FakeS3Client,
+    num_galleries: int,
+    num_images: int,
+    with_tag: bool = True,
+    faker: ZetsuBouFaker = None,
+) -> SourceBaseModel:
+    """Generate the galleries with the tag files from `lib.faker` and empty images.
+    Return the root source of the storage.
+    """
+
+    if faker is None:
+        faker = ZetsuBouFaker()
+
+    protocol = f"{SourceProtocolEnum.MINIO.value}-{STORAGE_ID}"
+    padding = len(str(num_galleries))
+    client.add_bucket(BUCKET_NAME)
+    for i in range(num_galleries):
+        gallery_prefix = f"{PREFIX}/{i:0{padding}d}/"
+        for page in range(1, num_images + 1):
+            client.add_object(BUCKET_NAME, f"{gallery_prefix}{page}.jpg")
+
+        if with_tag:
+            gallery = faker.random_minimum_gallery()
+            gallery.id = str(uuid4())
+            gallery.path = f"{protocol}://{BUCKET_NAME}/{gallery_prefix}"
+            gallery.attributes.pages = num_images
+            tag = json.dumps(gallery.model_dump(), indent=4, ensure_ascii=False)
+            client.add_object(
+                BUCKET_NAME,
+                f"{gallery_prefix}{DIR_FNAME}/{TAG_FNAME}",
+                tag.encode("utf-8"),
+            )
+
+    return SourceBaseModel(path=f"{protocol}://{BUCKET_NAME}/{PREFIX}/")
+
+
+async def run_gallery_sync(
+    name: str,
+    client: FakeS3Client,
+    async_elasticsearch: FakeAsyncElasticsearch,
+    root_source: SourceBaseModel,
+    num_galleries: int,
+    concurrency: int = 1,
+    batch_size: int = 1000,
+    flat_listing: bool = False,
+    sync_pages: bool = False,
+) -> GallerySyncBenchmark:
+    client.requests.clear()
+    async_elasticsearch.requests.clear()
+
+    crud = CrudAsyncGallerySync(
+        FakeAsyncS3Session(client),
+        SourceProtocolEnum.MINIO.value,
+        STORAGE_ID,
+        root_source,
+        1,
+        async_elasticsearch=async_elasticsearch,
+        index=INDEX,
+        batch_size=batch_size,
+        force=True,
+        dir_fname=DIR_FNAME,
+        tag_fname=TAG_FNAME,
+        sync_pages=sync_pages,
+        concurrency=concurrency,
+        flat_listing=flat_listing,
+        is_progress=False,
+    )
+
+    # the stand-ins are always available
+    with patch(
+        "back.crud.async_gallery.ping_elasticsearch", AsyncMock(return_value=True)
+    ), patch("back.crud.async_gallery.ping_storage", AsyncMock(return_value=True)):
+        start = time.perf_counter()
+        async with crud:
+            await crud.sync()
+        seconds = time.perf_counter() - start
+
+    s3_requests = dict(client.requests)
+    elasticsearch_requests = dict(async_elasticsearch.requests)
+    return GallerySyncBenchmark(
+        name=name,
+        galleries=num_galleries,
+        seconds=seconds,
+        galleries_per_second=num_galleries / seconds if seconds > 0 else 0.0,
+        s3_requests=s3_requests,
+        s3_requests_per_gallery=sum(s3_requests.values()) / max(num_galleries, 1),
+        elasticsearch_requests=elasticsearch_requests,
+        elasticsearch_bulk_requests=elasticsearch_requests.get("bulk", 0),
+        peak_rss_mb=get_peak_rss_mb(),
+    )
+
+
+async def benchmark_gallery_sync(
+    num_galleries: int,
+    num_images: int = 10,
+    concurrency: int = 1,
+    batch_size: int = 1000,
+    flat_listing: bool = False,
+    sync_pages: bool = False,
+) -> List[GallerySyncBenchmark]:
+    """Run a full synchronization into an empty index and then a synchronization which
+    has nothing to change.
+    """
+
+    client = FakeS3Client()
+    async_elasticsearch = FakeAsyncElasticsearch()
+    root_source = generate_fake_galleries(client, num_galleries, num_images)
+
+    kwargs = {
+        "num_galleries": num_galleries,
+        "concurrency": concurrency,
+        "batch_size": batch_size,
+        "flat_listing": flat_listing,
+        "sync_pages": sync_pages,
+    }
+    results = [
+        await run_gallery_sync(
+            "full", client, async_elasticsearch, root_source, **kwargs
+        ),
+        await run_gallery_sync(
+            "no-op", client, async_elasticsearch, root_source, **kwargs
+        ),
+    ]
+    return results
+
+
+@app.command(name="gallery-sync")
+async def _benchmark_gallery_sync(
+    num_galleries: int = typer.Option(
+        default=1000, help="Number of the generated galleries."
+    ),
+    num_images: int = typer.Option(default=10, help="Number of images per gallery."),
+    concurrency: int = typer.Option(
+        default=1, help="Number of galleries synchronized at the same time."
+    ),
+    batch_size: int = typer.Option(
+        default=1000, help="Number of documents in a bulk request."
+    ),
+    flat_listing: bool = typer.Option(
+        default=False, help="Discover the galleries by a single flat listing."
+    ),
+    sync_pages: bool = typer.Option(
+        default=False, help="Count the images of the galleries."
+    ),
+):
+    """
+    Benchmark the gallery synchronization.
+    """
+
+    results = await benchmark_gallery_sync(
+        num_galleries,
+        num_images=num_images,
+        concurrency=concurrency,
+        batch_size=batch_size,
+        flat_listing=flat_listing,
+        sync_pages=sync_pages,
+    )
+    print_json(data=[result.model_dump() for result in results])
+
+
+class AdvancedSearchBenchmark(BaseModel):
+    name: str
+    requests: int
+    total: int
+    mean_seconds: float
+    p95_seconds: float
+    mean_took_ms: float
+
+
+def get_scoring_query(query: dict) -> dict:
+    """Move the filters of a compiled query back into `bool.must` as the scoring
+    clauses which the advanced search used before the query compiler.
+    """
+
+    query = json.loads(json.dumps(query))
+    must = query["bool"]["must"]
+    for clause in query["bool"].pop("filter", []):
+        if "term" not in clause:
+            must.append(clause)
+            continue
+        field_name, value = next(iter(clause["term"].items()))
+        if field_name.endswith(".keyword"):
+            field_name = field_name[: -len(".keyword")]
+        must.append(
+            {
+                "constant_score": {
+                    "filter": {
+                        "multi_match": {
+                            "query": value,
+                            "fields": [field_name],
+                        }
+                    }
+                }
+            }
+        )
+    return query
+
+
+async def benchmark_advanced_search(
+    query: dict,
+    index: str = ELASTIC_INDEX_GALLERY,
+    size: int = 40,
+    repeat: int = 20,
+) -> List[AdvancedSearchBenchmark]:
+    """Send the compiled query and its scoring version alternately to Elasticsearch."""
+
+    queries = {"filter": query, "scoring": get_scoring_query(query)}
+    seconds = {name: [] for name in queries.keys()}
+    tooks = {name: [] for name in queries.keys()}
+    totals = {}
+
+    async_elasticsearch = get_async_elasticsearch()
+    try:
+        for _ in range(repeat):
+            for name, q in queries.items():
+                start = time.perf_counter()
+                resp = await async_elasticsearch.search(
+                    index=index,
+                    query=q,
+                    size=size,
+                    sort=["_score", {"last_updated": {"order": "desc"}}],
+                    track_total_hits=True,
+                )
+                seconds[name].append(time.perf_counter() - start)
+                tooks[name].append(resp["took"])
+                totals[name] = resp["hits"]["total"]["value"]
+    finally:
+        await async_elasticsearch.close()
+
+    return [
+        AdvancedSearchBenchmark(
+            name=name,
+            requests=repeat,
+            total=totals.get(name, 0),
+            mean_seconds=statistics.mean(seconds[name]),
+            p95_seconds=sorted(seconds[name])[int(0.95 * (repeat - 1))],
+            mean_took_ms=statistics.mean(tooks[name]),
+        )
+        for name in queries.keys()
+    ]
+
+
+@app.command(name="advanced-search")
+async def _benchmark_advanced_search(
+    index: str = typer.Option(default=ELASTIC_INDEX_GALLERY, help="Index name."),
+    keywords: Optional[str] = typer.Option(default=None, help="Keywords."),
+    category: Optional[str] = typer.Option(default=None, help="Category."),
+    uploader: Optional[str] = typer.Option(default=None, help="Uploader."),
+    rating_gte: Optional[int] = typer.Option(default=None, help="Minimum rating."),
+    label: List[str] = typer.Option(default=[], help="Label."),
+    tag: List[str] = typer.Option(default=[], help="Tag, e.g. `artist=ZetsuBouKyo`."),
+    size: int = typer.Option(default=40, help="Number of hits per request."),
+    repeat: int = typer.Option(default=20, help="Number of requests per query."),
+):
+    """
+    Benchmark the advanced search compiled with the filter context against the
+    scoring clauses on a running Elasticsearch.
+    """
+
+    compiler = QueryCompiler()
+    if keywords is not None:
+        compiler.add_multi_match(keywords.split(), ["name.default", "raw_name.default"])
+    if category is not None:
+        compiler.add_term("attributes.category.keyword", category)
+    if uploader is not None:
+        compiler.add_term("attributes.uploader.keyword", uploader)
+    compiler.add_range("attributes.rating", gte=rating_gte)
+    compiler.add_terms("labels.keyword", label)
+    for t in tag:
+        tag_field, _, tag_value = t.partition("=")
+        compiler.add_term(f"tags.{tag_field}.keyword", tag_value)
+
+    results = await benchmark_advanced_search(
+        compiler.compile(), index=index, size=size, repeat=repeat
+    )
+    print_json(data=[result.model_dump() for result in results])
+
+
+class NgramSearchBenchmark(BaseModel):
+    name: str
+    boolean: str
+    queries: int
+    mean_clauses: float
+    mean_seconds: float
+    p95_seconds: float
+    mean_took_ms: float
+    recall: float
+    precision: float
+
+
+def get_per_character_query(
+    keywords: str,
+    fields: List[str],
+    boolean: ElasticsearchQueryBooleanEnum = ElasticsearchQueryBooleanEnum.SHOULD,
+) -> dict:
+    """The n-gram query with one clause per character which was used before
+    `get_ngram_query`.
+    """
+
+    if type(boolean) is not str:
+        boolean = boolean.value
+    return {
+        "bool": {
+            boolean: [
+                {
+                    "constant_score": {
+                        "filter": {
+                            "multi_match": {
+                                "query": keyword,
+                                "fuzziness": 0,
+                                "fields": fields,
+                            }
+                        }
+                    }
+                }
+                for keyword in keywords
+            ]
+        }
+    }
+
+
+def count_clauses(query: dict) -> int:
+    return json.dumps(query).count('"multi_match"')
+
+
+def get_recall_and_precision(
+    ids: List[str], relevant_ids: Set[str], size: int
+) -> Tuple[float, float]:
+    """The recall is the fraction of the relevant documents in the hits, at most `size`
+    of which can be found. The precision is the fraction of the hits which are
+    relevant.
+    """
+
+    found = len([id for id in ids if id in relevant_ids])
+    recall = found / max(min(len(relevant_ids), size), 1)
+    precision = found / len(ids) if ids else 0.0
+    return recall, precision
+
+
+def generate_cjk_queries(
+    names: Dict[str, str],
+    num_queries: int,
+    min_length: int = 2,
+    max_length: int = 6,
+    faker: ZetsuBouFaker = None,
+) -> List[Tuple[str, Set[str]]]:
+    """Cut the keywords out of the names. The relevant documents of the keywords are
+    the ones whose names contain the keywords.
+    """
+
+    if faker is None:
+        faker = ZetsuBouFaker()
+
+    queries = []
+    ids = list(names.keys())
+    for _ in range(num_queries):
+        name = names[faker.random_element(ids)]
+        length = faker.random_int(min=min_length, max=min(max_length, len(name)))
+        start = faker.random_int(min=0, max=len(name) - length)
+        keywords = name[start : start + length]
+        relevant_ids = {id for id, n in names.items() if keywords in n}
+        queries.append((keywords, relevant_ids))
+    return queries
+
+
+async def benchmark_ngram_search(
+    num_docs: int = 10000,
+    num_queries: int = 100,
+    size: int = 40,
+    index: str = NGRAM_INDEX,
+    seed: int = 0,
+) -> List[NgramSearchBenchmark]:
+    """Index a synthetic CJK corpus into a temporary index and compare the n-gram query
+    with one clause per character to `get_ngram_query` on a running Elasticsearch.
+    """
+
+    ZetsuBouFaker.seed(seed)
+    faker = ZetsuBouFaker()
+    names = {str(i): faker.cjk_name() for i in range(num_docs)}
+    queries = generate_cjk_queries(names, num_queries, faker=faker)
+
+    fields = [f"name.{ElasticsearchAnalyzerEnum.NGRAM.value}"]
+    strategies = {
+        "per-character": get_per_character_query,
+        "consolidated": get_ngram_query,
+    }
+
+    async_elasticsearch = get_async_elasticsearch()
+    results = []
+    try:
+        mappings = {"properties": {"name": {"type": "text", "fields": text_fields}}}
+        await async_elasticsearch.indices.create(
+            index=index, body={"settings": elasticsearch_settings, "mappings": mappings}
+        )
+        async with AsyncBulkIndexer(
+            async_elasticsearch, is_from_setting_if_none=True
+        ) as bulk_indexer:
+            await bulk_indexer.add_many(
+                {"_index": index, "_id": id, "name": name} for id, name in names.items()
+            )
+        await async_elasticsearch.indices.refresh(index=index)
+
+        for boolean in ElasticsearchQueryBooleanEnum:
+            for name, get_query in strategies.items():
+                clauses, seconds, tooks, recalls, precisions = [], [], [], [], []
+                for keywords, relevant_ids in queries:
+                    query = get_query(keywords, fields, boolean)
+                    start = time.perf_counter()
+                    resp = await async_elasticsearch.search(
+                        index=index, query=query, size=size, _source=False
+                    )
+                    seconds.append(time.perf_counter() - start)
+                    tooks.append(resp["took"])
+                    clauses.append(count_clauses(query))
+
+                    ids = [hit["_id"] for hit in resp["hits"]["hits"]]
+                    recall, precision = get_recall_and_precision(
+                        ids, relevant_ids, size
+                    )
+                    recalls.append(recall)
+                    precisions.append(precision)
+
+                results.append(
+                    NgramSearchBenchmark(
+                        name=name,
+                        boolean=boolean.value,
+                        queries=len(queries),
+                        mean_clauses=statistics.mean(clauses),
+                        mean_seconds=statistics.mean(seconds),
+                        p95_seconds=sorted(seconds)[int(0.95 * (len(seconds) - 1))],
+                        mean_took_ms=statistics.mean(tooks),
+                        recall=statistics.mean(recalls),
+                        precision=statistics.mean(precisions),
+                    )
+                )
+    finally:
+        await async_elasticsearch.indices.delete(index=index, ignore_unavailable=True)
+        await async_elasticsearch.close()
+
+    return results
+
+
+@app.command(name="ngram-search")
+async def _benchmark_ngram_search(
+    num_docs: int = typer.Option(
+        default=10000, help="Number of the generated documents."
+    ),
+    num_queries: int = typer.Option(default=100, help="Number of the queries."),
+    size: int = typer.Option(default=40, help="Number of hits per request."),
+    index: str = typer.Option(default=NGRAM_INDEX, help="Name of the temporary index."),
+    seed: int = typer.Option(default=0, help="Seed of the generated corpus."),
+):
+    """
+    Benchmark the latency and the recall of the n-gram queries on a synthetic CJK
+    corpus on a running Elasticsearch.
+    """
+
+    results = await benchmark_ngram_search(
+        num_docs=num_docs,
+        num_queries=num_queries,
+        size=size,
+        index=index,
+        seed=seed,
+    )
+    print_json(data=[result.model_dump() for result in results])
@@ -6,3 +6,11 @@ export function getImages(id: string) {
     method: "get",
   });
 }
+
+export function getImageUrls(id: string, start: number, end: number) {
+  return request({
+    url: `/api/v1/gallery/${id}/image-urls`,
+    method: "get",
+    params: { start: start, end: end },
+  });
+}
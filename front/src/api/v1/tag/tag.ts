@@ -25,6 +25,14 @@ export function getTagInterpretation(tagID: number | string) {
   });
 }
 
+export function postTagInterpretations(tagIDs: Array<number>) {
+  return request({
+    url: `/api/v1/tag/interpretations`,
+    method: "post",
+    data: tagIDs,
+  });
+}
+
 export function postTag(data: any) {
   return request({
     url: `/api/v1/tag`,
@@ -48,6 +56,13 @@ export function deleteTag(id: string | number) {
   });
 }
 
+export function getTagDeleteProgress(id: string | number) {
+  return request({
+    url: `/api/v1/tag/${id}/delete-progress`,
+    method: "get",
+  });
+}
+
 export function searchForTagAttributes(params: any) {
   return request({
     url: `/api/v1/search-for-tag-attributes`,
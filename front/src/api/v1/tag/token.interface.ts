@@ -4,3 +4,9 @@ export interface GetTagTokenStartsWithParam extends SelectDropdownGetParam {
   category?: string;
   category_id?: number;
 }
+
+export interface GetTagAutocompleteParam {
+  s?: string;
+  size?: number;
+  category_id?: number;
+}
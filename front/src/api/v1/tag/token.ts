@@ -1,6 +1,9 @@
 import request from "@/utils/request";
 
-import { GetTagTokenStartsWithParam } from "@/api/v1/tag/token.interface";
+import {
+  GetTagAutocompleteParam,
+  GetTagTokenStartsWithParam,
+} from "@/api/v1/tag/token.interface";
 
 export function getTagTokenTotal() {
   return request({
@@ -25,6 +28,14 @@ export function getTagTokenStartsWith(params: GetTagTokenStartsWithParam) {
   });
 }
 
+export function getTagAutocomplete(params: GetTagAutocompleteParam) {
+  return request({
+    url: `/api/v1/tag/autocomplete`,
+    method: "get",
+    params: params,
+  });
+}
+
 export function postTagToken(data: any) {
   return request({
     url: `/api/v1/tag/token`,
@@ -50,3 +50,11 @@ export function deleteUserElasticCountQuery(userID: string | number, queryID: st
     method: "delete",
   });
 }
+
+export function postUserElasticCounts(userID: string | number, queryIDs: number[]) {
+  return request({
+    url: `/api/v1/user/${userID}/elastic/counts`,
+    method: "post",
+    data: queryIDs,
+  });
+}
@@ -7,3 +7,8 @@ export interface Attributes extends SourceAttributes {
 export interface Gallery extends Source {
   attributes: Attributes;
 }
+
+export interface GalleryImageUrl {
+  name: string;
+  url: string;
+}
@@ -54,6 +54,16 @@ export interface Setting {
   app_logging_formatter_fmt?: string;
   app_gallery_sync_pages?: boolean;
   app_gallery_sync_pages_when_go_to_gallery?: boolean;
+  app_gallery_sync_concurrency?: number;
+  app_gallery_sync_flat_listing?: boolean;
+  app_gallery_sync_incremental?: boolean;
+  app_gallery_image_cache_size?: number;
+  app_gallery_image_cache_expires_in_seconds?: number;
+  app_progress_interval?: number;
+  app_progress_min_delta?: number;
+  app_progress_expires_in_seconds?: number;
+  app_tag_autocomplete_expires_in_seconds?: number;
+  app_tag_autocomplete_cache_size?: number;
   standalone_storage_protocol?: SourceProtocolEnum;
   standalone_storage_id?: number;
   standalone_storage_minio_volume?: string;
@@ -72,9 +82,30 @@ export interface Setting {
   elastic_index_gallery?: string;
   elastic_index_video?: string;
   elastic_index_tag?: string;
+  elastic_maxsize?: number;
+  elastic_timeout?: number;
+  elastic_mapping_expires_in_seconds?: number;
+  elastic_pit_keep_alive?: string;
+  elastic_checkpoint_expires_in_seconds?: number;
+  elastic_result_cache_expires_in_seconds?: number;
+  elastic_result_cache_max_bytes?: number;
+  elastic_random_expires_in_seconds?: number;
+  elastic_random_max_ids?: number;
+  elastic_random_scroll_slices?: number;
+  elastic_bulk_concurrency?: number;
+  elastic_bulk_queue_size?: number;
+  elastic_bulk_max_actions?: number;
+  elastic_bulk_max_bytes?: number;
+  elastic_bulk_max_retries?: number;
+  elastic_bulk_initial_backoff?: number;
+  elastic_bulk_max_backoff?: number;
+  elastic_bulk_disable_refresh?: boolean;
+  elastic_tag_update_by_query?: boolean;
+  elastic_update_by_query_slices?: number;
   elasticsearch_port?: number;
   storage_protocol?: SourceProtocolEnum;
   storage_expires_in_minutes?: number;
+  storage_session_expires_in_seconds?: number;
   storage_cache?: string;
   storage_backup?: string;
   storage_s3_aws_access_key_id?: string;
@@ -83,6 +114,7 @@ export interface Setting {
   storage_s3_volume?: string;
   storage_s3_port?: number;
   storage_s3_console_port?: number;
+  storage_s3_max_pool_connections?: number;
   airflow_host?: string;
   airflow_username?: string;
   airflow_password?: string;
@@ -5,6 +5,12 @@ export interface Token {
   name: string;
 }
 
+export interface TagAutocompletion extends Token {
+  count: number;
+  representative?: Token;
+  synonyms: Array<Token>;
+}
+
 export interface Tags {
   [key: string]: Array<string>;
 }
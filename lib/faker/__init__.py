@@ -23,6 +23,8 @@ image_sizes = [
 
 image_formats = [(".png", "PNG", "image/png"), (".jpg", "JPEG", "image/jpeg")]
 
+_cjk_faker = Faker("zh_TW")
+
 
 class ZetsuBouFaker(Faker):
     def uuid4(self) -> str:
@@ -54,6 +56,10 @@ class ZetsuBouFaker(Faker):
     def lower_name(self) -> str:
         return self.name().lower()
 
+    def cjk_name(self, nb_words: int = 4) -> str:
+        """A name of Chinese words without spaces."""
+        return "".join(_cjk_faker.words(nb=nb_words))
+
     def image_size(
         self, image_sizes: List[Tuple[int, int]] = image_sizes
     ) -> Tuple[int, int]:
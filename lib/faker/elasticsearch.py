@@ -0,0 +1,90 @@
+import json
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from uuid import uuid4
+
+from elasticsearch.serializer import JSONSerializer
+
+
+class FakeTransport:
+    serializer = JSONSerializer()
+
+
+class FakeAsyncElasticsearch:
+    """
+    An in-memory stand-in for `AsyncElasticsearch` which counts the requests.
+
+    Only the requests sent by `async_bulk`, `async_scan` and the document counts are
+    implemented. The queries are ignored and every search matches all the documents of
+    the index.
+    """
+
+    def __init__(self):
+        self.transport = FakeTransport()
+        # index -> ID -> document
+        self.indices: Dict[str, Dict[str, dict]] = {}
+        self.requests: Counter = Counter()
+        # scroll ID -> (size, remaining hits)
+        self._scrolls: Dict[str, Tuple[int, List[dict]]] = {}
+
+    def _hits(self, index: str) -> List[dict]:
+        return [
+            {"_index": index, "_id": id, "_source": source}
+            for id, source in self.indices.get(index, {}).items()
+        ]
+
+    async def bulk(self, body: str, **kwargs) -> dict:
+        self.requests["bulk"] += 1
+
+        items = []
+        lines = iter(line for line in body.split("\n") if line)
+        for line in lines:
+            action = json.loads(line)
+            op_type, meta = next(iter(action.items()))
+            index = self.indices.setdefault(meta["_index"], {})
+            if op_type == "delete":
+                found = index.pop(meta["_id"], None) is not None
+                status = 200 if found else 404
+            else:
+                index[meta["_id"]] = json.loads(next(lines))
+                status = 200
+            items.append({op_type: {"_id": meta["_id"], "status": status}})
+        return {"took": 0, "errors": False, "items": items}
+
+    async def search(
+        self,
+        index: str,
+        size: int = 10,
+        scroll: Optional[str] = None,
+        **kwargs,
+    ) -> dict:
+        self.requests["search"] += 1
+
+        hits = self._hits(index)
+        resp = {
+            "_shards": {"total": 1, "successful": 1, "skipped": 0},
+            "hits": {"total": {"value": len(hits)}, "hits": hits[:size]},
+        }
+        if scroll is not None:
+            scroll_id = str(uuid4())
+            self._scrolls[scroll_id] = (size, hits[size:])
+            resp["_scroll_id"] = scroll_id
+        return resp
+
+    async def scroll(self, scroll_id: str, **kwargs) -> dict:
+        self.requests["scroll"] += 1
+
+        size, hits = self._scrolls.get(scroll_id, (0, []))
+        self._scrolls[scroll_id] = (size, hits[size:])
+        return {
+            "_scroll_id": scroll_id,
+            "_shards": {"total": 1, "successful": 1, "skipped": 0},
+            "hits": {"total": {"value": len(hits)}, "hits": hits[:size]},
+        }
+
+    async def clear_scroll(self, scroll_id: str, **kwargs) -> dict:
+        self._scrolls.pop(scroll_id, None)
+        return {"succeeded": True}
+
+    async def close(self):
+        pass
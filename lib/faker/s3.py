@@ -0,0 +1,219 @@
+import hashlib
+from bisect import bisect_left
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from uuid import uuid4
+
+from back.session.storage.async_s3 import AsyncS3Session
+
+
+class FakeS3ClientError(Exception):
+    pass
+
+
+class FakeS3NoSuchKey(FakeS3ClientError):
+    pass
+
+
+class FakeS3NoSuchBucket(FakeS3ClientError):
+    pass
+
+
+class FakeS3Exceptions:
+    ClientError = FakeS3ClientError
+    NoSuchKey = FakeS3NoSuchKey
+    NoSuchBucket = FakeS3NoSuchBucket
+
+
+class FakeS3Body:
+    def __init__(self, body: bytes):
+        self.body = body
+
+    async def read(self) -> bytes:
+        return self.body
+
+
+def _normalize(key: str) -> str:
+    # MinIO ignores the leading slash of the object names.
+    return key.lstrip("/")
+
+
+def _response(**kwargs) -> dict:
+    return {
+        "ResponseMetadata": {"RequestId": str(uuid4()), "HTTPStatusCode": 200},
+        **kwargs,
+    }
+
+
+class FakeS3Paginator:
+    def __init__(self, client: "FakeS3Client"):
+        self.client = client
+
+    async def paginate(
+        self,
+        Bucket: str,
+        Prefix: str = "",
+        Delimiter: str = "",
+        MaxKeys: int = 1000,
+    ):
+        keys = self.client._list(Bucket, Prefix, Delimiter)
+        for i in range(0, max(len(keys), 1), MaxKeys):
+            self.client.requests["list_objects_v2"] += 1
+            yield self.client._page(Bucket, Delimiter, MaxKeys, keys[i : i + MaxKeys])
+
+
+class FakeS3Client:
+    """
+    An in-memory stand-in for the `aiobotocore` S3 client which counts the requests.
+
+    Only the operations used by `AsyncS3Session` are implemented.
+    """
+
+    exceptions = FakeS3Exceptions
+
+    def __init__(self):
+        # bucket name -> sorted keys and key -> body
+        self.keys: Dict[str, List[str]] = {}
+        self.objects: Dict[str, Dict[str, bytes]] = {}
+        self.requests: Counter = Counter()
+
+    def add_bucket(self, bucket_name: str):
+        self.keys.setdefault(bucket_name, [])
+        self.objects.setdefault(bucket_name, {})
+
+    def add_object(self, bucket_name: str, key: str, body: bytes = b""):
+        self.add_bucket(bucket_name)
+        key = _normalize(key)
+        if key not in self.objects[bucket_name]:
+            keys = self.keys[bucket_name]
+            keys.insert(bisect_left(keys, key), key)
+        self.objects[bucket_name][key] = body
+
+    def _get_bucket(self, bucket_name: str) -> Dict[str, bytes]:
+        objects = self.objects.get(bucket_name, None)
+        if objects is None:
+            raise FakeS3NoSuchBucket(bucket_name)
+        return objects
+
+    def _list(
+        self, bucket_name: str, prefix: str, delimiter: str
+    ) -> List[Tuple[str, bool]]:
+        """Return the keys and the common prefixes under `prefix` in order. The flag is
+        true for the common prefixes.
+        """
+
+        self._get_bucket(bucket_name)
+        prefix = _normalize(prefix)
+        keys = self.keys[bucket_name]
+
+        items = []
+        for i in range(bisect_left(keys, prefix), len(keys)):
+            key = keys[i]
+            if not key.startswith(prefix):
+                break
+            if delimiter:
+                j = key.find(delimiter, len(prefix))
+                if j >= 0:
+                    common_prefix = key[: j + len(delimiter)]
+                    if len(items) == 0 or items[-1][0] != common_prefix:
+                        items.append((common_prefix, True))
+                    continue
+            items.append((key, False))
+        return items
+
+    def _page(
+        self,
+        bucket_name: str,
+        delimiter: str,
+        max_keys: int,
+        items: List[Tuple[str, bool]],
+    ) -> dict:
+        objects = self.objects[bucket_name]
+        contents = []
+        common_prefixes = []
+        for item, is_prefix in items:
+            if is_prefix:
+                common_prefixes.append({"Prefix": item})
+            else:
+                contents.append(
+                    {
+                        "Key": item,
+                        "Size": len(objects[item]),
+                        "ETag": f'"{hashlib.md5(objects[item]).hexdigest()}"',
+                    }
+                )
+        return {
+            "Name": bucket_name,
+            "Delimiter": delimiter,
+            "MaxKeys": max_keys,
+            "KeyCount": len(items),
+            "Contents": contents,
+            "CommonPrefixes": common_prefixes,
+        }
+
+    def get_paginator(self, _: str) -> FakeS3Paginator:
+        return FakeS3Paginator(self)
+
+    async def list_objects_v2(
+        self,
+        Bucket: str,
+        Prefix: str = "",
+        Delimiter: str = "",
+        MaxKeys: int = 1000,
+    ) -> dict:
+        self.requests["list_objects_v2"] += 1
+        items = self._list(Bucket, Prefix, Delimiter)[:MaxKeys]
+        return self._page(Bucket, Delimiter, MaxKeys, items)
+
+    async def head_object(self, Bucket: str, Key: str) -> dict:
+        self.requests["head_object"] += 1
+        body = self._get_bucket(Bucket).get(_normalize(Key), None)
+        if body is None:
+            raise FakeS3ClientError(Key)
+        return _response(ContentLength=len(body))
+
+    async def get_object(self, Bucket: str, Key: str) -> dict:
+        self.requests["get_object"] += 1
+        body = self._get_bucket(Bucket).get(_normalize(Key), None)
+        if body is None:
+            raise FakeS3NoSuchKey(Key)
+        return _response(
+            ContentLength=len(body),
+            ETag=f'"{hashlib.md5(body).hexdigest()}"',
+            ContentType="application/octet-stream",
+            Metadata={},
+            Body=FakeS3Body(body),
+        )
+
+    async def put_object(
+        self, Bucket: str, Key: str, Body, ContentType: Optional[str] = None
+    ) -> dict:
+        self.requests["put_object"] += 1
+        if hasattr(Body, "read"):
+            Body = Body.read()
+        self._get_bucket(Bucket)
+        self.add_object(Bucket, Key, Body)
+        return _response(ETag=f'"{hashlib.md5(Body).hexdigest()}"')
+
+    async def generate_presigned_url(
+        self, ClientMethod: str, Params: dict, ExpiresIn: int = 3600
+    ) -> str:
+        return f"http://fake-s3/{Params['Bucket']}/{_normalize(Params['Key'])}"
+
+    async def close(self):
+        pass
+
+
+class FakeAsyncS3Session(AsyncS3Session):
+    """An `AsyncS3Session` which uses the given `FakeS3Client`."""
+
+    def __init__(self, client: FakeS3Client, **kwargs):
+        super().__init__(**kwargs)
+        self.fake_client = client
+
+    async def open(self):
+        self.client = self.fake_client
+        return self.client
+
+    async def close(self):
+        ...
@@ -42,3 +42,13 @@ async def test_get_video_field_names(client: ZetsuBouAsyncClient):
             "/api/v1/elasticsearch/video/field-names", headers=headers
         )
     assert response.status_code == 200
+
+
+@pytest.mark.asyncio(scope="session")
+@pytest.mark.integration
+async def test_get_result_cache_stats(client: ZetsuBouAsyncClient):
+    headers = get_admin_headers()
+    async with client as ac:
+        response = await ac.get("/api/v1/elasticsearch/result-cache", headers=headers)
+    assert response.status_code == 200
+    assert "hit_rate" in response.json()
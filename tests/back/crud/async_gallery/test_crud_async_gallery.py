@@ -0,0 +1,53 @@
+import pytest
+
+from back.crud.async_gallery import CrudAsyncGallery
+from back.crud.async_image_cache import GalleryImageCache
+from back.model.base import SourceBaseModel
+from back.model.gallery import Gallery
+
+IMAGES = [f"{i}.jpg" for i in range(1, 11)]
+
+
+class MockStorageSession:
+    def __init__(self):
+        self.num_urls = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        pass
+
+    async def list_images(self, source: SourceBaseModel):
+        return IMAGES
+
+    async def get_url(self, source: SourceBaseModel, expires_in: int = 3600) -> str:
+        self.num_urls += 1
+        return f"http://localhost/{source.bucket_name}{source.object_name}"
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_get_image_urls():
+    crud = CrudAsyncGallery(
+        "1",
+        hosts=["http://localhost:9200"],
+        image_cache=GalleryImageCache(
+            maxsize=10, images_expires_in=60, url_expires_in=600
+        ),
+    )
+    crud.gallery = Gallery(id="1", path="minio-1://bucket/a/1/")
+    crud.storage_session = MockStorageSession()
+
+    image_urls = await crud.get_image_urls(start=2, end=5)
+    assert [image_url.name for image_url in image_urls] == ["3.jpg", "4.jpg", "5.jpg"]
+    assert image_urls[0].url == "http://localhost/bucket/a/1/3.jpg"
+    assert crud.storage_session.num_urls == 3
+
+    image_urls = await crud.get_image_urls(start=0, end=5)
+    assert len(image_urls) == 5
+    assert crud.storage_session.num_urls == 5
+
+    assert await crud.get_image("4.jpg") == "http://localhost/bucket/a/1/4.jpg"
+    assert crud.storage_session.num_urls == 5
+
+    await crud.close()
@@ -0,0 +1,44 @@
+import pytest
+
+from back.crud.async_gallery import CrudAsyncGallerySync
+from back.model.base import SourceBaseModel, SourceProtocolEnum
+from back.model.gallery import Gallery
+
+INDEX = "gallery"
+
+
+class MockStorageSession:
+    async def exists(self, source: SourceBaseModel) -> bool:
+        raise AssertionError("The storage should not be requested.")
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_sync_gallery_elasticsearch_to_storage_by_storage_paths():
+    crud = CrudAsyncGallerySync(
+        MockStorageSession(),
+        SourceProtocolEnum.MINIO.value,
+        1,
+        SourceBaseModel(path="minio-1://bucket/root/"),
+        2,
+        hosts=["http://localhost:9200"],
+        index=INDEX,
+        batch_size=100,
+        force=True,
+    )
+    crud._storage_paths = {"minio-1://bucket/root/a/1/", "minio-1://bucket/root/a/2/"}
+    crud.cache = {"1", "2"}
+
+    docs = [
+        Gallery(id="1", path="minio-1://bucket/root/a/1/"),
+        Gallery(id="2", path="minio-1://bucket/root/a/2/"),
+        Gallery(id="3", path="minio-1://bucket/root/a/3/"),
+        Gallery(id="4", path="minio-2://bucket/root/a/4/"),
+    ]
+    for doc in docs:
+        await crud._sync_gallery_elasticsearch_to_storage({"_source": doc.model_dump()})
+
+    assert crud.bulk_indexer.pending_actions == [
+        {"_index": INDEX, "_id": "3", "_op_type": "delete"}
+    ]
+
+    await crud.close()
@@ -0,0 +1,208 @@
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+from elasticsearch.exceptions import TransportError
+from elasticsearch.helpers import BulkIndexError
+
+from back.crud.async_bulk import (
+    AsyncBulkIndexer,
+    get_refresh_holders_key,
+    get_refresh_interval_key,
+    is_retryable,
+    reset_refresh,
+)
+from lib.faker.elasticsearch import FakeAsyncElasticsearch
+from tests.general.mock import MockAsyncRedis
+
+INDEX = "bulk"
+
+
+class FlakyAsyncElasticsearch(FakeAsyncElasticsearch):
+    """Fail the first bulk request, then reject the first action of the second one."""
+
+    def __init__(self, status: int = 429):
+        super().__init__()
+        self.status = status
+        self.bodies = []
+
+    async def bulk(self, body: str, **kwargs) -> dict:
+        self.bodies.append(body)
+        if len(self.bodies) == 1:
+            self.requests["bulk"] += 1
+            raise TransportError(503, "unavailable")
+        resp = await super().bulk(body, **kwargs)
+        if len(self.bodies) == 2:
+            resp["errors"] = True
+            resp["items"][0]["index"]["status"] = self.status
+            resp["items"][0]["index"]["error"] = {"type": "rejected"}
+        return resp
+
+
+def get_actions(num: int):
+    return [{"_index": INDEX, "_id": str(i), "_source": {"i": i}} for i in range(num)]
+
+
+def test_is_retryable():
+    assert is_retryable(429)
+    assert is_retryable(503)
+    assert is_retryable("N/A")
+    assert not is_retryable(400)
+    assert not is_retryable(409)
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_add():
+    async_elasticsearch = FakeAsyncElasticsearch()
+    async with AsyncBulkIndexer(
+        async_elasticsearch, concurrency=2, queue_size=1, max_actions=2
+    ) as bulk_indexer:
+        await bulk_indexer.add_many(get_actions(5))
+        await bulk_indexer.add({"_index": INDEX, "_id": "9", "_op_type": "delete"})
+    assert async_elasticsearch.requests["bulk"] == 3
+    assert len(async_elasticsearch.indices[INDEX]) == 5
+    assert bulk_indexer.result.succeeded == 6
+    assert bulk_indexer.result.failed == 0
+
+    async_elasticsearch = FakeAsyncElasticsearch()
+    async with AsyncBulkIndexer(async_elasticsearch, max_bytes=1) as bulk_indexer:
+        await bulk_indexer.add_many(get_actions(3))
+        await bulk_indexer.join()
+        assert async_elasticsearch.requests["bulk"] == 3
+        assert bulk_indexer.pending_actions == []
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_retry():
+    async_elasticsearch = FlakyAsyncElasticsearch()
+    async with AsyncBulkIndexer(
+        async_elasticsearch, max_retries=2, initial_backoff=0
+    ) as bulk_indexer:
+        await bulk_indexer.add_many(get_actions(3))
+    assert len(async_elasticsearch.bodies) == 3
+    assert '"_id":"0"' in async_elasticsearch.bodies[2]
+    assert '"_id":"1"' not in async_elasticsearch.bodies[2]
+    assert len(async_elasticsearch.indices[INDEX]) == 3
+    assert bulk_indexer.result.succeeded == 3
+    assert bulk_indexer.result.retries == 2
+    assert bulk_indexer.result.requests == 3
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_error():
+    async_elasticsearch = FlakyAsyncElasticsearch(status=400)
+    bulk_indexer = AsyncBulkIndexer(
+        async_elasticsearch, max_retries=1, initial_backoff=0
+    )
+    with pytest.raises(BulkIndexError):
+        async with bulk_indexer:
+            await bulk_indexer.add_many(get_actions(3))
+    assert bulk_indexer.result.succeeded == 2
+    assert bulk_indexer.result.failed == 1
+    error = bulk_indexer.result.errors[0]
+    assert error.id == "0"
+    assert error.status == 400
+    assert error.error == {"type": "rejected"}
+
+    async_elasticsearch = FlakyAsyncElasticsearch()
+    async with AsyncBulkIndexer(
+        async_elasticsearch, raise_on_error=False
+    ) as bulk_indexer:
+        await bulk_indexer.add_many(get_actions(3))
+    assert bulk_indexer.result.failed == 3
+    assert bulk_indexer.result.errors[0].status == 503
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_disable_refresh():
+    async_elasticsearch = Mock()
+    async_elasticsearch.indices.get_settings = AsyncMock(
+        return_value={INDEX: {"settings": {"index": {"refresh_interval": "5s"}}}}
+    )
+    async_elasticsearch.indices.put_settings = AsyncMock()
+    async_elasticsearch.indices.refresh = AsyncMock()
+
+    async with AsyncBulkIndexer(
+        async_elasticsearch, disable_refresh=True, refresh_indices=[INDEX]
+    ):
+        async_elasticsearch.indices.put_settings.assert_awaited_once_with(
+            index=INDEX, body={"index": {"refresh_interval": "-1"}}
+        )
+    async_elasticsearch.indices.put_settings.assert_awaited_with(
+        index=INDEX, body={"index": {"refresh_interval": "5s"}}
+    )
+    async_elasticsearch.indices.refresh.assert_awaited_once_with(index=INDEX)
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_disable_refresh_overlapping():
+    refresh_intervals = {INDEX: "5s"}
+
+    async def get_settings(index: str, name: str) -> dict:
+        refresh_interval = refresh_intervals[index]
+        return {index: {"settings": {"index": {"refresh_interval": refresh_interval}}}}
+
+    async def put_settings(index: str, body: dict):
+        refresh_intervals[index] = body["index"]["refresh_interval"]
+
+    async_elasticsearch = Mock()
+    async_elasticsearch.indices.get_settings = get_settings
+    async_elasticsearch.indices.put_settings = put_settings
+    async_elasticsearch.indices.refresh = AsyncMock()
+    async_redis = MockAsyncRedis()
+
+    first = AsyncBulkIndexer(
+        async_elasticsearch,
+        disable_refresh=True,
+        refresh_indices=[INDEX],
+        async_redis=async_redis,
+    )
+    second = AsyncBulkIndexer(
+        async_elasticsearch,
+        disable_refresh=True,
+        refresh_indices=[INDEX],
+        async_redis=async_redis,
+    )
+    await first.open()
+    await second.open()
+    await first.close()
+    # the refresh is disabled until the last indexer is closed
+    assert refresh_intervals[INDEX] == "-1"
+    await second.close()
+    assert refresh_intervals[INDEX] == "5s"
+    async_elasticsearch.indices.refresh.assert_awaited_once_with(index=INDEX)
+
+    # the refresh left disabled by a killed indexer is reset to the default
+    refresh_intervals[INDEX] = "-1"
+    async with AsyncBulkIndexer(
+        async_elasticsearch,
+        disable_refresh=True,
+        refresh_indices=[INDEX],
+        async_redis=async_redis,
+    ):
+        pass
+    assert refresh_intervals[INDEX] is None
+
+    # the refresh disabled by a running indexer is kept
+    refresh_intervals[INDEX] = "5s"
+    running = AsyncBulkIndexer(
+        async_elasticsearch,
+        disable_refresh=True,
+        refresh_indices=[INDEX],
+        async_redis=async_redis,
+    )
+    await running.open()
+    await reset_refresh(async_elasticsearch, [INDEX], async_redis=async_redis)
+    assert refresh_intervals[INDEX] == "-1"
+    assert await async_redis.get(get_refresh_holders_key(INDEX)) == b"1"
+    assert await async_redis.get(get_refresh_interval_key(INDEX)) == b'"5s"'
+    await running.close()
+    assert refresh_intervals[INDEX] == "5s"
+
+    # the interval set on purpose is kept
+    await reset_refresh(async_elasticsearch, [INDEX], async_redis=async_redis)
+    assert refresh_intervals[INDEX] == "5s"
+
+    # the refresh left disabled after the lease of a killed indexer expired is reset
+    refresh_intervals[INDEX] = "-1"
+    await reset_refresh(async_elasticsearch, [INDEX], async_redis=async_redis)
+    assert refresh_intervals[INDEX] is None
@@ -1,4 +1,5 @@
 from asyncio import Future
+from typing import Any, List, Optional
 from unittest.mock import Mock
 
 import pytest
@@ -6,9 +7,16 @@ from elasticsearch import AsyncElasticsearch
 from elasticsearch.exceptions import NotFoundError
 from fastapi import HTTPException
 
+from back.crud import async_elasticsearch
+from back.crud.async_cursor import (
+    SearchCheckpoints,
+    get_checkpoints_key,
+    get_query_key,
+)
 from back.crud.async_elasticsearch import CrudAsyncElasticsearchBase
 from lib.faker import ZetsuBouFaker
 from lib.zetsubou.exceptions import SessionNotFoundException
+from tests.general.mock import MockAsyncRedis
 
 
 def test_analyzer():
@@ -88,7 +96,6 @@ async def test_get_source_by_id():
 
 @pytest.mark.asyncio(scope="session")
 async def test_get_source_by_id_exception():
-
     def _side_effect(**kwargs):
         raise NotFoundError
 
@@ -107,7 +114,6 @@ async def test_get_source_by_id_exception():
 
 @pytest.mark.asyncio(scope="session")
 async def test_get_sources_by_ids_exception():
-
     def _side_effect(**kwargs):
         raise NotFoundError
 
@@ -129,3 +135,242 @@ async def test_query():
     with pytest.raises(ValueError):
         async with CrudAsyncElasticsearchBase() as crud:
             await crud.query(1, {})
+
+
+class MockSortedAsyncElasticsearch:
+    """Sort the documents `n` by `n` in descending order. The sort values of the
+    searches with a point in time end with a tiebreaker like `_shard_doc`.
+    """
+
+    def __init__(self, total: int):
+        self.total = total
+        self.searches: List[dict] = []
+        self.pit_ids: List[str] = []
+        self.closed_pit_ids: List[str] = []
+
+    async def open_point_in_time(self, index: str, keep_alive: str) -> dict:
+        pit_id = f"pit-{len(self.pit_ids)}"
+        self.pit_ids.append(pit_id)
+        return {"id": pit_id}
+
+    async def close_point_in_time(self, body: dict) -> dict:
+        self.closed_pit_ids.append(body["id"])
+        return {"succeeded": True}
+
+    async def search(
+        self,
+        index: Optional[str] = None,
+        pit: Optional[dict] = None,
+        size: int = 10,
+        from_: int = 0,
+        search_after: Optional[List[Any]] = None,
+        _source: bool = True,
+        **kwargs,
+    ) -> dict:
+        assert (index is None) != (pit is None)
+        if pit is not None and pit["id"] in self.closed_pit_ids:
+            raise NotFoundError
+        self.searches.append(
+            {"pit": pit, "size": size, "search_after": search_after, "_source": _source}
+        )
+
+        ns = list(range(self.total - 1, -1, -1))
+        if search_after is not None:
+            assert from_ == 0
+            assert len(search_after) == (1 if pit is None else 2)
+            ns = [n for n in ns if n < search_after[0]]
+        ns = ns[from_ : from_ + size]
+
+        hits = []
+        for n in ns:
+            hit = {"_id": str(n), "sort": [n] if pit is None else [n, -n]}
+            if _source:
+                hit["_source"] = {"n": n}
+            hits.append(hit)
+        resp = {"hits": {"total": {"value": self.total}, "hits": hits}}
+        if pit is not None:
+            resp["pit_id"] = pit["id"]
+        return resp
+
+    async def close(self):
+        pass
+
+
+def get_ns(resp: dict) -> List[int]:
+    return [hit["_source"]["n"] for hit in resp["hits"]["hits"]]
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_query_deep_page(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(
+        async_elasticsearch, "ELASTICSEARCH_INDEX_MAX_RESULT_WINDOW", 10
+    )
+    mock_async_elasticsearch = MockSortedAsyncElasticsearch(100)
+    async_redis = MockAsyncRedis()
+    checkpoints = SearchCheckpoints(expires_in_seconds=60, async_redis=async_redis)
+
+    async with CrudAsyncElasticsearchBase(
+        index="index", checkpoints=checkpoints
+    ) as crud:
+        crud.async_elasticsearch = mock_async_elasticsearch
+
+        resp = await crud.query(6, {"size": 4, "sort": ["n"]})
+        assert get_ns(resp) == [79, 78, 77, 76]
+        # 20 hits are skipped by 2 searches without `_source`
+        skips = mock_async_elasticsearch.searches[:-1]
+        assert [search["size"] for search in skips] == [10, 10]
+        assert all(search["_source"] is False for search in skips)
+
+        mock_async_elasticsearch.searches = []
+        resp = await crud.query(7, {"size": 4, "sort": ["n"]})
+        assert get_ns(resp) == [75, 74, 73, 72]
+        # the checkpoint and the point in time of the previous page are reused
+        assert [search["size"] for search in mock_async_elasticsearch.searches] == [
+            4,
+            4,
+        ]
+        assert mock_async_elasticsearch.pit_ids == ["pit-0"]
+
+        # an expired point in time is replaced, and the hits are skipped from the
+        # start because its checkpoints do not apply to the new one
+        mock_async_elasticsearch.closed_pit_ids.append("pit-0")
+        mock_async_elasticsearch.searches = []
+        resp = await crud.query(8, {"size": 4, "sort": ["n"]})
+        assert get_ns(resp) == [71, 70, 69, 68]
+        assert mock_async_elasticsearch.pit_ids == ["pit-0", "pit-1"]
+        searches = mock_async_elasticsearch.searches
+        assert [search["size"] for search in searches] == [10, 10, 8, 4]
+        assert searches[0]["search_after"] is None
+        assert all(search["pit"]["id"] == "pit-1" for search in searches)
+        query_key = get_query_key("index", {"sort": ["n"]})
+        assert get_checkpoints_key(query_key, "pit-0") not in async_redis.hashes
+        assert get_checkpoints_key(query_key, "pit-1") in async_redis.hashes
+        resp = await crud.query(9, {"size": 4, "sort": ["n"]})
+        assert mock_async_elasticsearch.pit_ids == ["pit-0", "pit-1"]
+
+        mock_async_elasticsearch.searches = []
+        resp = await crud.query(30, {"size": 4, "sort": ["n"]})
+        assert resp == {"hits": {}}
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_query_deep_page_without_checkpoints(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(
+        async_elasticsearch, "ELASTICSEARCH_INDEX_MAX_RESULT_WINDOW", 10
+    )
+    mock_async_elasticsearch = MockSortedAsyncElasticsearch(100)
+
+    async with CrudAsyncElasticsearchBase(index="index") as crud:
+        crud.async_elasticsearch = mock_async_elasticsearch
+
+        # the point in time cannot be reused, so it is closed without the cursor
+        resp = await crud.query(6, {"size": 4, "sort": ["n"]})
+        assert get_ns(resp) == [79, 78, 77, 76]
+        assert mock_async_elasticsearch.closed_pit_ids == ["pit-0"]
+        assert "cursor" not in resp
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_query_cursor(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(async_elasticsearch, "ELASTICSEARCH_INDEX_MAX_RESULT_WINDOW", 4)
+    mock_async_elasticsearch = MockSortedAsyncElasticsearch(14)
+    checkpoints = SearchCheckpoints(expires_in_seconds=60, async_redis=MockAsyncRedis())
+
+    async with CrudAsyncElasticsearchBase(
+        index="index", checkpoints=checkpoints
+    ) as crud:
+        crud.async_elasticsearch = mock_async_elasticsearch
+
+        # the search without a point in time does not have the cursor
+        resp = await crud.query(1, {"size": 4, "sort": ["n"]})
+        assert get_ns(resp) == [13, 12, 11, 10]
+        assert "cursor" not in resp
+
+        resp = await crud.query(2, {"size": 4, "sort": ["n"]})
+        assert get_ns(resp) == [9, 8, 7, 6]
+
+        resp = await crud.query(1, {"size": 4, "sort": ["n"]}, cursor=resp["cursor"])
+        assert get_ns(resp) == [5, 4, 3, 2]
+        assert mock_async_elasticsearch.searches[-1]["search_after"] == [6, -6]
+        assert mock_async_elasticsearch.searches[-1]["pit"]["id"] == "pit-0"
+
+        # the last page does not have the cursor
+        resp = await crud.query(1, {"size": 4, "sort": ["n"]}, cursor=resp["cursor"])
+        assert get_ns(resp) == [1, 0]
+        assert "cursor" not in resp
+
+        # the cursor of another query is ignored
+        resp = await crud.query(2, {"size": 4, "sort": ["n"]})
+        resp = await crud.query(1, {"size": 4, "sort": ["-n"]}, cursor=resp["cursor"])
+        assert get_ns(resp) == [13, 12, 11, 10]
+        assert mock_async_elasticsearch.searches[-1]["search_after"] is None
+
+        resp = await crud.query(1, {"size": 4, "sort": ["n"]}, cursor="malformed")
+        assert get_ns(resp) == [13, 12, 11, 10]
+        assert mock_async_elasticsearch.pit_ids == ["pit-0"]
+
+        # the page of the cursor of an expired point in time is searched again
+        resp = await crud.query(2, {"size": 4, "sort": ["n"]})
+        mock_async_elasticsearch.closed_pit_ids.append("pit-0")
+        mock_async_elasticsearch.searches = []
+        resp = await crud.query(1, {"size": 4, "sort": ["n"]}, cursor=resp["cursor"])
+        assert get_ns(resp) == [5, 4, 3, 2]
+        assert mock_async_elasticsearch.pit_ids == ["pit-0", "pit-1"]
+        assert mock_async_elasticsearch.searches[0]["search_after"] is None
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_count_many():
+    mock_async_elasticsearch = Mock(spec=AsyncElasticsearch)
+    result = Future()
+    result.set_result(
+        {
+            "responses": [
+                {"hits": {"total": {"value": 3, "relation": "eq"}, "hits": []}},
+                {"hits": {"total": {"value": 0, "relation": "eq"}, "hits": []}},
+            ]
+        }
+    )
+    mock_async_elasticsearch.msearch.return_value = result
+
+    bodies = [{"query": {"match_all": {}}}, {"query": {"term": {"name": "a"}}}]
+    async with CrudAsyncElasticsearchBase(index="index") as crud:
+        crud.async_elasticsearch = mock_async_elasticsearch
+        assert await crud.count_many([]) == []
+        counts = await crud.count_many(bodies)
+
+    assert [c.count for c in counts] == [3, 0]
+    mock_async_elasticsearch.msearch.assert_called_once()
+    searches = mock_async_elasticsearch.msearch.call_args.kwargs["body"]
+    assert searches[0::2] == [{"index": "index"}, {"index": "index"}]
+    for search, body in zip(searches[1::2], bodies):
+        assert search == {**body, "size": 0, "track_total_hits": True}
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_count_many_error():
+    mock_async_elasticsearch = Mock(spec=AsyncElasticsearch)
+    result = Future()
+    result.set_result({"responses": [{"error": {"type": "parsing"}, "status": 400}]})
+    mock_async_elasticsearch.msearch.return_value = result
+
+    with pytest.raises(HTTPException):
+        async with CrudAsyncElasticsearchBase(index="index") as crud:
+            crud.async_elasticsearch = mock_async_elasticsearch
+            await crud.count_many([{"query": {"bad": {}}}])
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_query_fields():
+    mock_async_elasticsearch = Mock(spec=AsyncElasticsearch)
+    result = Future()
+    result.set_result({"hits": {"total": {"value": 0}, "hits": []}})
+    mock_async_elasticsearch.search.return_value = result
+
+    fields = ["id", "name", "attributes.rating"]
+    async with CrudAsyncElasticsearchBase(index="index") as crud:
+        crud.async_elasticsearch = mock_async_elasticsearch
+        await crud.match_all(1, size=10, fields=fields)
+
+    kwargs = mock_async_elasticsearch.search.call_args.kwargs
+    assert kwargs["_source"] == {"includes": fields}
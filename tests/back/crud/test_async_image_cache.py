@@ -0,0 +1,61 @@
+import pytest
+
+from back.crud.async_image_cache import GalleryImageCache
+from tests.general.mock import MockAsyncRedis
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_gallery_image_cache():
+    async_redis = MockAsyncRedis()
+    cache = GalleryImageCache(
+        maxsize=10, images_expires_in=60, url_expires_in=600, async_redis=async_redis
+    )
+
+    assert await cache.get_image_filenames("1") is None
+    await cache.set_image_filenames("1", ["1.jpg", "2.jpg"])
+    assert await cache.get_image_filenames("1") == ["1.jpg", "2.jpg"]
+
+    assert await cache.get_url("1", "1.jpg") is None
+    await cache.set_url("1", "1.jpg", "http://localhost/1.jpg")
+    assert await cache.get_url("1", "1.jpg") == "http://localhost/1.jpg"
+
+    # another process shares the entries through Redis
+    other_cache = GalleryImageCache(
+        maxsize=10, images_expires_in=60, url_expires_in=600, async_redis=async_redis
+    )
+    assert await other_cache.get_image_filenames("1") == ["1.jpg", "2.jpg"]
+    assert await other_cache.get_url("1", "1.jpg") == "http://localhost/1.jpg"
+
+    await other_cache.set_urls("1", {"2.jpg": "http://localhost/2.jpg"})
+    assert await cache.get_urls("1", ["1.jpg", "2.jpg", "3.jpg"]) == [
+        "http://localhost/1.jpg",
+        "http://localhost/2.jpg",
+        None,
+    ]
+
+    await cache.invalidate("1")
+    assert await cache.get_image_filenames("1") is None
+    assert await cache.get_url("1", "1.jpg") is None
+    # the entries cached in another process are dropped as well
+    assert await other_cache.get_image_filenames("1") is None
+    assert await other_cache.get_urls("1", ["1.jpg", "2.jpg"]) == [None, None]
+
+    # the entries written before the invalidation are not read
+    generation = await cache._get_generation("1")
+    await cache.set_image_filenames("1", ["1.jpg"])
+    await other_cache.invalidate("1")
+    assert await cache._get_generation("1") == generation + 1
+    assert await cache.get_image_filenames("1") is None
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_gallery_image_cache_url_expiration():
+    cache = GalleryImageCache(maxsize=10, images_expires_in=60, url_expires_in=600)
+
+    await cache.set_url("1", "1.jpg", "http://localhost/1.jpg")
+    assert await cache.get_url("1", "1.jpg") == "http://localhost/1.jpg"
+
+    # the URL is not reused shortly before it expires
+    expiration, url = cache._galleries.get("1").urls["1.jpg"]
+    cache._galleries.get("1").urls["1.jpg"] = (expiration - 550, url)
+    assert await cache.get_url("1", "1.jpg") is None
@@ -0,0 +1,50 @@
+import pytest
+
+from back.crud.async_manifest import GalleryManifest, get_manifest_key
+from back.model.base import SourceProtocolEnum
+from back.model.storage import StorageGalleryManifestEntry, StorageGallerySummary
+from tests.general.mock import MockAsyncRedis
+
+
+def test_manifest_entry_is_changed():
+    entry = StorageGalleryManifestEntry(id="1", tag_etag='"a"', num_images=3)
+
+    assert not entry.is_changed(
+        StorageGallerySummary(has_tag=True, tag_etag='"a"', num_images=3)
+    )
+    assert entry.is_changed(
+        StorageGallerySummary(has_tag=True, tag_etag='"b"', num_images=3)
+    )
+    assert entry.is_changed(
+        StorageGallerySummary(has_tag=True, tag_etag='"a"', num_images=4)
+    )
+    assert entry.is_changed(StorageGallerySummary(has_tag=False, num_images=3))
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_gallery_manifest():
+    async_redis = MockAsyncRedis()
+    protocol = SourceProtocolEnum.MINIO.value
+    key = get_manifest_key(protocol, 1)
+
+    manifest = GalleryManifest(protocol, 1, async_redis=async_redis, batch_size=2)
+    assert manifest.is_available
+
+    for i in range(5):
+        manifest.set(f"minio-1://bucket/{i}/", StorageGalleryManifestEntry(id=str(i)))
+    assert async_redis.hashes.get(key, None) is None
+
+    await manifest.flush()
+    assert len(async_redis.hashes[key]) == 5
+
+    await manifest.delete(["minio-1://bucket/0/", "minio-1://bucket/1/"])
+    assert len(manifest.entries) == 3
+
+    manifest = GalleryManifest(protocol, 1, async_redis=async_redis)
+    entries = await manifest.load()
+    assert sorted(entries.keys()) == [f"minio-1://bucket/{i}/" for i in range(2, 5)]
+    assert entries["minio-1://bucket/2/"].id == "2"
+
+    await manifest.clear()
+    assert async_redis.hashes.get(key, None) is None
+    assert not GalleryManifest(protocol, 1).is_available
@@ -0,0 +1,102 @@
+import asyncio
+import time
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from back.crud import async_progress
+from back.crud.async_progress import (
+    Progress,
+    get_elasticsearch_task_progress,
+    track_elasticsearch_task,
+)
+from tests.general.mock import MockAsyncRedis
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_progress():
+    async_redis = MockAsyncRedis()
+    items = [i async for i in Progress(range(10), async_redis=async_redis)]
+
+    assert items == list(range(10))
+    assert async_redis.history[0] == "10.00"
+    assert async_redis.history[-1] == "100.00"
+    values = [float(value) for value in async_redis.history]
+    assert values == sorted(values)
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_progress_coalescing():
+    async_redis = MockAsyncRedis(delay=0.001)
+    n = 10000
+    items = [
+        i
+        async for i in Progress(
+            range(n), async_redis=async_redis, interval=60.0, min_delta=1.0
+        )
+    ]
+
+    assert len(items) == n
+    # the first update and the final progress
+    assert async_redis.history == ["0.01", "100.00"]
+
+    async_redis = MockAsyncRedis(delay=0.001)
+    async for _ in Progress(range(n), async_redis=async_redis, min_delta=1.0):
+        ...
+    assert len(async_redis.history) <= 102
+    assert async_redis.history[-1] == "100.00"
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_progress_async_iterable():
+    async def aiter(n: int):
+        for i in range(n):
+            await asyncio.sleep(0)
+            yield i
+
+    async_redis = MockAsyncRedis(delay=0.01)
+    items = [i async for i in Progress(aiter(100), total=100, async_redis=async_redis)]
+
+    assert items == list(range(100))
+    # the writes in flight are coalesced
+    assert len(async_redis.history) < 100
+    assert async_redis.history[-1] == "100.00"
+
+
+def test_get_elasticsearch_task_progress():
+    assert get_elasticsearch_task_progress({}) == 0.0
+    assert get_elasticsearch_task_progress({"total": 0, "updated": 0}) == 0.0
+    status = {"total": 8, "updated": 3, "noops": 1, "version_conflicts": 2}
+    assert get_elasticsearch_task_progress(status) == 75.0
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_track_elasticsearch_task(monkeypatch):
+    monkeypatch.setattr(async_progress, "MIN_TASK_POLL_INTERVAL", 0.05)
+    async_elasticsearch = Mock()
+    async_elasticsearch.tasks.get = AsyncMock(
+        side_effect=[
+            {"completed": False, "task": {"status": {"total": 4, "updated": 1}}},
+            {"completed": False, "task": {"status": {"total": 4, "updated": 3}}},
+            {"completed": True, "response": {"updated": 4}},
+        ]
+    )
+    async_redis = MockAsyncRedis()
+    async_redis.set = AsyncMock(side_effect=async_redis.set)
+    start = time.monotonic()
+    resp = await track_elasticsearch_task(
+        async_elasticsearch,
+        "node:1",
+        "progress",
+        async_redis=async_redis,
+        interval=0,
+        expires_in=60,
+    )
+    # the task is polled at the minimum interval
+    assert time.monotonic() - start >= 0.1
+
+    assert resp["response"] == {"updated": 4}
+    assert async_redis.history == ["25.00", "75.00", "100.00"]
+    async_elasticsearch.tasks.get.assert_awaited_with(task_id="node:1")
+    # the progress expires after its last update
+    async_redis.set.assert_awaited_with("progress", "100.00", ex=60)
@@ -0,0 +1,138 @@
+import asyncio
+from typing import List
+
+import pytest
+
+from back.crud.async_elasticsearch import CrudAsyncElasticsearchBase
+from back.crud.async_random import (
+    UUID_WIDTH,
+    RandomOrders,
+    get_random_key,
+    pack_ids,
+    shuffle_ids,
+    unpack_ids,
+)
+from back.crud.async_search_cache import get_generation_key
+from lib.faker import ZetsuBouFaker
+from tests.general.mock import MockAsyncRedis
+
+
+def test_pack_ids():
+    faker = ZetsuBouFaker()
+
+    ids = [faker.uuid4() for _ in range(10)]
+    data, width, is_uuid = pack_ids(ids)
+    assert is_uuid
+    assert width == UUID_WIDTH
+    assert len(data) == 10 * UUID_WIDTH
+    assert unpack_ids(data, width, is_uuid) == ids
+
+    ids = ["1", "22", "三三三"]
+    data, width, is_uuid = pack_ids(ids)
+    assert not is_uuid
+    assert width == len("三三三".encode("utf-8"))
+    assert unpack_ids(data, width, is_uuid) == ids
+    assert unpack_ids(data[width : 2 * width], width, is_uuid) == ["22"]
+
+
+def test_shuffle_ids():
+    ids = [str(i) for i in range(100)]
+    reversed_ids = list(reversed(ids))
+
+    shuffle_ids(ids, 1)
+    shuffle_ids(reversed_ids, 1)
+    assert ids == reversed_ids
+    assert sorted(ids) == sorted(str(i) for i in range(100))
+
+    other_ids = [str(i) for i in range(100)]
+    shuffle_ids(other_ids, 2)
+    assert other_ids != ids
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_random_orders():
+    async_redis = MockAsyncRedis()
+    orders = RandomOrders(expires_in_seconds=60, async_redis=async_redis)
+    key = get_random_key("index", 1, {"match_all": {}})
+    ids = [str(i) for i in range(10)]
+
+    assert await orders.get_page("index", key, 0, 3) is None
+
+    generation = await orders.get_generation("index")
+    await orders.set("index", key, generation, ids)
+    assert await orders.get_page("index", key, 0, 3) == (["0", "1", "2"], 10)
+    assert await orders.get_page("index", key, 9, 3) == (["9"], 10)
+    assert await orders.get_page("index", key, 10, 3) == ([], 10)
+
+    await async_redis.incr(get_generation_key("index"))
+    assert await orders.get_page("index", key, 0, 3) is None
+
+
+class MockRandomAsyncElasticsearch:
+    def __init__(self, ids: List[str]):
+        self.ids = ids
+        self.requests = {"count": 0, "search": 0}
+
+    async def count(self, index: str, body: dict) -> dict:
+        self.requests["count"] += 1
+        return {"count": len(self.ids)}
+
+    async def search(self, index: str, query: dict, size: int, **kwargs) -> dict:
+        self.requests["search"] += 1
+        # The hits of an `ids` query are not in the order of the IDs.
+        ids = sorted(query["ids"]["values"])
+        hits = [{"_id": id, "_source": {"id": id}} for id in ids]
+        return {"hits": {"total": {"value": len(hits)}, "hits": hits}}
+
+    async def close(self):
+        ...
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_random_by_ids(monkeypatch: pytest.MonkeyPatch):
+    ids = [str(i) for i in range(100)]
+    async_elasticsearch = MockRandomAsyncElasticsearch(ids)
+    orders = RandomOrders(
+        expires_in_seconds=60, max_ids=100, async_redis=MockAsyncRedis()
+    )
+
+    scans = []
+
+    async def _get_ids(query: dict) -> List[str]:
+        scans.append(query)
+        await asyncio.sleep(0.01)
+        return list(ids)
+
+    async def get_page(crud: CrudAsyncElasticsearchBase, page: int) -> List[str]:
+        resp = await crud.random(page, size=10, seed=7)
+        assert resp["hits"]["total"]["value"] == 100
+        return [hit["_id"] for hit in resp["hits"]["hits"]]
+
+    async with CrudAsyncElasticsearchBase(index="index", random_orders=orders) as crud:
+        crud.async_elasticsearch = async_elasticsearch
+        monkeypatch.setattr(crud, "get_ids", _get_ids)
+
+        pages = [await get_page(crud, page) for page in range(1, 11)]
+        assert len(scans) == 1
+        assert async_elasticsearch.requests["count"] == 1
+        assert async_elasticsearch.requests["search"] == 10
+
+        shuffled_ids = sum(pages, [])
+        assert sorted(shuffled_ids) == sorted(ids)
+        assert shuffled_ids != ids
+
+        assert await get_page(crud, 7) == pages[6]
+        assert await get_page(crud, 11) == []
+        assert len(scans) == 1
+
+        # the concurrent first requests of a seed collect the IDs once
+        pages = await asyncio.gather(
+            *[crud._random_by_ids(1, 10, {"match_all": {}}, 8) for _ in range(5)]
+        )
+        assert len(scans) == 2
+        assert all(page == pages[0] for page in pages)
+        assert orders._locks == {}
+
+        orders.max_ids = 10
+        resp = await crud._random_by_ids(1, 10, {"term": {"a": "b"}}, 7)
+        assert resp is None
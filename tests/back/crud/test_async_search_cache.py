@@ -0,0 +1,111 @@
+import pytest
+
+from back.crud.async_search_cache import SearchResultCache, get_result_key
+from tests.general.mock import MockAsyncRedis
+
+INDEX = "gallery"
+
+
+def test_get_result_key():
+    dsl = {"size": 10, "query": {"match_all": {}}, "sort": ["_score"]}
+    same_dsl = {"sort": ["_score"], "query": {"match_all": {}}, "size": 10}
+    assert get_result_key(INDEX, "query", 1, dsl) == get_result_key(
+        INDEX, "query", 1, same_dsl
+    )
+    assert get_result_key(INDEX, "query", 1, dsl) != get_result_key(
+        INDEX, "query", 2, dsl
+    )
+    assert get_result_key(INDEX, "query", 1, dsl) != get_result_key(
+        "video", "query", 1, dsl
+    )
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_search_result_cache():
+    cache = SearchResultCache(
+        expires_in_seconds=60, max_bytes=1024, async_redis=MockAsyncRedis()
+    )
+    calls = 0
+
+    async def search() -> dict:
+        nonlocal calls
+        calls += 1
+        return {"hits": {"total": {"value": calls}}}
+
+    key = get_result_key(INDEX, "query", 1, {})
+    assert await cache.get_or_search(INDEX, key, search) == {
+        "hits": {"total": {"value": 1}}
+    }
+    assert await cache.get_or_search(INDEX, key, search) == {
+        "hits": {"total": {"value": 1}}
+    }
+    assert calls == 1
+    assert cache.stats.hits == 1
+    assert cache.stats.misses == 1
+    assert cache.stats.hit_rate == 0.5
+
+    await cache.invalidate("video")
+    await cache.get_or_search(INDEX, key, search)
+    assert calls == 1
+
+    await cache.invalidate(INDEX)
+    assert await cache.get_or_search(INDEX, key, search) == {
+        "hits": {"total": {"value": 2}}
+    }
+    await cache.get_or_search(INDEX, key, search)
+    assert calls == 2
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_search_result_cache_max_bytes():
+    cache = SearchResultCache(
+        expires_in_seconds=60, max_bytes=16, async_redis=MockAsyncRedis()
+    )
+    calls = 0
+
+    async def search() -> dict:
+        nonlocal calls
+        calls += 1
+        return {"hits": {"hits": [{"_id": str(i)} for i in range(10)]}}
+
+    key = get_result_key(INDEX, "query", 1, {})
+    await cache.get_or_search(INDEX, key, search)
+    await cache.get_or_search(INDEX, key, search)
+    assert calls == 2
+    assert cache.stats.oversized == 2
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_search_result_cache_point_in_time():
+    cache = SearchResultCache(
+        expires_in_seconds=60, max_bytes=1024, async_redis=MockAsyncRedis()
+    )
+    calls = 0
+
+    async def search() -> dict:
+        nonlocal calls
+        calls += 1
+        return {"hits": {"hits": []}, "pit_id": "pit", "cursor": "cursor"}
+
+    key = get_result_key(INDEX, "query", 300, {})
+    await cache.get_or_search(INDEX, key, search)
+    await cache.get_or_search(INDEX, key, search)
+    assert calls == 2
+    assert cache.stats.misses == 2
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_search_result_cache_without_redis():
+    cache = SearchResultCache(expires_in_seconds=60, max_bytes=1024)
+    calls = 0
+
+    async def search() -> dict:
+        nonlocal calls
+        calls += 1
+        return {}
+
+    key = get_result_key(INDEX, "query", 1, {})
+    await cache.get_or_search(INDEX, key, search)
+    await cache.get_or_search(INDEX, key, search)
+    assert calls == 2
+    await cache.invalidate(INDEX)
@@ -1,13 +1,18 @@
+import asyncio
 from asyncio import Future
 from typing import List
-from unittest.mock import Mock, patch
+from unittest.mock import AsyncMock, Mock, patch
 
 import pytest
 from elasticsearch import AsyncElasticsearch
 from elasticsearch.exceptions import NotFoundError
 from fastapi import HTTPException
 
-from back.crud.async_tag import CrudAsyncElasticsearchTag, CrudTag
+from back.crud.async_tag import (
+    CrudAsyncElasticsearchTag,
+    CrudTag,
+    get_delete_tag_progress_id,
+)
 from back.db.crud import CrudTagAttribute
 from back.db.model import TagAttribute, TagAttributeCreate
 from back.db.table import TagCategoryBase
@@ -21,10 +26,11 @@ from back.model.tag import (
     TagUpdate,
 )
 from lib.faker import ZetsuBouFaker
+from lib.faker.elasticsearch import FakeAsyncElasticsearch
 from tests.general.mock import (
     MockAsyncDatabaseSession,
     MockAsyncIter,
-    get_mock_result,
+    MockAsyncRedis,
     get_mock_sqlalchemy_async_session,
 )
 from tests.general.session import BaseIntegrationSession
@@ -36,43 +42,82 @@ async def test_crud_async_elasticsearch_tag():
         crud.get_keyword_fields(None)
 
 
+def get_mock_scalars_result(ids: List[int], rowcount: int = 0) -> Mock:
+    result = Mock()
+    result.scalars.return_value.all.return_value = ids
+    result.rowcount = rowcount
+    return result
+
+
 @pytest.mark.asyncio(scope="session")
-async def test_crud_tag_update_array():
+async def test_crud_tag_check_token_ids():
+    crud = CrudTag()
     mock_session = get_mock_sqlalchemy_async_session()
+    await crud._check_token_ids(mock_session, set())
+    mock_session.execute.assert_not_awaited()
 
+    mock_session = get_mock_sqlalchemy_async_session(get_mock_scalars_result([2]))
+    await crud._check_token_ids(mock_session, {2})
+    with pytest.raises(HTTPException) as e:
+        await crud._check_token_ids(mock_session, {2, 3, 4})
+    assert e.value.detail == "Token id: 3 not found"
+    assert mock_session.execute.await_count == 2
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_crud_tag_update_array():
     crud = CrudTag()
-    with pytest.raises(HTTPException):
-        await crud._update_array(mock_session, 1, [2, 3], [], None)
+    mock_session = get_mock_sqlalchemy_async_session(get_mock_scalars_result([2, 3]))
+    await crud._update_array(mock_session, 1, {2, 3}, TagCategoryBase)
+    assert mock_session.execute.await_count == 1
 
-    await crud._update_array(mock_session, 1, [], [2, 3], TagCategoryBase)
+    await crud._update_array(mock_session, 1, {3, 4, 5}, TagCategoryBase)
+    assert mock_session.execute.await_count == 4
+    _, params = mock_session.execute.await_args_list[2].args
+    assert params == [{"linked_id": 4, "token_id": 1}, {"linked_id": 5, "token_id": 1}]
+    (statement,) = mock_session.execute.await_args_list[3].args
+    assert statement.compile().params == {"token_id_1": 1, "linked_id_1": [2]}
 
 
 @pytest.mark.asyncio(scope="session")
 async def test_crud_tag_update_representative():
-    mock_session = get_mock_sqlalchemy_async_session()
     crud = CrudTag()
-    with pytest.raises(HTTPException):
-        await crud._update_representative(mock_session, 1, 2)
+    mock_session = get_mock_sqlalchemy_async_session(get_mock_scalars_result([]))
+    await crud._update_representative(mock_session, 1, 2)
+    assert mock_session.execute.await_count == 1
+    mock_session.add.assert_called_once()
 
-    mock_result = get_mock_result({"id": 1, "linked_id": 2, "token_id": 3})
-    mock_session = get_mock_sqlalchemy_async_session(mock_result=mock_result)
+    mock_session = get_mock_sqlalchemy_async_session(
+        get_mock_scalars_result([], rowcount=1)
+    )
     await crud._update_representative(mock_session, 1, 2)
+    mock_session.add.assert_not_called()
+
+    await crud._update_representative(mock_session, 1, None)
+    assert mock_session.execute.await_count == 2
 
 
 @pytest.mark.asyncio(scope="session")
 async def test_crud_tag_check_attribures():
     faker = ZetsuBouFaker()
-    mock_session = get_mock_sqlalchemy_async_session()
     crud = CrudTag()
-    with pytest.raises(HTTPException):
+    mock_session = get_mock_sqlalchemy_async_session()
+    await crud._check_attribures(
+        mock_session, TagInsert(name=faker.random_string(), attributes={})
+    )
+    mock_session.execute.assert_not_awaited()
+
+    mock_session = get_mock_sqlalchemy_async_session(get_mock_scalars_result([1]))
+    with pytest.raises(HTTPException) as e:
         await crud._check_attribures(
             mock_session,
             TagInsert(
-                id=faker.random_int(),
                 name=faker.random_string(),
-                attributes={faker.random_int(): faker.sentence()},
+                attributes={1: faker.sentence(), 2: faker.sentence()},
             ),
         )
+    assert e.value.detail == "Token Attribute id: 2 not found"
+    assert mock_session.execute.await_count == 1
 
 
 @pytest.mark.asyncio(scope="session")
@@ -142,58 +187,124 @@ async def test_crud_tag_get_row_by_id():
             assert row is not None
 
 
+@pytest.mark.asyncio(scope="session")
+async def test_crud_tag_get_rows_by_ids_by_elasticsearch():
+    mock_async_elasticsearch = Mock(spec=AsyncElasticsearch)
+    value = Future()
+    value.set_result(
+        {
+            "docs": [
+                {"_id": "1", "found": True, "_source": {"id": 1, "synonym_ids": [2]}},
+                {"_id": "3", "found": False},
+            ]
+        }
+    )
+    mock_async_elasticsearch.mget.return_value = value
+    crud = CrudTag(async_elasticsearch=mock_async_elasticsearch)
+    rows = await crud.get_rows_by_ids_by_elasticsearch([1, 3])
+    assert rows == {1: TagElasticsearch(id=1, synonym_ids=[2])}
+    mock_async_elasticsearch.mget.assert_called_once_with(
+        index=crud.index, body={"ids": ["1", "3"]}
+    )
+
+    assert await crud.get_rows_by_ids_by_elasticsearch([]) == {}
+
+
 @pytest.mark.asyncio(scope="session")
 async def test_crud_tag_get_interpretation_by_id():
     faker = ZetsuBouFaker()
     tag_id = faker.random_int()
     tag_attributes = {faker.random_int(): faker.sentence()}
 
-    with patch.object(CrudTag, "get_row_by_id_by_elasticsearch") as mock_crud_tag:
-        mock_crud_tag.return_value = None
+    with patch.object(CrudTag, "get_rows_by_ids_by_elasticsearch") as mock_crud_tag:
+        mock_crud_tag.return_value = {}
         crud = CrudTag()
-        row = await crud.get_row_by_id_by_elasticsearch(tag_id)
-        assert row is None
-
         tag = await crud.get_interpretation_by_id(tag_id)
         assert tag is None
 
-    with patch.object(CrudTag, "get_row_by_id_by_elasticsearch") as mock_crud_tag:
-        mock_crud_tag.return_value = TagElasticsearch(
-            id=tag_id, attributes=tag_attributes
-        )
+    with patch.object(CrudTag, "get_rows_by_ids_by_elasticsearch") as mock_crud_tag:
+        mock_crud_tag.return_value = {
+            tag_id: TagElasticsearch(id=tag_id, attributes=tag_attributes)
+        }
         crud = CrudTag()
-        row = await crud.get_row_by_id_by_elasticsearch(tag_id)
-        assert row is not None
 
         with patch("back.crud.async_tag.CrudTagToken") as mock_crud_tag_token:
             value = Future()
-            value.set_result(None)
-            mock_crud_tag_token.get_row_by_id.return_value = value
-            row = await crud.get_row_by_id(tag_id)
-            assert row is None
+            value.set_result([])
+            mock_crud_tag_token.get_rows_by_ids.return_value = value
 
             with patch(
                 "back.crud.async_tag.CrudTagAttribute"
             ) as mock_crud_tag_attribute:
                 value = Future()
-                value.set_result(None)
-                mock_crud_tag_attribute.get_row_by_id.return_value = value
-                row = await crud.get_row_by_id(tag_id)
-                assert row is None
+                value.set_result([])
+                mock_crud_tag_attribute.get_rows_by_ids.return_value = value
 
                 tag = await crud.get_interpretation_by_id(tag_id)
                 assert tag is None
 
 
+@pytest.mark.asyncio(scope="session")
+async def test_crud_tag_get_interpretations_by_ids():
+    tags_in_ids = {
+        1: TagElasticsearch(
+            id=1, category_ids=[4], synonym_ids=[2], attributes={7: "value"}
+        ),
+        2: TagElasticsearch(id=2, representative_id=1),
+        3: TagElasticsearch(id=3, synonym_ids=[5]),
+    }
+    tokens = [
+        TagToken(id=1, name="one"),
+        TagToken(id=2, name="two"),
+        TagToken(id=3, name="three"),
+        TagToken(id=4, name="four"),
+    ]
+    attributes = [TagAttribute(id=7, name="seven")]
+
+    with patch.object(CrudTag, "get_rows_by_ids_by_elasticsearch") as mock_crud_tag:
+        mock_crud_tag.return_value = tags_in_ids
+        crud = CrudTag()
+
+        with patch("back.crud.async_tag.CrudTagToken") as mock_crud_tag_token:
+            value = Future()
+            value.set_result(tokens)
+            mock_crud_tag_token.get_rows_by_ids.return_value = value
+
+            with patch(
+                "back.crud.async_tag.CrudTagAttribute"
+            ) as mock_crud_tag_attribute:
+                value = Future()
+                value.set_result(attributes)
+                mock_crud_tag_attribute.get_rows_by_ids.return_value = value
+
+                tags = await crud.get_interpretations_by_ids([2, 1, 3, 6, 2])
+
+        mock_crud_tag.assert_called_once_with([2, 1, 3, 6])
+        mock_crud_tag_token.get_rows_by_ids.assert_called_once_with([1, 2, 3, 4, 5])
+        mock_crud_tag_attribute.get_rows_by_ids.assert_called_once_with([7])
+
+    assert tags == [
+        Tag(id=2, name="two", representative=TagToken(id=1, name="one")),
+        Tag(
+            id=1,
+            name="one",
+            categories=[TagToken(id=4, name="four")],
+            synonyms=[TagToken(id=2, name="two")],
+            attributes=[TagAttributeWithValue(id=7, name="seven", value="value")],
+        ),
+        None,
+        None,
+        Tag(id=2, name="two", representative=TagToken(id=1, name="one")),
+    ]
+
+
 @pytest.mark.asyncio(scope="session")
 async def test_crud_tag_get_interpretations_by_name():
     faker = ZetsuBouFaker()
     tag_id = faker.random_int()
-    with patch.object(CrudTag, "get_interpretation_by_id") as mock_crud_tag:
-        mock_crud_tag.return_value = None
+    with patch.object(CrudTag, "get_interpretations_by_ids") as mock_crud_tag:
+        mock_crud_tag.return_value = [None]
         crud = CrudTag()
-        row = await crud.get_interpretation_by_id(tag_id)
-        assert row is None
 
         with patch("back.crud.async_tag.CrudTagToken") as mock_crud_tag_token:
             value = Future()
@@ -201,7 +312,8 @@ async def test_crud_tag_get_interpretations_by_name():
             value.set_result(tokens)
             mock_crud_tag_token.get_rows_by_name_order_by_id.return_value = value
             tags = await crud.get_interpretations_by_name(tag_id)
-            assert len(tags) == 1
+            assert tags == [Tag(id=tag_id, name=tokens[0].name)]
+            mock_crud_tag.assert_called_once_with([tag_id])
 
 
 @pytest.mark.asyncio(scope="session")
@@ -214,16 +326,18 @@ async def test_crud_tag_delete_related_elasticsearch_docs():
             [{}, {"_source": {"id": tag_id}}, {"_source": {"id": tag_id}}]
         )
 
-        with patch("back.crud.async_tag.async_bulk") as mock_async_bulk:
-            value = Future()
-            value.set_result(None)
-            mock_async_bulk.return_value = value
-
-            crud = CrudTag(batch_size=1)
-            await crud.delete_related_elasticsearch_docs(tag_id)
+        async_elasticsearch = FakeAsyncElasticsearch()
+        crud = CrudTag(async_elasticsearch=async_elasticsearch, batch_size=1)
+        await crud.delete_related_elasticsearch_docs(tag_id)
+        assert async_elasticsearch.requests["bulk"] == 2
+        assert list(async_elasticsearch.indices[crud.index]) == [tag_id]
 
-            crud = CrudTag()
-            await crud.delete_related_elasticsearch_docs(tag_id)
+        mock_async_scan.return_value = MockAsyncIter(
+            [{}, {"_source": {"id": tag_id}}, {"_source": {"id": tag_id}}]
+        )
+        crud = CrudTag(async_elasticsearch=async_elasticsearch)
+        await crud.delete_related_elasticsearch_docs(tag_id)
+        assert async_elasticsearch.requests["bulk"] == 3
 
 
 @pytest.mark.asyncio(scope="session")
@@ -244,9 +358,56 @@ async def test_crud_tag_delete_by_id():
         crud = CrudTag(
             async_database=mock_async_database,
             async_elasticsearch=mock_async_elasticsearch,
+            update_by_query=False,
         )
 
         await crud.delete_by_id(tag_id)
+        mock_crud_tag.assert_awaited_once_with(tag_id)
+
+    crud = CrudTag(
+        async_database=mock_async_database,
+        async_elasticsearch=mock_async_elasticsearch,
+        update_by_query=True,
+    )
+    with patch.object(
+        crud, "delete_related_elasticsearch_docs_by_query", return_value="node:1"
+    ), patch.object(crud, "track_related_elasticsearch_docs") as mock_track:
+        await crud.delete_by_id(tag_id)
+        await asyncio.sleep(0)
+        mock_track.assert_awaited_once_with("node:1", tag_id)
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_crud_tag_delete_related_elasticsearch_docs_by_query():
+    mock_async_elasticsearch = Mock(spec=AsyncElasticsearch)
+    mock_async_elasticsearch.update_by_query = AsyncMock(
+        return_value={"task": "node:1"}
+    )
+    crud = CrudTag(async_elasticsearch=mock_async_elasticsearch, slices=0)
+
+    assert await crud.delete_related_elasticsearch_docs_by_query(2) == "node:1"
+    kwargs = mock_async_elasticsearch.update_by_query.await_args.kwargs
+    assert kwargs["body"]["script"]["params"] == {"id": 2}
+    assert kwargs["slices"] == "auto"
+    assert kwargs["conflicts"] == "proceed"
+    assert not kwargs["wait_for_completion"]
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_crud_tag_track_related_elasticsearch_docs():
+    async_redis = MockAsyncRedis()
+    mock_async_elasticsearch = Mock(spec=AsyncElasticsearch)
+    mock_async_elasticsearch.tasks = Mock()
+    mock_async_elasticsearch.tasks.get = AsyncMock(
+        return_value={"completed": True, "response": {"failures": [{"id": "1"}]}}
+    )
+    crud = CrudTag(
+        async_elasticsearch=mock_async_elasticsearch, async_redis=async_redis
+    )
+    with patch("back.crud.async_tag.invalidate_index") as mock_invalidate_index:
+        await crud.track_related_elasticsearch_docs("node:1", 2)
+        mock_invalidate_index.assert_awaited_once_with(crud.index)
+    assert async_redis.values[get_delete_tag_progress_id(2)] == "100.00"
 
 
 async def _test_insert_tag(tag: Tag):
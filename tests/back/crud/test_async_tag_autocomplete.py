@@ -0,0 +1,105 @@
+from typing import List
+from unittest.mock import Mock, patch
+
+import pytest
+
+from back.crud.async_tag_autocomplete import CHANNEL, TagAutocomplete
+from back.model.tag import (
+    TagAutocompleteEvent,
+    TagAutocompleteEventEnum,
+    TagInserted,
+    TagToken,
+)
+from tests.general.mock import MockAsyncDatabaseSession, MockAsyncRedis
+
+
+class MockTagDatabaseSession(MockAsyncDatabaseSession):
+    def __init__(self, rows: List[list]):
+        self.rows = rows
+
+    async def execute(self, *arg, **kwargs):
+        result = Mock()
+        result.all.return_value = self.rows.pop(0)
+        return result
+
+
+def get_tag_autocomplete(async_redis: MockAsyncRedis) -> TagAutocomplete:
+    async_database = MockTagDatabaseSession(
+        [
+            [(1, "Apple"), (2, "apricot"), (3, "banana"), (4, "fruit")],
+            [(1, 4), (3, 4)],
+            [(1, 2)],
+            [(2, 1)],
+        ]
+    )
+    return TagAutocomplete(
+        async_database=async_database, async_redis=async_redis, cache_size=16
+    )
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_autocomplete():
+    tag_autocomplete = get_tag_autocomplete(MockAsyncRedis())
+    with patch.object(tag_autocomplete, "_get_counts", return_value={"apricot": 3}):
+        completions = await tag_autocomplete.autocomplete("AP")
+
+    assert [completion.id for completion in completions] == [2, 1]
+    assert completions[0].count == 3
+    assert completions[0].representative == TagToken(id=1, name="Apple")
+    assert completions[1].synonyms == [TagToken(id=2, name="apricot")]
+
+    completions = await tag_autocomplete.autocomplete("", size=10, category_id=4)
+    assert [completion.id for completion in completions] == [1, 3]
+    assert await tag_autocomplete.autocomplete("a", category_id=5) == []
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_set_and_delete():
+    async_redis = MockAsyncRedis()
+    tag_autocomplete = get_tag_autocomplete(async_redis)
+    with patch.object(tag_autocomplete, "_get_counts", return_value={}):
+        await tag_autocomplete.load()
+
+    await tag_autocomplete.set_token(TagToken(id=3, name="avocado"))
+    completions = await tag_autocomplete.autocomplete("a")
+    assert [completion.id for completion in completions] == [1, 2, 3]
+    assert tag_autocomplete.members[4] == {1, 3}
+
+    await tag_autocomplete.set_tag(
+        TagInserted(id=5, name="almond", category_ids=[4], representative_id=1)
+    )
+    completions = await tag_autocomplete.autocomplete("al", category_id=4)
+    assert [completion.id for completion in completions] == [5]
+    assert completions[0].representative == TagToken(id=1, name="Apple")
+
+    await tag_autocomplete.delete(1)
+    completions = await tag_autocomplete.autocomplete("a")
+    assert [completion.id for completion in completions] == [5, 2, 3]
+    assert completions[0].representative is None
+    assert tag_autocomplete.synonyms == {}
+    assert tag_autocomplete.members[4] == {3, 5}
+
+    assert len(async_redis.messages[CHANNEL]) == 3
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_on_message():
+    async_redis = MockAsyncRedis()
+    tag_autocomplete = get_tag_autocomplete(async_redis)
+    with patch.object(tag_autocomplete, "_get_counts", return_value={}):
+        await tag_autocomplete.load()
+
+    other = TagAutocomplete(async_redis=async_redis)
+    await other.set_token(TagToken(id=6, name="apex"))
+    await tag_autocomplete.set_token(TagToken(id=7, name="apogee"))
+    for data in async_redis.messages[CHANNEL]:
+        tag_autocomplete.on_message(data)
+
+    completions = await tag_autocomplete.autocomplete("ap")
+    assert [completion.id for completion in completions] == [6, 7, 1, 2]
+
+    event = TagAutocompleteEvent(
+        source=other.source, event=TagAutocompleteEventEnum.RELOAD
+    )
+    tag_autocomplete.on_message(event.model_dump_json())
+    assert not tag_autocomplete.is_loaded
@@ -0,0 +1,126 @@
+from pathlib import Path
+from typing import List
+from unittest.mock import Mock
+
+import pytest
+
+from back.crud.async_tag_import import TagImporter, get_document, get_relation_rows
+from back.db.table import TagCategoryBase, TagRepresentativeBase, TagSynonymBase
+from back.model.tag import Tag, TagAttributeWithValue, TagToken
+from lib.faker.elasticsearch import FakeAsyncElasticsearch
+from tests.general.mock import MockAsyncDatabaseSession
+
+INDEX = "tag"
+
+
+class MockImportDatabaseSession(MockAsyncDatabaseSession):
+    def __init__(self, results: List[Mock] = []):
+        self.statements: List[tuple] = []
+        self.results = list(results)
+
+    async def execute(self, statement, *args, **kwargs):
+        self.statements.append((statement, *args))
+        if self.results:
+            return self.results.pop(0)
+
+
+def get_tags() -> List[Tag]:
+    return [
+        Tag(id=10, name="fruit"),
+        Tag(
+            id=11,
+            name="apple",
+            categories=[TagToken(id=10, name="fruit")],
+            synonyms=[TagToken(id=12, name="ringo"), TagToken(id=12, name="ringo")],
+            attributes=[TagAttributeWithValue(id=5, name="Color", value="red")],
+        ),
+        Tag(id=12, name="ringo", representative=TagToken(id=11, name="apple")),
+    ]
+
+
+def get_importer(tmp_path: Path, **kwargs) -> TagImporter:
+    return TagImporter(
+        async_elasticsearch=FakeAsyncElasticsearch(),
+        index=INDEX,
+        batch_size=2,
+        checkpoint=tmp_path / "tag.json.checkpoint",
+        autocomplete=None,
+        **kwargs,
+    )
+
+
+def test_get_relation_rows():
+    token_table = {10: 1, 11: 2, 12: 3}
+    rows = get_relation_rows(get_tags(), token_table)
+    assert rows[TagCategoryBase] == [{"linked_id": 1, "token_id": 2}]
+    assert rows[TagSynonymBase] == [{"linked_id": 3, "token_id": 2}]
+    assert rows[TagRepresentativeBase] == [{"linked_id": 2, "token_id": 3}]
+
+
+def test_get_document():
+    document = get_document(get_tags()[1], {10: 1, 11: 2, 12: 3}, {"color": 7})
+    assert document.id == 2
+    assert document.category_ids == [1]
+    assert document.synonym_ids == [3]
+    assert document.representative_id is None
+    assert document.attributes == {7: "red"}
+
+
+def test_checkpoint(tmp_path: Path):
+    importer = get_importer(tmp_path)
+    importer.progress.tokens = {10: 1, 11: 2}
+    importer.progress.relations = 2
+    importer.save_checkpoint()
+
+    importer = get_importer(tmp_path)
+    assert importer.progress.tokens == {10: 1, 11: 2}
+    assert importer.progress.relations == 2
+    assert importer.progress.documents == 0
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_insert_tokens(tmp_path: Path):
+    # "fruit" was committed before the failure, and "ringo" is mapped already
+    selected = Mock()
+    selected.all.return_value = [("fruit", 4), ("ringo", 3)]
+    inserted = Mock()
+    inserted.scalars.return_value.all.return_value = [5]
+    async_database = MockImportDatabaseSession([selected, inserted])
+    importer = get_importer(tmp_path, async_database=async_database)
+    importer.progress.tokens = {12: 3}
+
+    count = await importer.insert_tokens(get_tags())
+    assert count == 1
+    assert importer.load_checkpoint().tokens == {10: 4, 11: 5, 12: 3}
+    _, rows = async_database.statements[-1]
+    assert rows == [{"name": "apple"}]
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_insert_relations(tmp_path: Path):
+    async_database = MockImportDatabaseSession()
+    importer = get_importer(tmp_path, async_database=async_database)
+    importer.progress.tokens = {10: 1, 11: 2, 12: 3}
+    importer.progress.relations = 2
+
+    count = await importer.insert_relations(get_tags())
+    assert count == 1
+    assert importer.load_checkpoint().relations == 3
+    # The relations of the resumed batch are deleted before they are inserted.
+    statement, *_ = async_database.statements[0]
+    assert statement.compile().params == {"token_id_1": [3]}
+    _, rows = async_database.statements[-1]
+    assert rows == [{"linked_id": 2, "token_id": 3}]
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_index_documents(tmp_path: Path):
+    importer = get_importer(tmp_path)
+    importer.progress.tokens = {10: 1, 11: 2, 12: 3}
+    importer.progress.attributes = {"color": 7}
+    importer.progress.documents = 1
+
+    count = await importer.index_documents(get_tags())
+    assert count == 2
+    assert sorted(importer.async_elasticsearch.indices[INDEX]) == [2, 3]
+    assert importer.load_checkpoint().documents == 3
@@ -27,6 +27,7 @@ from back.db.crud.base import (
     get_table_instances,
     iter_by_condition_order_by_id,
     iter_order_by_id,
+    iter_rows_by_keyset,
     list_tables,
     reset_auto_increment,
     table_exists,
@@ -316,6 +317,30 @@ async def test_get_all_rows():
         assert len(rows) == num
 
 
+@pytest.mark.asyncio
+@pytest.mark.integration
+async def test_iter_rows_by_keyset():
+    num = 23
+    async with TableSession(row_num=num):
+        ids = [row.id async for row in iter_order_by_id(A, AModel, limit=5)]
+        assert ids == list(range(1, num + 1))
+
+        rows = [row async for row in iter_order_by_id(A, limit=5, is_tuple=True)]
+        assert [row[0] for row in rows] == ids
+        assert all(type(row) is tuple and len(row) == 2 for row in rows)
+
+        rows = [row async for row in iter_by_condition_order_by_id(A, A.id > 20)]
+        assert [row["id"] for row in rows] == [21, 22, 23]
+
+        rows = [
+            row
+            async for row in iter_rows_by_keyset(A, order=A.name, limit=4, is_desc=True)
+        ]
+        keys = [(row["name"], row["id"]) for row in rows]
+        assert keys == sorted(keys, reverse=True)
+        assert len(keys) == num
+
+
 @pytest.mark.integration
 def test_table():
     table_names_1 = list_tables()
@@ -1,4 +1,4 @@
-from back.model.gallery import Gallery
+from back.model.gallery import GALLERY_CARD_FIELDS, Gallery, GalleryCards
 from back.settings import setting
 from lib.faker import ZetsuBouFaker
 from tests.general.logging import logger
@@ -23,3 +23,29 @@ def test_gallery_tag_source():
     logger.debug(f"gallery tag path (ans): {gallery_tag_path}")
 
     assert gallery.tag_source.path == gallery_tag_path
+
+
+def test_gallery_cards():
+    faker = ZetsuBouFaker()
+    gallery = faker.simple_galleries()[0]
+    gallery.id = faker.uuid4()
+    gallery.path = faker.minio_folder_path()
+    gallery.attributes.pages = 10
+    source = {
+        k: v
+        for k, v in gallery.model_dump().items()
+        if k in GALLERY_CARD_FIELDS or k == "attributes"
+    }
+
+    hits = [{"_id": gallery.id, "_source": source}]
+    cards = GalleryCards(**{"hits": {"total": {"value": 1}, "hits": hits}})
+    card = cards.hits.hits[0].source
+    assert card.id == gallery.id
+    assert card.path == gallery.path
+    assert card.attributes.pages == 10
+
+    data = cards.model_dump(mode="json", by_alias=True)
+    card_data = data["hits"]["hits"][0]["_source"]
+    assert "tags" not in card_data
+    assert "labels" not in card_data
+    assert "uploader" not in card_data["attributes"]
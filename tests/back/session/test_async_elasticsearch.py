@@ -0,0 +1,124 @@
+import asyncio
+import copy
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from back.crud.async_gallery import CrudAsyncElasticsearchGallery
+from back.session.async_elasticsearch import (
+    ElasticsearchMappingRegistry,
+    close_async_elasticsearch,
+    get_field_names_from_mappings,
+    get_shared_async_elasticsearch,
+)
+
+INDEX = "gallery"
+
+MAPPINGS = {
+    "properties": {
+        "id": {"type": "keyword"},
+        "name": {"type": "text", "fields": {"keyword": {"type": "keyword"}}},
+        "attributes": {"properties": {"pages": {"type": "long"}}},
+    }
+}
+
+
+class MockIndices:
+    def __init__(self, mappings: dict):
+        self.mappings = mappings
+        self.requests = Counter()
+
+    async def get_mapping(self, index: str) -> dict:
+        self.requests[index] += 1
+        if index not in self.mappings:
+            return {}
+        return {index: {"mappings": self.mappings[index]}}
+
+
+class MockAsyncElasticsearch:
+    def __init__(self, mappings: dict):
+        self.indices = MockIndices(mappings)
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_shared_async_elasticsearch():
+    async_elasticsearch = get_shared_async_elasticsearch()
+    assert get_shared_async_elasticsearch() is async_elasticsearch
+
+    async with CrudAsyncElasticsearchGallery(is_from_setting_if_none=True) as crud:
+        assert crud.async_elasticsearch is async_elasticsearch
+    assert get_shared_async_elasticsearch() is async_elasticsearch
+
+    await close_async_elasticsearch()
+    assert get_shared_async_elasticsearch() is not async_elasticsearch
+    await close_async_elasticsearch()
+
+
+def test_shared_async_elasticsearch_without_event_loop():
+    async_elasticsearch = get_shared_async_elasticsearch()
+    assert get_shared_async_elasticsearch() is async_elasticsearch
+
+
+def test_shared_async_elasticsearch_on_another_event_loop():
+    async def borrow():
+        client = get_shared_async_elasticsearch()
+        await asyncio.sleep(0)
+        return client
+
+    def run(coroutine):
+        # `asyncio.run` in another thread keeps the event loop of the tests
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(asyncio.run, coroutine).result()
+
+    async_elasticsearch = run(borrow())
+    with patch.object(async_elasticsearch, "close", AsyncMock()) as mock_close:
+        assert run(borrow()) is not async_elasticsearch
+        mock_close.assert_awaited_once()
+
+
+def test_get_field_names_from_mappings():
+    assert get_field_names_from_mappings(MAPPINGS) == {
+        "id",
+        "name",
+        "attributes.pages",
+    }
+    assert get_field_names_from_mappings(None) == set()
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_elasticsearch_mapping_registry():
+    mappings = copy.deepcopy(MAPPINGS)
+    async_elasticsearch = MockAsyncElasticsearch({INDEX: mappings})
+    registry = ElasticsearchMappingRegistry(expires_in_seconds=60)
+
+    field_names = await registry.get_field_names(async_elasticsearch, INDEX)
+    assert field_names == {"id", "name", "attributes.pages"}
+    assert await registry.get_field_names(async_elasticsearch, INDEX) is field_names
+    assert async_elasticsearch.indices.requests[INDEX] == 1
+
+    mappings["properties"]["attributes"]["properties"]["artist"] = {"type": "text"}
+    registry.invalidate(INDEX)
+    field_names = await registry.get_field_names(async_elasticsearch, INDEX)
+    assert "attributes.artist" in field_names
+    assert async_elasticsearch.indices.requests[INDEX] == 2
+
+    registry.invalidate()
+    await registry.get_field_names(async_elasticsearch, INDEX)
+    assert async_elasticsearch.indices.requests[INDEX] == 3
+
+    # the missing index is not cached
+    assert await registry.get_field_names(async_elasticsearch, "missing") == set()
+    await registry.get_field_names(async_elasticsearch, "missing")
+    assert async_elasticsearch.indices.requests["missing"] == 2
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_elasticsearch_mapping_registry_expiration():
+    async_elasticsearch = MockAsyncElasticsearch({INDEX: MAPPINGS})
+    registry = ElasticsearchMappingRegistry(expires_in_seconds=0)
+
+    await registry.get_field_names(async_elasticsearch, INDEX)
+    await registry.get_field_names(async_elasticsearch, INDEX)
+    assert async_elasticsearch.indices.requests[INDEX] == 2
@@ -0,0 +1,109 @@
+import pytest
+
+from back.model.base import SourceBaseModel
+from back.model.storage import StorageGalleryCodeEnum
+from back.session.storage.async_s3 import AsyncS3Session, iter_gallery_summaries
+from tests.general.mock import MockS3Client
+
+BUCKET_NAME = "bucket"
+TAG_KEY = ".tag/gallery.json"
+
+KEYS = [
+    "root/readme.txt",
+    "root/a/",
+    "root/a/note.txt",
+    "root/a/1/.tag/gallery.json",
+    "root/a/1/1.jpg",
+    "root/a/1/2.png",
+    "root/a/1/nested/3.jpg",
+    "root/a/2/cover.txt",
+    "root/b/1/10.jpg",
+    "root/b/1/2.jpg",
+    "root/b/1/.tag/gallery.json",
+    "other/c/1/1.jpg",
+]
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_iter_gallery_summaries():
+    client = MockS3Client(BUCKET_NAME, KEYS)
+    internal_nodes = set()
+
+    summaries = {}
+    async for prefix, summary in iter_gallery_summaries(
+        client, BUCKET_NAME, "/root", 2, TAG_KEY, internal_nodes=internal_nodes
+    ):
+        assert prefix not in summaries
+        summaries[prefix] = summary
+
+    assert list(summaries.keys()) == ["root/a/1/", "root/a/2/", "root/b/1/"]
+
+    assert summaries["root/a/1/"].has_tag
+    assert summaries["root/a/1/"].tag_etag == '"root/a/1/.tag/gallery.json"'
+    assert summaries["root/a/1/"].num_images == 2
+
+    assert not summaries["root/a/2/"].has_tag
+    assert summaries["root/a/2/"].num_images == 0
+
+    assert summaries["root/b/1/"].has_tag
+    assert summaries["root/b/1/"].num_images == 2
+
+    assert internal_nodes == {"root/", "root/a/"}
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_iter_gallery_summaries_depth():
+    client = MockS3Client(BUCKET_NAME, KEYS)
+
+    prefixes = [
+        prefix
+        async for prefix, _ in iter_gallery_summaries(
+            client, BUCKET_NAME, "", 1, TAG_KEY
+        )
+    ]
+    assert prefixes == ["other/", "root/"]
+
+    with pytest.raises(ValueError):
+        async for _ in iter_gallery_summaries(client, BUCKET_NAME, "", 0, TAG_KEY):
+            ...
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_async_s3_session_iter_gallery_summaries():
+    source = SourceBaseModel(path=f"minio-1://{BUCKET_NAME}/root/")
+
+    class MockAsyncS3Session(AsyncS3Session):
+        async def open(self):
+            self.client = MockS3Client(BUCKET_NAME, KEYS)
+            return self.client
+
+    async with MockAsyncS3Session() as session:
+        paths = [
+            summary.path
+            async for summary in session.iter_gallery_summaries(
+                source, 2, dir_fname=".tag", tag_fname="gallery.json"
+            )
+        ]
+        assert paths == [
+            f"minio-1://{BUCKET_NAME}/root/a/1/",
+            f"minio-1://{BUCKET_NAME}/root/a/2/",
+            f"minio-1://{BUCKET_NAME}/root/b/1/",
+        ]
+
+        galleries = await session.are_galleries_by_flat_listing(source, 2)
+        assert galleries.percentage == 2 / 3
+        codes = [(g.path, g.code) for g in galleries.galleries]
+        assert codes == [
+            (
+                f"minio://{BUCKET_NAME}/root/a/2/",
+                StorageGalleryCodeEnum.DOES_NOT_HAVE_IMAGES,
+            ),
+            (
+                f"minio://{BUCKET_NAME}/root/",
+                StorageGalleryCodeEnum.FILES_IN_THE_INTERNAL_NODES_OF_THE_STORAGE_PATH,
+            ),
+            (
+                f"minio://{BUCKET_NAME}/root/a/",
+                StorageGalleryCodeEnum.FILES_IN_THE_INTERNAL_NODES_OF_THE_STORAGE_PATH,
+            ),
+        ]
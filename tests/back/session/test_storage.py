@@ -0,0 +1,134 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import AsyncMock
+
+import pytest
+
+from back.db.model import StorageMinio
+from back.model.storage import StorageCategoryEnum
+from back.session import storage
+from back.session.storage import AsyncS3SessionRegistry
+from back.session.storage.async_s3 import AsyncS3Session
+from tests.general.mock import MockS3Client
+
+BUCKET_NAME = "bucket"
+
+
+def get_storage_minio(storage_id: int, secret_key: str = "secret") -> StorageMinio:
+    return StorageMinio(
+        id=storage_id,
+        category=StorageCategoryEnum.gallery.value,
+        name="name",
+        endpoint="http://localhost:9000",
+        bucket_name=BUCKET_NAME,
+        prefix="root",
+        depth=1,
+        access_key="access",
+        secret_key=secret_key,
+    )
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_async_s3_session_registry(monkeypatch: pytest.MonkeyPatch):
+    rows = {1: get_storage_minio(1)}
+    num_queries = 0
+    num_clients = 0
+
+    async def get_row_by_id(storage_id: int) -> StorageMinio:
+        nonlocal num_queries
+        num_queries += 1
+        return rows.get(storage_id, None)
+
+    async def open(self: AsyncS3Session):
+        nonlocal num_clients
+        num_clients += 1
+        self.client = MockS3Client(BUCKET_NAME, ["root/1.jpg"])
+        return self.client
+
+    monkeypatch.setattr(storage.CrudStorageMinio, "get_row_by_id", get_row_by_id)
+    monkeypatch.setattr(AsyncS3Session, "open", open)
+
+    registry = AsyncS3SessionRegistry(expires_in_seconds=60)
+    clients = set()
+    for _ in range(10):
+        session = await registry.get_session(1)
+        async with session:
+            clients.add(id(session.client))
+    assert len(clients) == 1
+    assert num_queries == 1
+    assert num_clients == 1
+
+    rows[1] = get_storage_minio(1, secret_key="new secret")
+    in_flight_session = await registry.get_session(1)
+    await in_flight_session.open()
+    in_flight_client = in_flight_session.client
+    in_flight_client.close = AsyncMock()
+    await registry.invalidate(1)
+    # the client borrowed by the request in flight is closed after the request
+    in_flight_client.close.assert_not_awaited()
+    session = await registry.get_session(1)
+    async with session:
+        assert session.aws_secret_access_key == "new secret"
+        assert session.client is not in_flight_client
+    assert num_queries == 2
+    assert num_clients == 2
+    await in_flight_session.close()
+    in_flight_client.close.assert_awaited_once()
+
+    with pytest.raises(Exception):
+        await registry.get_session(2)
+
+    await registry.close()
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_async_s3_session_registry_on_another_event_loop(
+    monkeypatch: pytest.MonkeyPatch,
+):
+    async def get_row_by_id(storage_id: int) -> StorageMinio:
+        return get_storage_minio(storage_id)
+
+    async def open(self: AsyncS3Session):
+        self.client = MockS3Client(BUCKET_NAME, ["root/1.jpg"])
+        self.client.close = AsyncMock()
+        return self.client
+
+    monkeypatch.setattr(storage.CrudStorageMinio, "get_row_by_id", get_row_by_id)
+    monkeypatch.setattr(AsyncS3Session, "open", open)
+
+    async def borrow(registry: AsyncS3SessionRegistry):
+        session = await registry.get_session(1)
+        async with session:
+            return session.client
+
+    # the client of an event loop running in another thread is closed in that loop
+    registry = AsyncS3SessionRegistry(expires_in_seconds=60)
+    other_loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=other_loop.run_forever)
+    thread.start()
+    try:
+        future = asyncio.run_coroutine_threadsafe(borrow(registry), other_loop)
+        other_client = await asyncio.wrap_future(future)
+        client = await borrow(registry)
+        assert client is not other_client
+        for _ in range(100):
+            if other_client.close.await_count > 0:
+                break
+            await asyncio.sleep(0.01)
+        other_client.close.assert_awaited_once()
+    finally:
+        other_loop.call_soon_threadsafe(other_loop.stop)
+        thread.join()
+        other_loop.close()
+
+    # the client of a closed event loop is closed in the current one
+    registry = AsyncS3SessionRegistry(expires_in_seconds=60)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        other_client = executor.submit(asyncio.run, borrow(registry)).result()
+    other_client.close.side_effect = RuntimeError("Event loop is closed")
+    client = await borrow(registry)
+    assert client is not other_client
+    other_client.close.assert_awaited_once()
+
+    await registry.close()
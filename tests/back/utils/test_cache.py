@@ -0,0 +1,24 @@
+from back.utils.cache import LRUCache
+
+
+def test_lru_cache():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+
+    cache.set("c", 3)
+    assert "b" not in cache
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+
+    assert cache.pop("a") == 1
+    assert cache.get("a", 0) == 0
+
+    cache.clear()
+    assert len(cache) == 0
+
+    cache = LRUCache(maxsize=0)
+    cache.set("a", 1)
+    assert "a" not in cache
@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+from back.utils.pool import run_in_pool
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_run_in_pool():
+    results = []
+
+    async def func(x: int):
+        await asyncio.sleep(0.01)
+        results.append(x)
+
+    await run_in_pool(range(100), func, concurrency=8)
+    assert sorted(results) == list(range(100))
+
+    results = []
+    await run_in_pool(range(10), func)
+    assert results == list(range(10))
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_run_in_pool_with_async_iterable():
+    results = []
+
+    async def aiter(n: int):
+        for i in range(n):
+            yield i
+
+    async def func(x: int):
+        results.append(x)
+
+    await run_in_pool(aiter(50), func, concurrency=4)
+    assert sorted(results) == list(range(50))
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_run_in_pool_concurrency():
+    in_flight = 0
+    max_in_flight = 0
+
+    async def func(_: int):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+
+    await run_in_pool(range(40), func, concurrency=5)
+    assert max_in_flight == 5
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_run_in_pool_exception():
+    async def func(x: int):
+        if x == 3:
+            raise ValueError()
+
+    with pytest.raises(ValueError):
+        await run_in_pool(range(100), func, concurrency=4)
+
+    with pytest.raises(ValueError):
+        await run_in_pool(range(10), func, concurrency=0)
@@ -0,0 +1,52 @@
+from back.utils.prefix_index import PrefixIndex
+
+
+def test_search():
+    index = PrefixIndex()
+    index.build(
+        {1: "apple", 2: "apricot", 3: "banana", 4: "app", 5: "蘋果"},
+        {1: 5, 2: 10, 4: 5},
+    )
+    assert len(index) == 5
+
+    assert index.search("ap", 10) == [2, 4, 1]
+    assert index.search("ap", 2) == [2, 4]
+    assert index.search("app", 10) == [4, 1]
+    assert index.search("蘋", 10) == [5]
+    assert index.search("c", 10) == []
+    assert index.search("", 1) == [2]
+    assert index.search("ap", 10, allowed_ids={1, 3}) == [1]
+    assert index.search("ap", 10, allowed_ids={1, 2, 3, 4, 5, 6}) == [2, 4, 1]
+
+
+def test_set_and_delete():
+    index = PrefixIndex()
+    index.build({1: "apple", 2: "apricot"})
+    assert index.search("ap", 10) == [1, 2]
+
+    index.set(2, "banana")
+    assert index.search("ap", 10) == [1]
+    assert index.search("b", 10) == [2]
+
+    index.set(3, "apex", score=1)
+    assert index.search("ap", 10) == [3, 1]
+
+    index.delete(1)
+    index.delete(1)
+    assert 1 not in index
+    assert index.search("ap", 10) == [3]
+    assert len(index) == 2
+
+
+def test_cache():
+    index = PrefixIndex(cache_size=1)
+    index.build({1: "apple", 2: "apricot"})
+
+    ids = index.search("ap", 10)
+    ids.append(3)
+    assert index.search("ap", 10) == [1, 2]
+    assert index.search("a", 10) == [1, 2]
+    assert len(index._cache) == 1
+
+    index.set(3, "ant")
+    assert index.search("a", 10) == [3, 1, 2]
@@ -0,0 +1,69 @@
+from back.model.elasticsearch import (
+    ElasticsearchAnalyzerEnum,
+    ElasticsearchQueryBooleanEnum,
+)
+from back.utils.query import QueryCompiler, get_ngram_query
+
+
+def test_query_compiler():
+    compiler = QueryCompiler()
+    compiler.add_multi_match(
+        ["b", "a", "b"], ["name.default"], boolean=ElasticsearchQueryBooleanEnum.MUST
+    )
+    compiler.add_text("x y", "src", ElasticsearchAnalyzerEnum.URL)
+    compiler.add_term("attributes.category.keyword", "doujinshi")
+    compiler.add_terms("tags.artist.keyword", ["zetsubou", "kyo", "zetsubou"])
+    compiler.add_range("attributes.rating", gte=3)
+    compiler.add_range("attributes.rating", lte=5)
+    compiler.add_range("attributes.width")
+
+    query = compiler.compile()["bool"]
+
+    must = [c["constant_score"]["filter"]["multi_match"] for c in query["must"]]
+    assert [m["query"] for m in must] == ["a", "b"]
+    should = [c["constant_score"]["filter"]["multi_match"] for c in query["should"]]
+    assert [m["fields"] for m in should] == [["src.url"], ["src.url"]]
+    assert query["filter"] == [
+        {"range": {"attributes.rating": {"gte": 3, "lte": 5}}},
+        {"term": {"attributes.category.keyword": "doujinshi"}},
+        {"term": {"tags.artist.keyword": "kyo"}},
+        {"term": {"tags.artist.keyword": "zetsubou"}},
+    ]
+
+
+def test_query_compiler_is_deterministic():
+    def compile(tags: dict, labels: list) -> dict:
+        compiler = QueryCompiler()
+        compiler.add_terms("labels.keyword", labels)
+        for tag_field, tag_values in tags.items():
+            compiler.add_terms(f"tags.{tag_field}.keyword", tag_values)
+        return compiler.compile()
+
+    assert compile({"a": ["1", "2"], "b": ["3"]}, ["x", "y"]) == compile(
+        {"b": ["3"], "a": ["2", "1"]}, ["y", "x"]
+    )
+
+
+def test_query_compiler_ngram():
+    compiler = QueryCompiler()
+    compiler.add_text("a b", "name", ElasticsearchAnalyzerEnum.NGRAM)
+    compiler.add_text(" ", "raw_name", ElasticsearchAnalyzerEnum.NGRAM)
+    query = compiler.compile()["bool"]
+    assert query["should"] == [
+        get_ngram_query("ab", ["name.ngram"], ElasticsearchQueryBooleanEnum.SHOULD)
+    ]
+    assert query["must"] == []
+    assert query["filter"] == []
+
+
+def test_get_ngram_query():
+    for boolean, operator in [
+        (ElasticsearchQueryBooleanEnum.MUST, "and"),
+        (ElasticsearchQueryBooleanEnum.SHOULD, "or"),
+    ]:
+        query = get_ngram_query("東京都", ["name.ngram", "raw_name.ngram"], boolean)
+        match = query["bool"]["must"][0]["multi_match"]
+        assert match["query"] == "東京都"
+        assert match["type"] == "cross_fields"
+        assert match["operator"] == operator
+        assert query["bool"]["should"][0]["multi_match"]["type"] == "phrase"
@@ -0,0 +1,77 @@
+import pytest
+
+from back.model.elasticsearch import ElasticsearchQueryBooleanEnum
+from back.utils.query import QueryCompiler, get_ngram_query
+from command.test.benchmark import (
+    benchmark_gallery_sync,
+    count_clauses,
+    generate_cjk_queries,
+    get_per_character_query,
+    get_recall_and_precision,
+    get_scoring_query,
+)
+from lib.faker import ZetsuBouFaker
+
+
+@pytest.mark.asyncio(scope="session")
+async def test_benchmark_gallery_sync():
+    num_galleries = 20
+    for flat_listing in [False, True]:
+        full, noop = await benchmark_gallery_sync(
+            num_galleries,
+            num_images=3,
+            concurrency=4,
+            batch_size=8,
+            flat_listing=flat_listing,
+        )
+        assert full.name == "full"
+        assert noop.name == "no-op"
+        assert full.galleries == noop.galleries == num_galleries
+        assert full.elasticsearch_bulk_requests == 3
+        assert full.s3_requests["get_object"] == num_galleries
+        assert noop.s3_requests_per_gallery <= full.s3_requests_per_gallery
+        if flat_listing:
+            assert "head_object" not in full.s3_requests
+
+
+def test_get_scoring_query():
+    compiler = QueryCompiler()
+    compiler.add_term("tags.artist.keyword", "kyo")
+    compiler.add_range("attributes.rating", gte=3)
+
+    query = get_scoring_query(compiler.compile())
+    assert "filter" not in query["bool"]
+    assert query["bool"]["must"] == [
+        {"range": {"attributes.rating": {"gte": 3}}},
+        {
+            "constant_score": {
+                "filter": {"multi_match": {"query": "kyo", "fields": ["tags.artist"]}}
+            }
+        },
+    ]
+
+
+def test_ngram_queries():
+    fields = ["name.ngram"]
+    keywords = "東京都"
+    for boolean in ElasticsearchQueryBooleanEnum:
+        assert count_clauses(get_per_character_query(keywords, fields, boolean)) == 3
+        assert count_clauses(get_ngram_query(keywords, fields, boolean)) == 2
+
+
+def test_generate_cjk_queries():
+    faker = ZetsuBouFaker()
+    names = {str(i): faker.cjk_name() for i in range(20)}
+    queries = generate_cjk_queries(names, 10, faker=faker)
+    assert len(queries) == 10
+    for keywords, relevant_ids in queries:
+        assert 2 <= len(keywords) <= 6
+        assert len(relevant_ids) > 0
+        for id in relevant_ids:
+            assert keywords in names[id]
+
+
+def test_get_recall_and_precision():
+    assert get_recall_and_precision(["1", "2", "3"], {"1", "4"}, 2) == (0.5, 1 / 3)
+    assert get_recall_and_precision(["1"], {"1", "2", "3"}, 1) == (1.0, 1.0)
+    assert get_recall_and_precision([], {"1"}, 10) == (0.0, 0.0)
@@ -1,4 +1,5 @@
-from typing import Optional
+import asyncio
+from typing import List, Optional
 from unittest.mock import Mock
 
 from sqlalchemy import Result
@@ -45,3 +46,136 @@ class MockAsyncDatabaseSession:
 
     async def __aexit__(self, exc_type, exc, tb):
         pass
+
+
+class MockS3Paginator:
+    """
+    A `list_objects_v2` paginator over the given keys.
+    """
+
+    def __init__(self, bucket_name: str, keys: List[str]):
+        self.bucket_name = bucket_name
+        self.keys = sorted(keys)
+
+    async def paginate(
+        self, Bucket: str, Prefix: str, Delimiter: str = "", MaxKeys: int = 1000
+    ):
+        keys = [key for key in self.keys if key.startswith(Prefix)]
+        for i in range(0, max(len(keys), 1), MaxKeys):
+            page_keys = keys[i : i + MaxKeys]
+            yield {
+                "Name": Bucket,
+                "Delimiter": Delimiter,
+                "MaxKeys": MaxKeys,
+                "KeyCount": len(page_keys),
+                "Contents": [
+                    {"Key": key, "Size": 0, "ETag": f'"{key}"'} for key in page_keys
+                ],
+            }
+
+
+class MockS3Client:
+    def __init__(self, bucket_name: str, keys: List[str]):
+        self.bucket_name = bucket_name
+        self.keys = keys
+
+    def get_paginator(self, _: str) -> MockS3Paginator:
+        return MockS3Paginator(self.bucket_name, self.keys)
+
+    async def close(self):
+        pass
+
+
+class MockAsyncRedis:
+    """An in-memory subset of `redis.asyncio.Redis`. The expirations are ignored.
+
+    Every value written by `set` is recorded in `history`, and `set` sleeps for `delay`
+    seconds to simulate a slow server.
+    """
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.values = {}
+        self.hashes = {}
+        self.messages = {}
+        self.history: List[str] = []
+
+    async def get(self, key: str) -> Optional[bytes]:
+        value = self.values.get(key, None)
+        if value is None:
+            return None
+        if type(value) is bytes:
+            return value
+        return value.encode("utf-8")
+
+    async def getrange(self, key: str, start: int, end: int) -> bytes:
+        value = await self.get(key)
+        if value is None:
+            return b""
+        return value[start : end + 1]
+
+    async def mget(self, keys: List[str]) -> List[Optional[bytes]]:
+        return [await self.get(key) for key in keys]
+
+    async def set(
+        self, key: str, value: str, ex: Optional[int] = None, nx: bool = False
+    ) -> Optional[bool]:
+        if self.delay > 0:
+            await asyncio.sleep(self.delay)
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        self.history.append(value)
+        return True
+
+    async def incr(self, key: str) -> int:
+        value = int(self.values.get(key, 0)) + 1
+        self.values[key] = str(value)
+        return value
+
+    async def decr(self, key: str) -> int:
+        value = int(self.values.get(key, 0)) - 1
+        self.values[key] = str(value)
+        return value
+
+    async def hget(self, key: str, field: str) -> Optional[bytes]:
+        value = self.hashes.get(key, {}).get(field, None)
+        if value is None:
+            return None
+        return value.encode("utf-8")
+
+    async def hmget(self, key: str, fields: List[str]) -> List[Optional[bytes]]:
+        return [await self.hget(key, field) for field in fields]
+
+    async def hscan_iter(self, key: str, count: Optional[int] = None):
+        for field, value in self.hashes.get(key, {}).items():
+            yield field.encode("utf-8"), value.encode("utf-8")
+
+    async def hset(
+        self,
+        key: str,
+        field: Optional[str] = None,
+        value: Optional[str] = None,
+        mapping: Optional[dict] = None,
+    ):
+        h = self.hashes.setdefault(key, {})
+        if field is not None:
+            h[field] = value
+        if mapping is not None:
+            h.update(mapping)
+
+    async def hdel(self, key: str, *fields: str):
+        for field in fields:
+            self.hashes.get(key, {}).pop(field, None)
+
+    async def expire(self, key: str, seconds: int):
+        pass
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self.values.pop(key, None)
+            self.hashes.pop(key, None)
+
+    async def publish(self, channel: str, message: str) -> int:
+        self.messages.setdefault(channel, []).append(message)
+        return 0